@@ -11,6 +11,11 @@ Original file is located at
 
 import pandas as pd
 
+from src.ingesta.divipola import cargar_divipola
+from src.ingesta.esquema import renombrar
+from src.ingesta.lector import limpiar_lote
+from src.ingesta.poblacion import cargar_poblacion
+
 def cargar_delito(url, delito):
     # Por defecto fila 10
     posibles_headers = [10, 9]
@@ -21,21 +26,8 @@ def cargar_delito(url, delito):
             # Normalizar nombres
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            # Diccionario para unificar columnas
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             # Seleccionar solo columnas clave
             columnas_validas = [
@@ -143,21 +135,8 @@ def cargar_delito(url, delito):
             # Normalizar nombres
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            # Diccionario para unificar columnas
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             # Seleccionar solo columnas clave
             columnas_validas = [
@@ -242,21 +221,8 @@ def cargar_delito(url, delito):
             # Normalizar nombres
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            # Diccionario para unificar columnas
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             # Seleccionar solo columnas clave
             columnas_validas = [
@@ -344,20 +310,8 @@ def cargar_delito(url, delito):
             df = pd.read_excel(url, header=header_row).copy()
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             columnas_validas = [
                 "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
@@ -460,23 +414,8 @@ def cargar_delito(url, delito, debug=False):
                 print(f"\n🔍 {delito} - Header {header_row}:")
                 print(f"Columnas encontradas: {list(df.columns[:10])}")
 
-            # 🔤 Corregir errores comunes de nombres
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_MEDIO": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA": "FECHA_HECHO",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "AGRUPA_EDAD_PER_SONA": "AGRUPA_EDAD_PERSONA",
-                "MUNICICPIO": "MUNICIPIO",  # 👈 Corregido
-                "DEPARTAMENTO_": "DEPARTAMENTO",  # por si hay espacio o guion
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             # 🔍 Filtrar columnas válidas
             columnas_validas = [
@@ -498,47 +437,13 @@ def cargar_delito(url, delito, debug=False):
 
             df = df[[col for col in columnas_validas if col in df.columns]]
 
-            # 🧹 Eliminar filas completamente vacías
-            df = df.dropna(how="all")
-
-            # 🧹 Eliminar filas donde las columnas de ubicación estén vacías
-            if "DEPARTAMENTO" in df.columns and "MUNICIPIO" in df.columns:
-                df = df.dropna(subset=["DEPARTAMENTO", "MUNICIPIO"], how="all")
-            elif "DEPARTAMENTO" in df.columns:
-                df = df.dropna(subset=["DEPARTAMENTO"])
-            elif "MUNICIPIO" in df.columns:
-                df = df.dropna(subset=["MUNICIPIO"])
-
-            # 🧱 Cortar desde "TOTAL" hacia abajo si aparece
-            for col in ["DEPARTAMENTO", "MUNICIPIO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    mask_total = df[col].astype(str).str.contains("TOTAL", na=False, case=False)
-                    if mask_total.any():
-                        primera_fila_total = mask_total.idxmax()
-                        df = df.loc[:primera_fila_total - 1]
-                        break
-
-            # 🧽 Limpieza reforzada
-            basura_regex = (
-                "TOTAL|FUENTE|SIEDCO|Elaborado|Revisado|Autorizado|Ley 1098|"
-                "Agrupación referente|Contador|DUIN|POLICÍA NACIONAL|"
-                "DIRECCIÓN|GRUPO DE INFORMACIÓN|LESIONES|PERÍODO|MINISTERIO"
-            )
-            for col in ["DEPARTAMENTO", "MUNICIPIO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            # Eliminar filas vacías o con solo espacios
-            df = df[df.apply(lambda row: row.astype(str).str.strip().str.len().gt(0).any(), axis=1)]
+            # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+            df = limpiar_lote(df, ultimo=True)
 
             # Eliminar filas sin municipio
             if "MUNICIPIO" in df.columns:
                 df = df[df["MUNICIPIO"].notna() & (df["MUNICIPIO"].astype(str).str.strip() != "")]
 
-            # Convertir código DANE a numérico
-            if "CODIGO_DANE" in df.columns:
-                df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
             # Agregar tipo de delito
             df["TIPO_DELITO"] = delito
 
@@ -610,20 +515,8 @@ def cargar_delito(url, delito):
             df = pd.read_excel(url, header=header_row).copy()
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             columnas_validas = [
                 "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
@@ -705,20 +598,8 @@ def cargar_delito(url, delito):
             df = pd.read_excel(url, header=header_row).copy()
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             columnas_validas = [
                 "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
@@ -803,20 +684,8 @@ def cargar_delito(url, delito):
             df = pd.read_excel(url, header=header_row).copy()
             df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
 
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
+            # Unificar nombres con el registro de esquema
+            df = renombrar(df)
 
             columnas_validas = [
                 "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
@@ -896,14 +765,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -912,8 +776,8 @@ print(divipola.columns.tolist())
 # (Opcional) ver las primeras filas
 display(divipola.head())
 
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # 🔤 Normalizar texto
 divipola = divipola.rename(columns={
@@ -944,9 +808,7 @@ print(f"Total: {divipola.shape[0]} filas y {divipola.shape[1]} columnas")
 # ========================================
 print("📥 Descargando DIVIPOLA...")
 try:
-    response = requests.get(api_url_divipola)
-    response.raise_for_status() # Raise an exception for bad status codes
-    divipola = pd.DataFrame(response.json())
+    divipola = cargar_divipola().copy()
 
     # Normalizar nombres de columnas to uppercase immediately
     divipola.columns = divipola.columns.str.upper().str.strip()
@@ -1007,7 +869,8 @@ except Exception as e:
 # ========================================
 print("\n📥 Descargando datos de población...")
 # Use header=7 (row 8) and the specified sheet name
-pob = pd.read_excel(url_poblacion, sheet_name='PobMunicipalxÁreaSexoEdad', header=7)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # Normalizar nombres de columnas
 pob.columns = pob.columns.str.upper().str.strip().str.replace(' ', '_').str.replace('Á', 'A').str.replace(".", "", regex=False)
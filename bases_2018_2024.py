@@ -11,62 +11,56 @@ Original file is located at
 
 import pandas as pd
 
+from src.ingesta.cache import ruta_local
+from src.ingesta.divipola import cargar_divipola
+from src.ingesta.encabezado import leer_con_encabezado
+from src.ingesta.esquema import renombrar
+from src.ingesta.lector import limpiar_lote
+from src.ingesta.motores import ERRORES_LECTURA
+from src.ingesta.normalizacion import limpiar_municipio, normalizar, normalizar_celdas
+from src.ingesta.poblacion import cargar_poblacion
+from src.transformacion.correcciones import (
+    aplicar_correcciones,
+    cargar_reglas,
+    corregir_departamento,
+)
+from src.transformacion.difuso import BuscadorDifuso
+from src.transformacion.fechas import parsear_fechas
+
 def cargar_delito(url, delito):
-    # Por defecto fila 10
-    posibles_headers = [10, 9]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-            # Normalizar nombres
-            df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
-
-            # Diccionario para unificar columnas
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            # Seleccionar solo columnas clave
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            # Eliminar filas completamente vacías
-            df = df.dropna(how="all")
-
-            # Eliminar basura
-            basura_regex = "TOTAL|FUENTE|Elaborado|Revisado|Autorizado|Ley 1098|Agrupación referente|Contador"
-            for col in ["DEPARTAMENTO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            if not df.empty:
-                # CODIGO_DANE numérico
-                if "CODIGO_DANE" in df.columns:
-                    df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-                df["TIPO_DELITO"] = delito
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-        except Exception as e:
-            continue
-
-    print(f"⚠️ {delito}: no se pudo leer con header 9 o 10")
-    return pd.DataFrame()
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        return pd.DataFrame()
+
+    # Normalizar nombres
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(" ", "_")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # Seleccionar solo columnas clave
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    # (CODIGO_DANE queda numérico)
+    df = limpiar_lote(df, ultimo=True)
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+        return pd.DataFrame()
+
+    df["TIPO_DELITO"] = delito
+    print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 
 # Diccionario de URLs y delitos para 2018
@@ -111,28 +105,17 @@ for col in df_2018.columns:
     print(df_2018[col].dropna().unique())  # quitar nulos antes de listar
     print(f"Total de valores únicos: {df_2018[col].nunique()}")
 
-# Commented out IPython magic to ensure Python compatibility.
-# %pip install unidecode
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- Estandarizar DEPARTAMENTO ---
 df_2018['DEPARTAMENTO'] = df_2018['DEPARTAMENTO'].astype(str).str.strip().str.upper()
-df_2018['DEPARTAMENTO'] = df_2018['DEPARTAMENTO'].apply(lambda x: unidecode.unidecode(x))
+df_2018['DEPARTAMENTO'] = df_2018['DEPARTAMENTO'].pipe(normalizar)
 
 # --- Estandarizar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return nombre
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)  # eliminar (CT)
-    nombre = unidecode.unidecode(nombre)     # quitar tildes
-    return nombre
-
-df_2018['MUNICIPIO'] = df_2018['MUNICIPIO'].apply(limpiar_municipio)
+df_2018['MUNICIPIO'] = df_2018['MUNICIPIO'].pipe(limpiar_municipio)
 
 # Reemplazar 'NAN' como string por NaN
 df_2018['MUNICIPIO'] = df_2018['MUNICIPIO'].replace('NAN', np.nan)
@@ -141,14 +124,7 @@ df_2018['MUNICIPIO'] = df_2018['MUNICIPIO'].replace('NAN', np.nan)
 df_2018 = df_2018.dropna(subset=['MUNICIPIO'])
 
 # --- Arreglar FECHA_HECHO ---
-def convertir_fecha(valor):
-    if isinstance(valor, (float, int)):
-        valor_str = str(int(valor))
-        return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-    else:
-        return pd.to_datetime(valor, errors='coerce')
-
-df_2018['FECHA_HECHO'] = df_2018['FECHA_HECHO'].apply(convertir_fecha)
+df_2018['FECHA_HECHO'] = df_2018['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- Resumen de nulos ---
 resumen_nulos = pd.DataFrame({
@@ -245,14 +221,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -266,7 +237,7 @@ df_2018['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2018['DEPARTAMENTO'] = (
@@ -274,28 +245,15 @@ df_2018['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2018['DEPARTAMENTO'] = df_2018['DEPARTAMENTO'].apply(normalizar)
-df_2018['MUNICIPIO'] = df_2018['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2018['DEPARTAMENTO'] = df_2018['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2018['MUNICIPIO'] = df_2018['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Reemplazos de departamentos ---
 reemplazos_dptos = {
@@ -403,16 +361,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -438,16 +392,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -481,21 +427,13 @@ for col in pob_2018.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2018.columns:
     if pob_2018[col].dtype == 'object':
-        pob_2018[col] = pob_2018[col].apply(normalizar_texto)
+        pob_2018[col] = pob_2018[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2018.head(10))
@@ -510,23 +448,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2018[col] = pob_2018[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2018[col] = pob_2018[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
@@ -622,61 +548,39 @@ for col in df_final_pob.columns:
 """2019"""
 
 def cargar_delito(url, delito):
-    # Por defecto fila 10
-    posibles_headers = [8, 9, 10, 11, 12]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-            # Normalizar nombres
-            df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
-
-            # Diccionario para unificar columnas
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            # Seleccionar solo columnas clave
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            # Eliminar filas completamente vacías
-            df = df.dropna(how="all")
-
-            # Eliminar basura
-            basura_regex = "TOTAL|FUENTE|Elaborado|Revisado|Autorizado|Ley 1098|Agrupación referente|Contador"
-            for col in ["DEPARTAMENTO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            if not df.empty:
-                # CODIGO_DANE numérico
-                if "CODIGO_DANE" in df.columns:
-                    df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-                df["TIPO_DELITO"] = delito
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-        except Exception as e:
-            continue
-
-    print(f"⚠️ {delito}: no se pudo leer con header 9 o 10")
-    return pd.DataFrame()
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        return pd.DataFrame()
+
+    # Normalizar nombres
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(" ", "_")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # Seleccionar solo columnas clave
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    # (CODIGO_DANE queda numérico)
+    df = limpiar_lote(df, ultimo=True)
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+        return pd.DataFrame()
+
+    df["TIPO_DELITO"] = delito
+    print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 # Diccionario de URLs y delitos para 2019
 urls_2019 = [
@@ -720,28 +624,17 @@ for col in df_2019.columns:
     print(df_2019[col].dropna().unique())  # quitar nulos antes de listar
     print(f"Total de valores únicos: {df_2019[col].nunique()}")
 
-# Commented out IPython magic to ensure Python compatibility.
-# %pip install unidecode
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- Estandarizar DEPARTAMENTO ---
 df_2019['DEPARTAMENTO'] = df_2019['DEPARTAMENTO'].astype(str).str.strip().str.upper()
-df_2019['DEPARTAMENTO'] = df_2019['DEPARTAMENTO'].apply(lambda x: unidecode.unidecode(x))
+df_2019['DEPARTAMENTO'] = df_2019['DEPARTAMENTO'].pipe(normalizar)
 
 # --- Estandarizar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return nombre
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)  # eliminar (CT)
-    nombre = unidecode.unidecode(nombre)     # quitar tildes
-    return nombre
-
-df_2019['MUNICIPIO'] = df_2019['MUNICIPIO'].apply(limpiar_municipio)
+df_2019['MUNICIPIO'] = df_2019['MUNICIPIO'].pipe(limpiar_municipio)
 
 # Reemplazar 'NAN' como string por NaN
 df_2019['MUNICIPIO'] = df_2019['MUNICIPIO'].replace('NAN', np.nan)
@@ -750,14 +643,7 @@ df_2019['MUNICIPIO'] = df_2019['MUNICIPIO'].replace('NAN', np.nan)
 df_2019 = df_2019.dropna(subset=['MUNICIPIO'])
 
 # --- Arreglar FECHA_HECHO ---
-def convertir_fecha(valor):
-    if isinstance(valor, (float, int)):
-        valor_str = str(int(valor))
-        return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-    else:
-        return pd.to_datetime(valor, errors='coerce')
-
-df_2019['FECHA_HECHO'] = df_2019['FECHA_HECHO'].apply(convertir_fecha)
+df_2019['FECHA_HECHO'] = df_2019['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- Resumen de nulos ---
 resumen_nulos = pd.DataFrame({
@@ -854,14 +740,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -875,7 +756,7 @@ df_2019['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2019['DEPARTAMENTO'] = (
@@ -883,28 +764,15 @@ df_2019['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2019['DEPARTAMENTO'] = df_2019['DEPARTAMENTO'].apply(normalizar)
-df_2019['MUNICIPIO'] = df_2019['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2019['DEPARTAMENTO'] = df_2019['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2019['MUNICIPIO'] = df_2019['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Eliminar registros sin información ---
 df_2019 = df_2019[~df_2019['MUNICIPIO'].isin(['NO REGISTRA'])]
@@ -1017,16 +885,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -1052,16 +916,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -1095,21 +951,13 @@ for col in pob_2019.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2019.columns:
     if pob_2019[col].dtype == 'object':
-        pob_2019[col] = pob_2019[col].apply(normalizar_texto)
+        pob_2019[col] = pob_2019[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2019.head(10))
@@ -1124,23 +972,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2019[col] = pob_2019[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2019[col] = pob_2019[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
@@ -1243,61 +1079,39 @@ for col in df_final_pob.columns:
 """2020"""
 
 def cargar_delito(url, delito):
-    # Por defecto fila 10
-    posibles_headers = [10, 9]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-            # Normalizar nombres
-            df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
-
-            # Diccionario para unificar columnas
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            # Seleccionar solo columnas clave
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            # Eliminar filas completamente vacías
-            df = df.dropna(how="all")
-
-            # Eliminar basura
-            basura_regex = "TOTAL|FUENTE|Elaborado|Revisado|Autorizado|Ley 1098|Agrupación referente|Contador"
-            for col in ["DEPARTAMENTO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            if not df.empty:
-                # CODIGO_DANE numérico
-                if "CODIGO_DANE" in df.columns:
-                    df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-                df["TIPO_DELITO"] = delito
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-        except Exception as e:
-            continue
-
-    print(f"⚠️ {delito}: no se pudo leer con header 9 o 10")
-    return pd.DataFrame()
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        return pd.DataFrame()
+
+    # Normalizar nombres
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(" ", "_")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # Seleccionar solo columnas clave
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    # (CODIGO_DANE queda numérico)
+    df = limpiar_lote(df, ultimo=True)
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+        return pd.DataFrame()
+
+    df["TIPO_DELITO"] = delito
+    print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 
 # Diccionario de URLs y delitos 2020
@@ -1345,28 +1159,17 @@ for col in df_2020.columns:
     print(df_2020[col].dropna().unique())  # quitar nulos antes de listar
     print(f"Total de valores únicos: {df_2020[col].nunique()}")
 
-# Commented out IPython magic to ensure Python compatibility.
-# %pip install unidecode
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- Estandarizar DEPARTAMENTO ---
 df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].astype(str).str.strip().str.upper()
-df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].apply(lambda x: unidecode.unidecode(x))
+df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].pipe(normalizar)
 
 # --- Estandarizar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return nombre
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)  # eliminar (CT)
-    nombre = unidecode.unidecode(nombre)     # quitar tildes
-    return nombre
-
-df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].apply(limpiar_municipio)
+df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].pipe(limpiar_municipio)
 
 # Reemplazar 'NAN' como string por NaN
 df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].replace('NAN', np.nan)
@@ -1375,14 +1178,7 @@ df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].replace('NAN', np.nan)
 df_2020 = df_2020.dropna(subset=['MUNICIPIO'])
 
 # --- Arreglar FECHA_HECHO ---
-def convertir_fecha(valor):
-    if isinstance(valor, (float, int)):
-        valor_str = str(int(valor))
-        return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-    else:
-        return pd.to_datetime(valor, errors='coerce')
-
-df_2020['FECHA_HECHO'] = df_2020['FECHA_HECHO'].apply(convertir_fecha)
+df_2020['FECHA_HECHO'] = df_2020['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- Resumen de nulos ---
 resumen_nulos = pd.DataFrame({
@@ -1479,14 +1275,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -1500,7 +1291,7 @@ df_2020['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2020['DEPARTAMENTO'] = (
@@ -1508,7 +1299,7 @@ df_2020['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # =========================================================
@@ -1517,23 +1308,10 @@ df_2020['DEPARTAMENTO'] = (
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].apply(normalizar)
-df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Eliminar registros sin información ---
 df_2020 = df_2020[~df_2020['MUNICIPIO'].isin(['NO REGISTRA'])]
@@ -1660,16 +1438,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -1695,16 +1469,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -1738,21 +1504,13 @@ for col in pob_2020.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2020.columns:
     if pob_2020[col].dtype == 'object':
-        pob_2020[col] = pob_2020[col].apply(normalizar_texto)
+        pob_2020[col] = pob_2020[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2020.head(10))
@@ -1767,23 +1525,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2020[col] = pob_2020[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2020[col] = pob_2020[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
@@ -1963,14 +1709,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -1984,7 +1725,7 @@ df_2020['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2020['DEPARTAMENTO'] = (
@@ -1992,7 +1733,7 @@ df_2020['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # =========================================================
@@ -2001,23 +1742,10 @@ df_2020['DEPARTAMENTO'] = (
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].apply(normalizar)
-df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2020['DEPARTAMENTO'] = df_2020['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2020['MUNICIPIO'] = df_2020['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Eliminar registros sin información ---
 df_2020 = df_2020[~df_2020['MUNICIPIO'].isin(['NO REGISTRA'])]
@@ -2144,16 +1872,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -2179,16 +1903,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -2222,21 +1938,13 @@ for col in pob_2020.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2020.columns:
     if pob_2020[col].dtype == 'object':
-        pob_2020[col] = pob_2020[col].apply(normalizar_texto)
+        pob_2020[col] = pob_2020[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2020.head(10))
@@ -2251,23 +1959,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2020[col] = pob_2020[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2020[col] = pob_2020[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
@@ -2365,56 +2061,39 @@ for col in df_final_pob.columns:
 
 import pandas as pd
 def cargar_delito(url, delito):
-    # Probar varios posibles encabezados
-    posibles_headers = [8, 9, 10, 11, 12]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-            df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
-
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            df = df.dropna(how="all")
-
-            basura_regex = "TOTAL|FUENTE|Elaborado|Revisado|Autorizado|Ley 1098|Agrupación referente|Contador"
-            for col in ["DEPARTAMENTO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            if not df.empty:
-                if "CODIGO_DANE" in df.columns:
-                    df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-                df["TIPO_DELITO"] = delito
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-        except Exception:
-            continue
-
-    # Si llegó aquí, falló con todas
-    print(f"⚠️ {delito}: no se pudo leer con headers {posibles_headers}")
-    return pd.DataFrame()
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        return pd.DataFrame()
+
+    # Normalizar nombres
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(" ", "_")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # Seleccionar solo columnas clave
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    # (CODIGO_DANE queda numérico)
+    df = limpiar_lote(df, ultimo=True)
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+        return pd.DataFrame()
+
+    df["TIPO_DELITO"] = delito
+    print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 # Diccionario de URLs y delitos 2021
 urls_2021 = [
@@ -2462,10 +2141,8 @@ for col in df_2021.columns:
     print(f"Total de valores únicos: {df_2021[col].nunique()}")
 
 
-
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- LIMPIEZA Y ESTANDARIZACIÓN DE VARIABLES CLAVE ---
@@ -2476,7 +2153,7 @@ df_2021['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # Correcciones comunes en nombres de departamentos
@@ -2491,46 +2168,13 @@ reemplazos_depto = {
 df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].replace(reemplazos_depto)
 
 # === MUNICIPIO ===
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return np.nan
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)          # eliminar (CT)
-    nombre = re.sub(r'[^A-ZÑ\s]', '', nombre)       # eliminar caracteres no alfabéticos
-    nombre = unidecode.unidecode(nombre)            # quitar tildes
-    nombre = nombre.replace('  ', ' ')              # quitar dobles espacios
-    return nombre.strip()
-
-df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].apply(limpiar_municipio)
+
+df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].pipe(limpiar_municipio)
 df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].replace('NAN', np.nan)
 df_2021 = df_2021.dropna(subset=['MUNICIPIO'])
 
 # === FECHA_HECHO ===
-def convertir_fecha(valor):
-    # Si el valor está vacío o es NaN
-    if pd.isna(valor):
-        return pd.NaT
-
-    # Si es un número tipo Excel (por ejemplo 20210515 o un serial)
-    if isinstance(valor, (int, float)):
-        try:
-            valor_str = str(int(valor))
-            if len(valor_str) == 8:  # formato YYYYMMDD
-                return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-            else:
-                return pd.to_datetime(valor, errors='coerce')
-        except Exception:
-            return pd.NaT
-
-    # Si es una cadena con formato de fecha
-    if isinstance(valor, str):
-        return pd.to_datetime(valor.strip(), errors='coerce')
-
-    # Cualquier otro tipo
-    return pd.NaT
-
-# Aplicar la función corregida
-df_2021['FECHA_HECHO'] = df_2021['FECHA_HECHO'].apply(convertir_fecha)
+df_2021['FECHA_HECHO'] = df_2021['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- RESUMEN DE NULOS ---
 resumen_nulos = pd.DataFrame({
@@ -2574,30 +2218,6 @@ COLUMNAS_OBJETIVO = [
     "GENERO", "AGRUPA_EDAD_PERSONA", "CANTIDAD", "TIPO_DELITO"
 ]
 
-def encontrar_fila_encabezado(ruta_o_url, max_filas_a_inspeccionar=30):
-    """
-    Lee las primeras filas sin cabecera y busca la fila que contiene
-    los nombres de columna objetivo (por coincidencia parcial).
-    Devuelve el índice (0-based) de la fila que debe usarse como header.
-    Si no encuentra una coincidencia clara, devuelve None.
-    """
-    preview = pd.read_excel(ruta_o_url, header=None, nrows=max_filas_a_inspeccionar)
-    # normalizar valores de cada celda a string mayúscula sin espacios extremos
-    preview_norm = preview.applymap(lambda x: str(x).strip().upper() if not pd.isna(x) else "")
-
-    for idx in range(len(preview_norm)):
-        fila = preview_norm.iloc[idx].tolist()
-        # Contamos cuántas columnas objetivo aparecen (coincidencia parcial)
-        coincidencias = 0
-        for objetivo in COLUMNAS_OBJETIVO:
-            # si aparece exactamente o aparece palabra clave
-            if any(objetivo in str(c) for c in fila if c):
-                coincidencias += 1
-        # si encontramos al menos 3-4 coincidencias consideramos que es el header correcto
-        if coincidencias >= 3:
-            return idx
-    return None
-
 def normalizar_colnames(df):
     """Quita espacios y pone mayúsculas a los nombres de columnas."""
     df = df.rename(columns=lambda x: str(x).strip().upper())
@@ -2616,28 +2236,10 @@ def cargar_delito(ruta_o_url, tipo_delito=None, force_header=None, max_preview_r
       tipo_delito: string (opcional) para asignar en la columna TIPO_DELITO
       force_header: int (opcional) forzar índice de fila header (0-based)
     """
-    # 1) encontrar fila de encabezado
-    if force_header is None:
-        header_idx = encontrar_fila_encabezado(ruta_o_url, max_filas_a_inspeccionar=max_preview_rows)
-    else:
-        header_idx = force_header
-
-    # si no encontramos, probamos con header=8 y header=9 como fallback (comunes)
-    if header_idx is None:
-        for candidato in (8, 9, 0):
-            try:
-                df_try = pd.read_excel(ruta_o_url, header=candidato, nrows=3)
-                # si tiene más de 1 columna asumimos éxito
-                if df_try.shape[1] > 1:
-                    header_idx = candidato
-                    break
-            except Exception:
-                continue
-
-    # 2) lectura final con header detectado (o error si no se detectó nada)
-    if header_idx is None:
-        raise ValueError("No se pudo detectar la fila de encabezado. Usa force_header=<fila 0-based>.")
-    df = pd.read_excel(ruta_o_url, header=header_idx)
+    # 1) y 2) detectar la fila de encabezado en una lectura de las primeras filas
+    # y leer el cuerpo una sola vez (ValueError si no se detecta: usar force_header)
+    df, header_idx = leer_con_encabezado(ruta_o_url, max_filas=max_preview_rows,
+                                         header=force_header)
 
     # 3) normalizar nombres de columnas
     df = normalizar_colnames(df)
@@ -2758,7 +2360,6 @@ print(f"Total departamentos únicos: {df['DEPARTAMENTO'].nunique()}")
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- 1️⃣ Reasignar correctamente las columnas ---
@@ -2788,7 +2389,7 @@ df_2021['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 reemplazos_depto = {
@@ -2802,28 +2403,12 @@ reemplazos_depto = {
 df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].replace(reemplazos_depto)
 
 # --- 5️⃣ Limpiar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return np.nan
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)
-    nombre = re.sub(r'[^A-ZÑ\s]', '', nombre)
-    nombre = unidecode.unidecode(nombre)
-    return re.sub(r'\s+', ' ', nombre).strip()
-
-df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].apply(limpiar_municipio)
+
+df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].pipe(limpiar_municipio)
 df_2021 = df_2021.dropna(subset=['MUNICIPIO'])
 
 # --- 6️⃣ Convertir FECHA_HECHO ---
-def convertir_fecha(valor):
-    if pd.isna(valor):
-        return pd.NaT
-    try:
-        return pd.to_datetime(valor, errors='coerce')
-    except Exception:
-        return pd.NaT
-
-df_2021['FECHA_HECHO'] = df_2021['FECHA_HECHO'].apply(convertir_fecha)
+df_2021['FECHA_HECHO'] = df_2021['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- 7️⃣ Eliminar registros que son notas de pie o totales ---
 valores_invalidos = [
@@ -2931,14 +2516,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -2952,7 +2532,7 @@ df_2021['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2021['DEPARTAMENTO'] = (
@@ -2960,28 +2540,14 @@ df_2021['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 import pandas as pd
-import unidecode
-from difflib import get_close_matches
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
 
 # Aplicar normalización a la base de datos
-df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].apply(normalizar)
-df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 2. Detectar municipios sin coincidencia ---
 merged_final = df_2021.merge(
@@ -2996,16 +2562,15 @@ merged_final = df_2021.merge(
 sin_match = merged_final[merged_final['_merge'] == 'left_only'][['DEPARTAMENTO', 'MUNICIPIO']].drop_duplicates()
 
 # --- 3. Corrección automática de errores de digitación ---
-municipios_divipola = divipola['nom_mpio'].unique().tolist()
-
-# Función para corregir el nombre del municipio
-def corregir_nombre(nombre):
-    match = get_close_matches(nombre, municipios_divipola, n=1, cutoff=0.85)
-    return match[0] if match else nombre
+# Busqueda por trigramas dentro del departamento (todos si el departamento no cruza)
+buscador = BuscadorDifuso.desde_divipola(divipola)
 
 # Corregir los municipios sin coincidencia
 if not sin_match.empty:
-    sin_match['MUNICIPIO_CORREGIDO'] = sin_match['MUNICIPIO'].apply(corregir_nombre)
+    sin_match['MUNICIPIO_CORREGIDO'] = [
+        buscador.buscar(mun, dep) or mun
+        for dep, mun in zip(sin_match['DEPARTAMENTO'], sin_match['MUNICIPIO'])
+    ]
 
     # Realizar el merge de las correcciones automáticas
     df_2021 = df_2021.merge(sin_match[['DEPARTAMENTO', 'MUNICIPIO', 'MUNICIPIO_CORREGIDO']],
@@ -3084,26 +2649,14 @@ print(f"✅ Municipios sin coincidencia tras corrección de TOGÜI: {len(sin_mat
 display(sin_match_final.head(30))
 
 import pandas as pd
-import unidecode
-from difflib import get_close_matches
 
 # ==========================================================
 # 1. Función de normalización
 # ==========================================================
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
 
 # Aplicar normalización
-df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].apply(normalizar)
-df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # ==========================================================
 # 2. Corrección departamental (errores más comunes)
@@ -3138,14 +2691,13 @@ display(sin_match.head(30))
 # ==========================================================
 # 4. Corrección automática de municipios (errores menores)
 # ==========================================================
-municipios_divipola = divipola['nom_mpio'].unique().tolist()
-
-def corregir_nombre(nombre):
-    match = get_close_matches(nombre, municipios_divipola, n=1, cutoff=0.85)
-    return match[0] if match else nombre
+buscador = BuscadorDifuso.desde_divipola(divipola)
 
 if not sin_match.empty:
-    sin_match['MUNICIPIO_CORREGIDO'] = sin_match['MUNICIPIO'].apply(corregir_nombre)
+    sin_match['MUNICIPIO_CORREGIDO'] = [
+        buscador.buscar(mun, dep) or mun
+        for dep, mun in zip(sin_match['DEPARTAMENTO'], sin_match['MUNICIPIO'])
+    ]
     df_2021 = df_2021.merge(sin_match[['DEPARTAMENTO', 'MUNICIPIO', 'MUNICIPIO_CORREGIDO']],
                             on=['DEPARTAMENTO', 'MUNICIPIO'], how='left')
     df_2021['MUNICIPIO'] = df_2021['MUNICIPIO_CORREGIDO'].fillna(df_2021['MUNICIPIO'])
@@ -3186,40 +2738,17 @@ display(sin_match_final.head(30))
 print(f"\n✅ Base unida correctamente: {merged_final.shape[0]:,} filas × {merged_final.shape[1]} columnas")
 
 import pandas as pd
-import unidecode
-from difflib import get_close_matches
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
 
 # --- 2. Filtrar y corregir municipios irregulares ---
 nombres_irregulares = ['ACIDO', 'AGUA CALIENTE', 'VEHICULO', 'NAN', 'NO REPORTADO', 'SIN EMPLEO DE ARMAS']
 df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].replace(nombres_irregulares, 'DESCONOCIDO')
 
-# --- 3. Crear un diccionario de referencia municipio → departamento correcto ---
-mapa_mpios_correctos = divipola.set_index('nom_mpio')['dpto'].to_dict()
-
-# Si el municipio existe en el diccionario y su dpto no coincide, se corrige
-def corregir_departamento(row):
-    mun = row['MUNICIPIO']
-    dep_actual = row['DEPARTAMENTO']
-    dep_correcto = mapa_mpios_correctos.get(mun, dep_actual)
-    return dep_correcto
-
-df_2021['DEPARTAMENTO'] = df_2021.apply(corregir_departamento, axis=1)
+# --- 3. Departamento correcto segun el municipio (solo nombres unicos en DIVIPOLA) ---
+df_2021['DEPARTAMENTO'] = corregir_departamento(df_2021, divipola)
 
 # --- 4. Normalizar departamentos y municipios ---
-df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].apply(normalizar)
-df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2021['DEPARTAMENTO'] = df_2021['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2021['MUNICIPIO'] = df_2021['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 5. Rehacer merge después de corrección de departamento ---
 merged_final = df_2021.merge(
@@ -3241,15 +2770,14 @@ print(f"✅ Municipios sin coincidencia tras corrección: {len(sin_match_final)}
 display(sin_match_final)
 
 # --- 7. Corrección automática de errores de digitación ---
-municipios_divipola = divipola['nom_mpio'].unique().tolist()
-
-def corregir_nombre(nombre, cutoff=0.75):  # Umbral ajustado
-    match = get_close_matches(nombre, municipios_divipola, n=1, cutoff=cutoff)
-    return match[0] if match else nombre
+buscador = BuscadorDifuso.desde_divipola(divipola, corte=0.75)  # Umbral ajustado
 
 # Aplicar corrección automática a los municipios sin coincidencia
 if not sin_match_final.empty:
-    sin_match_final['MUNICIPIO_CORREGIDO'] = sin_match_final['MUNICIPIO'].apply(corregir_nombre)
+    sin_match_final['MUNICIPIO_CORREGIDO'] = [
+        buscador.buscar(mun, dep) or mun
+        for dep, mun in zip(sin_match_final['DEPARTAMENTO'], sin_match_final['MUNICIPIO'])
+    ]
 
     # Aplicar correcciones automáticas
     df_2021 = df_2021.merge(sin_match_final[['DEPARTAMENTO', 'MUNICIPIO', 'MUNICIPIO_CORREGIDO']],
@@ -3287,23 +2815,8 @@ print(f"\n✅ Base unida correctamente: {merged_final.shape[0]:,} filas × {merg
 # ==========================================================
 # 7. Correcciones manuales finales (últimos municipios)
 # ==========================================================
-correcciones_municipios_finales = {
-    # Casos de departamentos mal asignados
-    ('BOLIVAR', 'CARTAGO'): ('VALLE DEL CAUCA', 'CARTAGO'),
-    ('CAUCA', 'SOTAQUIRA'): ('BOYACA', 'SOTAQUIRA'),
-    ('TOLIMA', 'ARAUQUITA'): ('ARAUCA', 'ARAUQUITA'),
-
-    # Casos de nombres incompletos o con error tipográfico
-    ('NARINO', 'CUASPUD'): ('NARIÑO', 'CUASPUD - CARLOSAMA'),
-    ('ANTIOQUIA', 'SAN VICENTE'): ('ANTIOQUIA', 'SAN VICENTE FERRER'),
-    ('TOLIMA', 'MARIQUITA'): ('TOLIMA', 'SAN SEBASTIAN DE MARIQUITA'),
-    ('VALLE DEL CAUCA', 'CALI'): ('VALLE DEL CAUCA', 'SANTIAGO DE CALI')
-}
-
-# Aplicar las correcciones
-for (dep, mun), (dep_corr, mun_corr) in correcciones_municipios_finales.items():
-    mask = (df_2021['DEPARTAMENTO'] == dep) & (df_2021['MUNICIPIO'] == mun)
-    df_2021.loc[mask, ['DEPARTAMENTO', 'MUNICIPIO']] = dep_corr, mun_corr
+# Reglas de datos/correcciones.yaml, aplicadas sobre los pares distintos
+df_2021 = aplicar_correcciones(df_2021, cargar_reglas())
 
 # Rehacer el merge final
 merged_final = df_2021.merge(
@@ -3373,16 +2886,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -3408,16 +2917,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -3451,21 +2952,13 @@ for col in pob_2021.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2021.columns:
     if pob_2021[col].dtype == 'object':
-        pob_2021[col] = pob_2021[col].apply(normalizar_texto)
+        pob_2021[col] = pob_2021[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2021.head(10))
@@ -3475,23 +2968,11 @@ print(f"Total de municipios en pob_2021: {len(municipios_pob)}\n")
 print(municipios_pob)
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2021[col] = pob_2021[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2021[col] = pob_2021[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
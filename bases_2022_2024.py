@@ -8,128 +8,82 @@ Original file is located at
 """
 
 
-
 """2022"""
 
 import pandas as pd
 
+from src.ingesta.cache import ruta_local
+from src.ingesta.divipola import cargar_divipola
+from src.ingesta.encabezado import leer_con_encabezado
+from src.ingesta.esquema import renombrar
+from src.ingesta.lector import limpiar_lote
+from src.ingesta.motores import ERRORES_LECTURA
+from src.ingesta.normalizacion import limpiar_municipio, normalizar, normalizar_celdas
+from src.ingesta.poblacion import cargar_poblacion
+from src.transformacion.fechas import parsear_fechas
+
 def cargar_delito(url, delito, debug=False):
-    # Posibles filas de encabezado (varía entre archivos)
-    posibles_headers = [9, 10, 11, 12, 8, 7, 6, 13, 14, 15]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-
-            # 🔧 Normalizar nombres de columnas
-            df.columns = (
-                df.columns.astype(str)
-                .str.strip()
-                .str.upper()
-                .str.replace(" ", "_")
-                .str.replace("*", "")
-                .str.replace("/", "_")
-            )
-
-            if debug:
-                print(f"\n🔍 {delito} - Header {header_row}:")
-                print(f"Columnas encontradas: {list(df.columns[:10])}")
-
-            # 🔤 Corregir errores comunes de nombres
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_MEDIO": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA": "FECHA_HECHO",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "AGRUPA_EDAD_PER_SONA": "AGRUPA_EDAD_PERSONA",
-                "MUNICICPIO": "MUNICIPIO",  # 👈 Corregido
-                "DEPARTAMENTO_": "DEPARTAMENTO",  # por si hay espacio o guion
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            # 🔍 Filtrar columnas válidas
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            columnas_presentes = [col for col in columnas_validas if col in df.columns]
-            tiene_ubicacion = "DEPARTAMENTO" in columnas_presentes or "MUNICIPIO" in columnas_presentes
-            tiene_suficientes = len(columnas_presentes) >= 3
-
-            if not (tiene_ubicacion and tiene_suficientes):
-                if debug:
-                    print(f"   ❌ Solo tiene {len(columnas_presentes)} columnas válidas: {columnas_presentes}")
-                continue
-
-            if debug:
-                print(f"   ✅ Tiene {len(columnas_presentes)} columnas válidas: {columnas_presentes}")
-
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            # 🧹 Eliminar filas completamente vacías
-            df = df.dropna(how="all")
-
-            # 🧹 Eliminar filas donde las columnas de ubicación estén vacías
-            if "DEPARTAMENTO" in df.columns and "MUNICIPIO" in df.columns:
-                df = df.dropna(subset=["DEPARTAMENTO", "MUNICIPIO"], how="all")
-            elif "DEPARTAMENTO" in df.columns:
-                df = df.dropna(subset=["DEPARTAMENTO"])
-            elif "MUNICIPIO" in df.columns:
-                df = df.dropna(subset=["MUNICIPIO"])
-
-            # 🧱 Cortar desde "TOTAL" hacia abajo si aparece
-            for col in ["DEPARTAMENTO", "MUNICIPIO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    mask_total = df[col].astype(str).str.contains("TOTAL", na=False, case=False)
-                    if mask_total.any():
-                        primera_fila_total = mask_total.idxmax()
-                        df = df.loc[:primera_fila_total - 1]
-                        break
-
-            # 🧽 Limpieza reforzada
-            basura_regex = (
-                "TOTAL|FUENTE|SIEDCO|Elaborado|Revisado|Autorizado|Ley 1098|"
-                "Agrupación referente|Contador|DUIN|POLICÍA NACIONAL|"
-                "DIRECCIÓN|GRUPO DE INFORMACIÓN|LESIONES|PERÍODO|MINISTERIO"
-            )
-            for col in ["DEPARTAMENTO", "MUNICIPIO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            # Eliminar filas vacías o con solo espacios
-            df = df[df.apply(lambda row: row.astype(str).str.strip().str.len().gt(0).any(), axis=1)]
-
-            # Eliminar filas sin municipio
-            if "MUNICIPIO" in df.columns:
-                df = df[df["MUNICIPIO"].notna() & (df["MUNICIPIO"].astype(str).str.strip() != "")]
-
-            # Convertir código DANE a numérico
-            if "CODIGO_DANE" in df.columns:
-                df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-            # Agregar tipo de delito
-            df["TIPO_DELITO"] = delito
-
-            if not df.empty:
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-
-        except Exception as e:
-            if debug:
-                print(f"❌ Error en header {header_row}: {str(e)}")
-            continue
-
-    print(f"⚠️ {delito}: no se pudo leer con headers {posibles_headers}")
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        if debug:
+            print(f"   Intenta ejecutar: cargar_delito('{url}', '{delito}', debug=True)")
+        return pd.DataFrame()
+
+    # 🔧 Normalizar nombres de columnas
+    df.columns = (
+        df.columns.astype(str)
+        .str.strip()
+        .str.upper()
+        .str.replace(" ", "_")
+        .str.replace("*", "")
+        .str.replace("/", "_")
+    )
+
+    if debug:
+        print(f"\n🔍 {delito} - Header {header_row}:")
+        print(f"Columnas encontradas: {list(df.columns[:10])}")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # 🔍 Filtrar columnas válidas
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    columnas_presentes = [col for col in columnas_validas if col in df.columns]
+    tiene_ubicacion = "DEPARTAMENTO" in columnas_presentes or "MUNICIPIO" in columnas_presentes
+    tiene_suficientes = len(columnas_presentes) >= 3
+
+    if not (tiene_ubicacion and tiene_suficientes):
+        print(f"⚠️ {delito}: solo tiene {len(columnas_presentes)} columnas válidas: {columnas_presentes}")
+        return pd.DataFrame()
+
     if debug:
-        print(f"   Intenta ejecutar: cargar_delito('{url}', '{delito}', debug=True)")
-    return pd.DataFrame()
+        print(f"   ✅ Tiene {len(columnas_presentes)} columnas válidas: {columnas_presentes}")
+
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    df = limpiar_lote(df, ultimo=True)
+
+    # Eliminar filas sin municipio
+    if "MUNICIPIO" in df.columns:
+        df = df[df["MUNICIPIO"].notna() & (df["MUNICIPIO"].astype(str).str.strip() != "")]
+
+    # Agregar tipo de delito
+    df["TIPO_DELITO"] = delito
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+    else:
+        print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 # Diccionario de URLs y delitos 2022
 urls_2022 = [
@@ -176,28 +130,17 @@ for col in df_2022.columns:
     print(df_2022[col].dropna().unique())  # quitar nulos antes de listar
     print(f"Total de valores únicos: {df_2022[col].nunique()}")
 
-# Commented out IPython magic to ensure Python compatibility.
-# %pip install unidecode
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- Estandarizar DEPARTAMENTO ---
 df_2022['DEPARTAMENTO'] = df_2022['DEPARTAMENTO'].astype(str).str.strip().str.upper()
-df_2022['DEPARTAMENTO'] = df_2022['DEPARTAMENTO'].apply(lambda x: unidecode.unidecode(x))
+df_2022['DEPARTAMENTO'] = df_2022['DEPARTAMENTO'].pipe(normalizar)
 
 # --- Estandarizar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return nombre
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)  # eliminar (CT)
-    nombre = unidecode.unidecode(nombre)     # quitar tildes
-    return nombre
-
-df_2022['MUNICIPIO'] = df_2022['MUNICIPIO'].apply(limpiar_municipio)
+df_2022['MUNICIPIO'] = df_2022['MUNICIPIO'].pipe(limpiar_municipio)
 
 # Reemplazar 'NAN' como string por NaN
 df_2022['MUNICIPIO'] = df_2022['MUNICIPIO'].replace('NAN', np.nan)
@@ -206,14 +149,7 @@ df_2022['MUNICIPIO'] = df_2022['MUNICIPIO'].replace('NAN', np.nan)
 df_2022 = df_2022.dropna(subset=['MUNICIPIO'])
 
 # --- Arreglar FECHA_HECHO ---
-def convertir_fecha(valor):
-    if isinstance(valor, (float, int)):
-        valor_str = str(int(valor))
-        return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-    else:
-        return pd.to_datetime(valor, errors='coerce')
-
-df_2022['FECHA_HECHO'] = df_2022['FECHA_HECHO'].apply(convertir_fecha)
+df_2022['FECHA_HECHO'] = df_2022['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- Resumen de nulos ---
 resumen_nulos = pd.DataFrame({
@@ -310,14 +246,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -331,7 +262,7 @@ df_2022['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2022['DEPARTAMENTO'] = (
@@ -339,7 +270,7 @@ df_2022['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # =========================================================
@@ -348,23 +279,10 @@ df_2022['DEPARTAMENTO'] = (
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2022['DEPARTAMENTO'] = df_2022['DEPARTAMENTO'].apply(normalizar)
-df_2022['MUNICIPIO'] = df_2022['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2022['DEPARTAMENTO'] = df_2022['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2022['MUNICIPIO'] = df_2022['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Eliminar registros sin información ---
 df_2022 = df_2022[~df_2022['MUNICIPIO'].isin(['NO REGISTRA'])]
@@ -473,26 +391,15 @@ print(f"\n✅ Base unida correctamente: {merged_final.shape[0]:,} filas × {merg
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
 
 # --- 2. Normalizar texto en df_2022 y divipola ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
     if col in df_2022.columns:
-        df_2022[col] = df_2022[col].astype(str).apply(normalizar)
+        df_2022[col] = df_2022[col].astype(str).pipe(normalizar, nulo="")
 
 for col in ['dpto', 'nom_mpio']:
      if col in divipola.columns:
-        divipola[col] = divipola[col].astype(str).apply(normalizar)
+        divipola[col] = divipola[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios (df_2022) ---
@@ -660,16 +567,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -695,16 +598,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -738,21 +633,13 @@ for col in pob_2022.columns:
 # 🔠 PASAR TODA LA BASE pob_2022 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2022.columns:
     if pob_2022[col].dtype == 'object':
-        pob_2022[col] = pob_2022[col].apply(normalizar_texto)
+        pob_2022[col] = pob_2022[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2022.head(10))
@@ -767,23 +654,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2022[col] = pob_2022[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2022[col] = pob_2022[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
@@ -893,56 +768,39 @@ for col in df_final_pob.columns:
 """2023"""
 
 def cargar_delito(url, delito):
-    # Probar varios posibles encabezados
-    posibles_headers = [8, 9, 10, 11, 12]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-            df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
-
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            df = df.dropna(how="all")
-
-            basura_regex = "TOTAL|FUENTE|Elaborado|Revisado|Autorizado|Ley 1098|Agrupación referente|Contador"
-            for col in ["DEPARTAMENTO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            if not df.empty:
-                if "CODIGO_DANE" in df.columns:
-                    df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-                df["TIPO_DELITO"] = delito
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-        except Exception:
-            continue
-
-    # Si llegó aquí, falló con todas
-    print(f"⚠️ {delito}: no se pudo leer con headers {posibles_headers}")
-    return pd.DataFrame()
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        return pd.DataFrame()
+
+    # Normalizar nombres
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(" ", "_")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # Seleccionar solo columnas clave
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    # (CODIGO_DANE queda numérico)
+    df = limpiar_lote(df, ultimo=True)
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+        return pd.DataFrame()
+
+    df["TIPO_DELITO"] = delito
+    print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 # Diccionario de URLs y delitos 2023
 urls_2023 = [
@@ -989,28 +847,17 @@ for col in df_2023.columns:
     print(df_2023[col].dropna().unique())  # quitar nulos antes de listar
     print(f"Total de valores únicos: {df_2023[col].nunique()}")
 
-# Commented out IPython magic to ensure Python compatibility.
-# %pip install unidecode
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- Estandarizar DEPARTAMENTO ---
 df_2023['DEPARTAMENTO'] = df_2023['DEPARTAMENTO'].astype(str).str.strip().str.upper()
-df_2023['DEPARTAMENTO'] = df_2023['DEPARTAMENTO'].apply(lambda x: unidecode.unidecode(x))
+df_2023['DEPARTAMENTO'] = df_2023['DEPARTAMENTO'].pipe(normalizar)
 
 # --- Estandarizar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return nombre
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)  # eliminar (CT)
-    nombre = unidecode.unidecode(nombre)     # quitar tildes
-    return nombre
-
-df_2023['MUNICIPIO'] = df_2023['MUNICIPIO'].apply(limpiar_municipio)
+df_2023['MUNICIPIO'] = df_2023['MUNICIPIO'].pipe(limpiar_municipio)
 
 # Reemplazar 'NAN' como string por NaN
 df_2023['MUNICIPIO'] = df_2023['MUNICIPIO'].replace('NAN', np.nan)
@@ -1019,14 +866,7 @@ df_2023['MUNICIPIO'] = df_2023['MUNICIPIO'].replace('NAN', np.nan)
 df_2023 = df_2023.dropna(subset=['MUNICIPIO'])
 
 # --- Arreglar FECHA_HECHO ---
-def convertir_fecha(valor):
-    if isinstance(valor, (float, int)):
-        valor_str = str(int(valor))
-        return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-    else:
-        return pd.to_datetime(valor, errors='coerce')
-
-df_2023['FECHA_HECHO'] = df_2023['FECHA_HECHO'].apply(convertir_fecha)
+df_2023['FECHA_HECHO'] = df_2023['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- Resumen de nulos ---
 resumen_nulos = pd.DataFrame({
@@ -1123,14 +963,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -1144,7 +979,7 @@ df_2023['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2023['DEPARTAMENTO'] = (
@@ -1152,28 +987,15 @@ df_2023['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2023['DEPARTAMENTO'] = df_2023['DEPARTAMENTO'].apply(normalizar)
-df_2023['MUNICIPIO'] = df_2023['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2023['DEPARTAMENTO'] = df_2023['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2023['MUNICIPIO'] = df_2023['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Eliminar registros sin información ---
 df_2023 = df_2023[~df_2023['MUNICIPIO'].isin(['NO REGISTRA'])]
@@ -1286,16 +1108,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -1321,16 +1139,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -1364,21 +1174,13 @@ for col in pob_2023.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2023.columns:
     if pob_2023[col].dtype == 'object':
-        pob_2023[col] = pob_2023[col].apply(normalizar_texto)
+        pob_2023[col] = pob_2023[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2023.head(10))
@@ -1393,23 +1195,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2023[col] = pob_2023[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2023[col] = pob_2023[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
@@ -1520,56 +1310,39 @@ for col in df_final_pob.columns:
 
 import pandas as pd
 def cargar_delito(url, delito):
-    # Probar varios posibles encabezados
-    posibles_headers = [8, 9, 10, 11, 12]
-
-    for header_row in posibles_headers:
-        try:
-            df = pd.read_excel(url, header=header_row).copy()
-            df.columns = df.columns.str.strip().str.upper().str.replace(" ", "_")
-
-            renombrar = {
-                "ARMAS_MEDIOS": "ARMAS_MEDIOS",
-                "ARMA_MEDIO": "ARMAS_MEDIOS",
-                "ARMAS/MEDIOS": "ARMAS_MEDIOS",
-                "ARMAS_Y_MEDIOS": "ARMAS_MEDIOS",
-                "CODIGO_DANE": "CODIGO_DANE",
-                "FECHA_HECHO": "FECHA_HECHO",
-                "GENERO": "GENERO",
-                "CANTIDAD": "CANTIDAD",
-                "AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA": "AGRUPA_EDAD_PERSONA",
-                "*AGRUPA_EDAD_PERSONA*": "AGRUPA_EDAD_PERSONA"
-            }
-            df = df.rename(columns=lambda x: renombrar.get(x, x))
-
-            columnas_validas = [
-                "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
-                "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
-                "AGRUPA_EDAD_PERSONA", "CANTIDAD"
-            ]
-            df = df[[col for col in columnas_validas if col in df.columns]]
-
-            df = df.dropna(how="all")
-
-            basura_regex = "TOTAL|FUENTE|Elaborado|Revisado|Autorizado|Ley 1098|Agrupación referente|Contador"
-            for col in ["DEPARTAMENTO", "ARMAS_MEDIOS"]:
-                if col in df.columns:
-                    df = df[~df[col].astype(str).str.contains(basura_regex, na=False, case=False)]
-
-            if not df.empty:
-                if "CODIGO_DANE" in df.columns:
-                    df["CODIGO_DANE"] = pd.to_numeric(df["CODIGO_DANE"], errors="coerce")
-
-                df["TIPO_DELITO"] = delito
-                print(f"📌 {delito}: encabezado fijo en fila {header_row}")
-                return df
-        except Exception:
-            continue
-
-    # Si llegó aquí, falló con todas
-    print(f"⚠️ {delito}: no se pudo leer con headers {posibles_headers}")
-    return pd.DataFrame()
+    # Detectar la fila de encabezado en una sola lectura de las primeras filas
+    # y leer el cuerpo una única vez desde esa fila
+    try:
+        df, header_row = leer_con_encabezado(ruta_local(url))
+    except ERRORES_LECTURA as e:
+        print(f"⚠️ {delito}: no se pudo leer ({e})")
+        return pd.DataFrame()
+
+    # Normalizar nombres
+    df.columns = df.columns.astype(str).str.strip().str.upper().str.replace(" ", "_")
+
+    # Unificar nombres con el registro de esquema
+    df = renombrar(df)
+
+    # Seleccionar solo columnas clave
+    columnas_validas = [
+        "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+        "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+        "AGRUPA_EDAD_PERSONA", "CANTIDAD"
+    ]
+    df = df[[col for col in columnas_validas if col in df.columns]]
+
+    # 🧹 Cortar el pie desde el final y quitar filas vacias o basura en una sola pasada
+    # (CODIGO_DANE queda numérico)
+    df = limpiar_lote(df, ultimo=True)
+
+    if df.empty:
+        print(f"⚠️ {delito}: sin filas válidas con encabezado en fila {header_row}")
+        return pd.DataFrame()
+
+    df["TIPO_DELITO"] = delito
+    print(f"📌 {delito}: encabezado detectado en fila {header_row}")
+    return df
 
 
     # ------------------------
@@ -1619,28 +1392,17 @@ for col in df_2024.columns:
     print(df_2024[col].dropna().unique())  # quitar nulos antes de listar
     print(f"Total de valores únicos: {df_2024[col].nunique()}")
 
-# Commented out IPython magic to ensure Python compatibility.
-# %pip install unidecode
 
 import pandas as pd
 import numpy as np
-import unidecode
 import re
 
 # --- Estandarizar DEPARTAMENTO ---
 df_2024['DEPARTAMENTO'] = df_2024['DEPARTAMENTO'].astype(str).str.strip().str.upper()
-df_2024['DEPARTAMENTO'] = df_2024['DEPARTAMENTO'].apply(lambda x: unidecode.unidecode(x))
+df_2024['DEPARTAMENTO'] = df_2024['DEPARTAMENTO'].pipe(normalizar)
 
 # --- Estandarizar MUNICIPIO ---
-def limpiar_municipio(nombre):
-    if pd.isna(nombre):
-        return nombre
-    nombre = str(nombre).upper().strip()
-    nombre = re.sub(r'\(CT\)', '', nombre)  # eliminar (CT)
-    nombre = unidecode.unidecode(nombre)     # quitar tildes
-    return nombre
-
-df_2024['MUNICIPIO'] = df_2024['MUNICIPIO'].apply(limpiar_municipio)
+df_2024['MUNICIPIO'] = df_2024['MUNICIPIO'].pipe(limpiar_municipio)
 
 # Reemplazar 'NAN' como string por NaN
 df_2024['MUNICIPIO'] = df_2024['MUNICIPIO'].replace('NAN', np.nan)
@@ -1649,14 +1411,7 @@ df_2024['MUNICIPIO'] = df_2024['MUNICIPIO'].replace('NAN', np.nan)
 df_2024 = df_2024.dropna(subset=['MUNICIPIO'])
 
 # --- Arreglar FECHA_HECHO ---
-def convertir_fecha(valor):
-    if isinstance(valor, (float, int)):
-        valor_str = str(int(valor))
-        return pd.to_datetime(valor_str, format='%Y%m%d', errors='coerce')
-    else:
-        return pd.to_datetime(valor, errors='coerce')
-
-df_2024['FECHA_HECHO'] = df_2024['FECHA_HECHO'].apply(convertir_fecha)
+df_2024['FECHA_HECHO'] = df_2024['FECHA_HECHO'].pipe(parsear_fechas)
 
 # --- Resumen de nulos ---
 resumen_nulos = pd.DataFrame({
@@ -1753,14 +1508,9 @@ import pandas as pd
 import requests
 import numpy as np
 
-# --------------------------
-# URLs de insumos externos
-# --------------------------
-url_poblacion = "https://www.dane.gov.co/files/censo2018/proyecciones-de-poblacion/Municipal/PPED-AreaSexoEdadMun-2018-2042_VP.xlsx"
-api_url_divipola = "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=2000"
-
-# Cargar DIVIPOLA desde la API de datos abiertos
-divipola = pd.read_json(api_url_divipola)
+# Insumos externos (URLs en la seccion insumos de datos/catalogo.yaml)
+# Cargar DIVIPOLA (copia local normalizada, una descarga por proceso)
+divipola = cargar_divipola().copy()
 
 # Mostrar las columnas originales
 print("🧐 Columnas originales en DIVIPOLA:")
@@ -1774,7 +1524,7 @@ df_2024['MUNICIPIO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 df_2024['DEPARTAMENTO'] = (
@@ -1782,28 +1532,15 @@ df_2024['DEPARTAMENTO'] = (
     .astype(str)
     .str.strip()
     .str.upper()
-    .apply(lambda x: unidecode.unidecode(x))
+    .pipe(normalizar)
 )
 
 # --- 1. Importar librerías ---
 import pandas as pd
-import unidecode
-
-# --- 2. Normalización de texto ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes, espacios extra y caracteres no estándar"""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # elimina dobles espacios
-    return texto
 
 # --- 3. Estandarizar nombres en ambas bases ---
-df_2024['DEPARTAMENTO'] = df_2024['DEPARTAMENTO'].apply(normalizar)
-df_2024['MUNICIPIO'] = df_2024['MUNICIPIO'].apply(normalizar)
-divipola['dpto'] = divipola['dpto'].apply(normalizar)
-divipola['nom_mpio'] = divipola['nom_mpio'].apply(normalizar)
+df_2024['DEPARTAMENTO'] = df_2024['DEPARTAMENTO'].pipe(normalizar, nulo="")
+df_2024['MUNICIPIO'] = df_2024['MUNICIPIO'].pipe(normalizar, nulo="")
 
 # --- 4. Eliminar registros sin información ---
 df_2024 = df_2024[~df_2024['MUNICIPIO'].isin(['NO REGISTRA'])]
@@ -1916,16 +1653,12 @@ print(faltante_en_divipola)
 # ========================================
 
 import pandas as pd
-import unidecode
 
 print("\n📥 Descargando datos de población...")
 
 # Leer archivo Excel del DANE
-pob = pd.read_excel(
-    url_poblacion,
-    sheet_name='PobMunicipalxÁreaSexoEdad',
-    header=7
-)
+# Poblacion DANE: una sola lectura del libro, filas de area Total
+pob = cargar_poblacion().copy()
 
 # --- Normalizar nombres de columnas ---
 pob.columns = (
@@ -1951,16 +1684,8 @@ if 'MPNOM' not in pob.columns and 'MPIO' in pob.columns:
     pob = pob.rename(columns={'MPIO': 'MPNOM'})
 
 # --- Normalizar texto de nombres ---
-def normalizar(texto):
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())
-    return texto
-
-pob['DPNOM'] = pob['DPNOM'].apply(normalizar)
-pob['MPNOM'] = pob['MPNOM'].apply(normalizar)
+pob['DPNOM'] = pob['DPNOM'].pipe(normalizar, nulo="")
+pob['MPNOM'] = pob['MPNOM'].pipe(normalizar, nulo="")
 
 # --- Filtrar solo filas donde el área geográfica sea TOTAL o TOTALES ---
 if 'AREA_GEOGRAFICA' in pob.columns:
@@ -1994,21 +1719,13 @@ for col in pob_2024.columns:
 # 🔠 PASAR TODA LA BASE pob_2018 A MAYÚSCULAS Y NORMALIZAR
 # ====================================================
 
-import unidecode
 import pandas as pd
 
-def normalizar_texto(valor):
-    """Convierte todo texto a mayúsculas, quita tildes y espacios dobles."""
-    if isinstance(valor, str):
-        valor = unidecode.unidecode(valor)  # quita tildes
-        valor = valor.upper().strip()
-        valor = ' '.join(valor.split())      # elimina espacios dobles
-    return valor
 
 # Aplicar a todas las columnas de tipo texto
 for col in pob_2024.columns:
     if pob_2024[col].dtype == 'object':
-        pob_2024[col] = pob_2024[col].apply(normalizar_texto)
+        pob_2024[col] = pob_2024[col].pipe(normalizar_celdas)
 
 print("✅ Toda la base de población está ahora en MAYÚSCULAS y sin tildes.")
 display(pob_2024.head(10))
@@ -2022,23 +1739,11 @@ print(municipios_pob)
 # =========================================================
 
 import pandas as pd
-import unidecode
-
-# --- 1. Función de normalización ---
-def normalizar(texto):
-    """Convierte a mayúsculas, elimina tildes y espacios extra."""
-    if pd.isna(texto):
-        return ''
-    texto = str(texto).strip().upper()
-    texto = unidecode.unidecode(texto)
-    texto = ' '.join(texto.split())  # quita espacios dobles
-    return texto
-
 
 # --- 2. Normalizar texto en todas las bases ---
 for col in ['DEPARTAMENTO', 'MUNICIPIO']:
-    merged_final[col] = merged_final[col].astype(str).apply(normalizar)
-    pob_2024[col] = pob_2024[col].astype(str).apply(normalizar)
+    merged_final[col] = merged_final[col].astype(str).pipe(normalizar, nulo="")
+    pob_2024[col] = pob_2024[col].astype(str).pipe(normalizar, nulo="")
 
 
 # --- 3. Reemplazos y correcciones en municipios ---
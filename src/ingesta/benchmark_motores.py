@@ -0,0 +1,105 @@
+"""
+Micro-benchmark de los motores de lectura de Excel.
+
+Recorre cada libro con cada motor instalado que soporte su extension y
+reporta filas por segundo. Por defecto usa los libros ya descargados en
+``datos/raw/<fuente>/``; el resultado queda en
+``artifacts/benchmark_motores.json``.
+
+Uso:
+    poetry run python -m src.ingesta.benchmark_motores [RUTAS ...] [--repeticiones N]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from src.ingesta.metricas import ARTIFACTS_DIR
+from src.ingesta.motores import iterar_filas, motores_para
+
+RAW_DIR = Path("datos/raw")
+EXTENSIONES = (".xls", ".xlsx", ".xlsm")
+
+
+def medir(ruta: Path, motor: str, repeticiones: int = 1) -> dict:
+    """Filas y mejor tiempo de recorrer ``ruta`` completa con ``motor``."""
+    tiempos, filas = [], 0
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = sum(1 for _ in iterar_filas(ruta, motor=motor))
+        tiempos.append(time.perf_counter() - inicio)
+    segundos = min(tiempos)
+    return {
+        "ruta": str(ruta),
+        "motor": motor,
+        "bytes": ruta.stat().st_size,
+        "filas": filas,
+        "segundos": round(segundos, 4),
+        "filas_s": round(filas / segundos) if segundos else None,
+    }
+
+
+def libros(raiz: Path = RAW_DIR) -> list[Path]:
+    """Libros Excel bajo ``raiz`` (sin el cache)."""
+    return sorted(
+        r for r in Path(raiz).glob("*/*")
+        if r.suffix.lower() in EXTENSIONES and not r.parent.name.startswith("_")
+    )
+
+
+def comparar(rutas: list[Path], repeticiones: int = 1, verbose: bool = True) -> list[dict]:
+    resultados = []
+    for ruta in rutas:
+        for motor in motores_para(ruta):
+            res = medir(ruta, motor, repeticiones)
+            resultados.append(res)
+            if verbose:
+                print(f"⏱️ {ruta.parent.name}/{ruta.name} [{motor}]: {res['filas']:,} filas "
+                      f"en {res['segundos']:.2f}s ({res['filas_s'] or 0:,} filas/s)")
+    return resultados
+
+
+def resumen(resultados: list[dict]) -> dict[str, dict]:
+    """Filas/s agregadas por motor (total de filas / total de segundos)."""
+    por_motor = {}
+    for r in resultados:
+        acumulado = por_motor.setdefault(r["motor"], {"libros": 0, "filas": 0, "segundos": 0.0})
+        acumulado["libros"] += 1
+        acumulado["filas"] += r["filas"]
+        acumulado["segundos"] += r["segundos"]
+    for acumulado in por_motor.values():
+        acumulado["filas_s"] = (round(acumulado["filas"] / acumulado["segundos"])
+                                if acumulado["segundos"] else None)
+    return por_motor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de motores de lectura de Excel")
+    parser.add_argument("rutas", nargs="*", type=Path,
+                        help="Libros a medir (default: todos los de datos/raw)")
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--artifacts-dir", type=Path, default=ARTIFACTS_DIR)
+    args = parser.parse_args(argv)
+
+    rutas = args.rutas or libros(args.raw_dir)
+    if not rutas:
+        print(f"⚠️ No hay libros en {args.raw_dir}; correr primero la ingesta")
+        return 1
+    resultados = comparar(rutas, args.repeticiones)
+    por_motor = resumen(resultados)
+
+    print("\n📊 Filas por segundo por motor:")
+    for motor, r in sorted(por_motor.items(), key=lambda x: -(x[1]["filas_s"] or 0)):
+        print(f"   {motor:<10} {r['filas_s'] or 0:>12,} filas/s  ({r['libros']} libros, "
+              f"{r['filas']:,} filas)")
+
+    args.artifacts_dir.mkdir(parents=True, exist_ok=True)
+    with open(args.artifacts_dir / "benchmark_motores.json", "w", encoding="utf-8") as f:
+        json.dump({"resumen": por_motor, "libros": resultados}, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,246 @@
+"""
+Capa bronce: cada libro crudo convertido una sola vez a Parquet tipado.
+
+Decodificar Excel es trabajo de CPU, asi que cada libro (fuente, clave) se
+parsea en un proceso distinto de un ``ProcessPoolExecutor``. Cada proceso
+escribe ``datos/interim/bronze/<fuente>/<clave>.parquet`` y devuelve solo
+la ruta y unos pocos metadatos, en lugar de enviar DataFrames serializados
+al proceso principal. Dentro de cada proceso el libro no se arma completo:
+cada lote de ``leer_por_lotes`` se tipa y se agrega al Parquet con
+``escribir_por_lotes``. Los procesos atienden un solo libro
+(``max_tasks_per_child=1``): el pico de memoria que reportan es el de ese
+libro y no el acumulado del trabajador.
+
+Los metadatos del esquema Parquet guardan la URL de origen, la fila de
+encabezado detectada y el SHA-256 del archivo crudo; si el crudo no cambio,
+el Parquet existente se reutiliza sin volver a abrir el Excel. El SHA-256
+sale del manifiesto de ``datos/raw`` (ver ``src.ingesta.manifiesto``), asi
+que un crudo sin cambios no se vuelve a leer ni siquiera para hashearlo.
+Las etapas siguientes leen solo estos Parquet.
+"""
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.ingesta.catalogo import Recurso
+from src.ingesta.lector import escribir_por_lotes
+from src.ingesta.manifiesto import Manifiesto
+from src.ingesta.metricas import rss_pico_mb
+from src.ingesta.motores import ERRORES_LECTURA
+
+RAW_DIR = Path("datos/raw")
+BRONZE_DIR = Path("datos/interim/bronze")
+# Subir cuando cambie la forma de leer o tipar los libros
+VERSION_BRONCE = 5
+CLAVE_METADATOS = b"seguridad_convivencia"
+
+
+@dataclass
+class ResultadoBronce:
+    """Resultado de convertir un libro a Parquet."""
+
+    recurso: Recurso
+    ruta: Path | None
+    # Filas de la hoja despues del encabezado (None si se reutilizo el Parquet)
+    filas_leidas: int | None = 0
+    filas: int = 0
+    fila_encabezado: int | None = None
+    segundos: float = 0.0
+    reutilizado: bool = False
+    error: str | None = None
+    # Pico de RSS del proceso que convirtio el libro (None si se reutilizo)
+    rss_pico_mb: float | None = None
+    intercambios: dict | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def ruta_bronce(recurso: Recurso, raiz: Path = BRONZE_DIR) -> Path:
+    return Path(raiz) / recurso.fuente / f"{recurso.clave}.parquet"
+
+
+def leer_metadatos(ruta: Path) -> dict:
+    """Metadatos de origen guardados en un Parquet bronce ({} si no tiene)."""
+    metadata = pq.read_schema(ruta).metadata or {}
+    crudo = metadata.get(CLAVE_METADATOS)
+    return json.loads(crudo) if crudo else {}
+
+
+def escribir_parquet(df: pd.DataFrame, destino: Path, metadatos: dict):
+    """Escribir ``df`` con ``metadatos`` en el esquema, de forma atomica."""
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}),
+        CLAVE_METADATOS: json.dumps(metadatos, ensure_ascii=False).encode(),
+    })
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + ".tmp")
+    pq.write_table(tabla, temporal)
+    temporal.replace(destino)
+
+
+def convertir_recurso(recurso: Recurso, raw_dir: Path = RAW_DIR,
+                      bronze_dir: Path = BRONZE_DIR, forzar: bool = False,
+                      motor: str | None = None) -> ResultadoBronce:
+    """Convertir el libro local de ``recurso`` a Parquet bronce.
+
+    Si ya existe un Parquet de la misma version generado desde un crudo con
+    el mismo SHA-256, se reutiliza (salvo ``forzar=True``). ``motor`` fuerza
+    un motor de lectura de ``src.ingesta.motores``.
+    """
+    inicio = time.perf_counter()
+    destino = ruta_bronce(recurso, bronze_dir)
+    try:
+        origen = recurso.destino(raw_dir)
+        sha256 = Manifiesto(raw_dir).sha256(origen)
+        if destino.exists() and not forzar:
+            previos = leer_metadatos(destino)
+            if previos.get("sha256") == sha256 and previos.get("version") == VERSION_BRONCE:
+                return ResultadoBronce(recurso, destino, filas_leidas=None,
+                                       filas=pq.read_metadata(destino).num_rows,
+                                       fila_encabezado=previos["fila_encabezado"],
+                                       segundos=time.perf_counter() - inicio, reutilizado=True,
+                                       intercambios=previos.get("intercambios"))
+
+        def _metadatos(info):
+            # El escritor se abre con el primer lote: los conteos de filas no
+            # se conocen todavia y salen del pie del Parquet (``num_rows``)
+            return {CLAVE_METADATOS: json.dumps({
+                "version": VERSION_BRONCE,
+                "fuente": recurso.fuente,
+                "clave": recurso.clave,
+                "url": recurso.url,
+                "sha256": sha256,
+                "fila_encabezado": info["fila_encabezado"],
+                "motor": info["motor"],
+                "intercambios": info["intercambios"],
+            }, ensure_ascii=False).encode()}
+
+        info = {}
+        filas = escribir_por_lotes(origen, destino, metadatos=_metadatos, info=info, motor=motor,
+                                   constantes={
+                                       "TIPO_DELITO": (recurso.nombre or recurso.fuente).upper(),
+                                       "FUENTE": recurso.fuente,
+                                       "AÑO": recurso.anio,
+                                   })
+    except (*ERRORES_LECTURA, pa.ArrowException) as e:
+        return ResultadoBronce(recurso, None, segundos=time.perf_counter() - inicio,
+                               error=f"{type(e).__name__}: {e}", rss_pico_mb=rss_pico_mb())
+    return ResultadoBronce(recurso, destino, filas_leidas=info["filas_leidas"], filas=filas,
+                           fila_encabezado=info["fila_encabezado"],
+                           segundos=time.perf_counter() - inicio, rss_pico_mb=rss_pico_mb(),
+                           intercambios=info["intercambios"])
+
+
+def convertir_todo(recursos: list[Recurso], raw_dir: Path = RAW_DIR,
+                   bronze_dir: Path = BRONZE_DIR, jobs: int | None = None,
+                   forzar: bool = False, verbose: bool = True,
+                   motor: str | None = None) -> list[ResultadoBronce]:
+    """Convertir todos los recursos con ``jobs`` procesos (None = uno por CPU).
+
+    Los libros se envian al pool de mayor a menor tamano en disco, para que
+    el mas pesado no quede solo al final. Cada proceso convierte un solo
+    libro, para que ``rss_pico_mb`` sea el pico de ese libro. Con ``jobs=1``
+    se trabaja en el proceso actual, util para depurar (y ``rss_pico_mb`` es
+    el pico del proceso hasta ese libro). Los resultados se devuelven en el
+    mismo orden que ``recursos``.
+    """
+    resultados: list[ResultadoBronce | None] = [None] * len(recursos)
+
+    def _reportar(res):
+        if verbose:
+            r = res.recurso
+            if not res.ok:
+                print(f"⚠️ {r.fuente} {r.clave}: {res.error}")
+            elif res.reutilizado:
+                print(f"♻️ {r.fuente} {r.clave}: sin cambios, {res.filas:,} filas")
+            else:
+                print(f"📌 {r.fuente} {r.clave}: {res.filas:,} filas "
+                      f"(encabezado en fila {res.fila_encabezado}, {res.segundos:.1f}s)")
+                if res.intercambios:
+                    cambios = ", ".join(f"{a}->{b}" for a, b in res.intercambios.items())
+                    print(f"   🔀 columnas intercambiadas corregidas: {cambios}")
+
+    if jobs == 1:
+        for i, r in enumerate(recursos):
+            resultados[i] = convertir_recurso(r, raw_dir, bronze_dir, forzar, motor)
+            _reportar(resultados[i])
+        return resultados
+
+    def _tamano(i):
+        try:
+            return recursos[i].destino(raw_dir).stat().st_size
+        except OSError:
+            return 0
+
+    orden = sorted(range(len(recursos)), key=_tamano, reverse=True)
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as pool:
+        futuros = {
+            pool.submit(convertir_recurso, recursos[i], raw_dir, bronze_dir, forzar, motor): i
+            for i in orden
+        }
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            resultados[i] = futuro.result()
+            _reportar(resultados[i])
+    return resultados
+
+
+def rutas_bronce(bronze_dir: Path = BRONZE_DIR) -> list[Path]:
+    """Parquet bronce a consumir, uno por (fuente, anio).
+
+    Las variantes ``<anio>_vN`` se omiten cuando ya existe su union
+    ``<anio>.parquet`` (ver ``src.ingesta.variantes``).
+    """
+    rutas = sorted(Path(bronze_dir).glob("*/*.parquet"))
+    existentes = set(rutas)
+    return [
+        r for r in rutas
+        if "_v" not in r.stem
+        or r.with_name(r.stem.split("_v")[0] + ".parquet") not in existentes
+    ]
+
+
+def leer_bronce(bronze_dir: Path = BRONZE_DIR, fuentes=None, columnas=None) -> pd.DataFrame:
+    """Concatenar los Parquet bronce (opcionalmente solo algunas fuentes)."""
+    rutas = rutas_bronce(bronze_dir)
+    if fuentes:
+        rutas = [r for r in rutas if r.parent.name in fuentes]
+    frames = [pd.read_parquet(r, columns=columnas) for r in rutas]
+    if not frames:
+        return pd.DataFrame(columns=columnas)
+    return pd.concat(frames, ignore_index=True)
+
+
+def desactualizados(rutas: list[Path], manifiesto: Manifiesto) -> list[Path]:
+    """Parquet bronce cuyo crudo ya no coincide con el manifiesto.
+
+    Se comparan los SHA-256 guardados en los metadatos con los del
+    manifiesto y se pregunta al manifiesto si el crudo cambio: un crudo con
+    otro contenido se detecta por el hash rapido, y solo uno con otro
+    ``mtime`` pero los mismos extremos se vuelve a leer completo.
+    """
+    por_recurso = {
+        (e.get("fuente"), e.get("clave")): e for e in manifiesto.entradas.values()
+    }
+    resultado = []
+    for ruta in rutas:
+        metadatos = leer_metadatos(ruta)
+        for origen in metadatos.get("variantes") or [metadatos]:
+            entrada = por_recurso.get((origen.get("fuente"), origen.get("clave")))
+            if entrada is None:
+                continue
+            if (entrada["sha256"] != origen.get("sha256")
+                    or manifiesto.cambio(manifiesto.raiz / entrada["ruta"])):
+                resultado.append(ruta)
+                break
+    return resultado
@@ -0,0 +1,207 @@
+"""
+Cache local de archivos crudos con revalidacion HTTP condicional.
+
+Cada URL descargada se guarda una sola vez como objeto direccionado por su
+contenido (``objetos/<sha256><ext>``) y el indice ``indice.json`` recuerda,
+por URL, el SHA-256 y los validadores ``ETag`` / ``Last-Modified`` que
+devolvio el servidor. Las siguientes peticiones envian ``If-None-Match`` /
+``If-Modified-Since``; un 304 reutiliza el objeto sin volver a descargarlo.
+
+Dentro de un mismo proceso cada URL se revalida como maximo una vez, de modo
+que leer el mismo libro varias veces (p. ej. probando filas de encabezado)
+no genera trafico adicional.
+
+Las transferencias pasan por ``src.ingesta.transporte`` (reintentos y
+reanudacion con ``Range``); los ``.part`` a medio bajar quedan en
+``parciales/`` para continuar en la siguiente corrida.
+
+Uso:
+    from src.ingesta.cache import ruta_local
+    df = pd.read_excel(ruta_local(url), header=9)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from urllib.parse import unquote, urlparse
+
+from src.ingesta.transporte import Transporte, transporte_defecto
+
+CACHE_DIR = Path("datos/raw/_cache")
+TIMEOUT = 120
+CHUNK = 1 << 16
+
+
+@dataclass
+class ResultadoCache:
+    """Archivo local correspondiente a una URL y como se obtuvo."""
+
+    url: str
+    ruta: Path
+    sha256: str
+    bytes: int
+    # "hit" (304 o ya revalidado en este proceso), "miss" (descargado) o
+    # "igual" (descargado de nuevo, pero con el mismo contenido)
+    estado: str
+
+    @property
+    def hit(self) -> bool:
+        """Si se evito la transferencia; un "igual" si la pago."""
+        return self.estado == "hit"
+
+
+def _extension(url: str) -> str:
+    return PurePosixPath(unquote(urlparse(url).path)).suffix.lower()
+
+
+class CacheRaw:
+    """Cache de descargas indexado por URL y almacenado por SHA-256."""
+
+    def __init__(self, raiz: Path = CACHE_DIR):
+        self.raiz = Path(raiz)
+        self.objetos = self.raiz / "objetos"
+        self.parciales = self.raiz / "parciales"
+        self.ruta_indice = self.raiz / "indice.json"
+        self._lock = threading.Lock()
+        self._url_locks: dict[str, threading.Lock] = {}
+        self._revalidadas: set[str] = set()
+        self._indice = self._leer_indice()
+
+    def _leer_indice(self) -> dict:
+        if self.ruta_indice.exists():
+            with open(self.ruta_indice, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _guardar_indice(self):
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta_indice.with_suffix(".json.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self._indice, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(temporal, self.ruta_indice)
+
+    def _lock_url(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def ruta_objeto(self, sha256: str, extension: str = "") -> Path:
+        return self.objetos / f"{sha256}{extension}"
+
+    def ruta_parcial(self, url: str) -> Path:
+        """``.part`` fijo por URL, para poder reanudar entre corridas."""
+        nombre = hashlib.sha256(url.encode()).hexdigest()[:32]
+        return self.parciales / f"{nombre}{_extension(url)}.part"
+
+    def entrada(self, url: str) -> dict | None:
+        """Metadatos guardados para ``url`` (o None si nunca se descargo)."""
+        with self._lock:
+            entrada = self._indice.get(url)
+            return dict(entrada) if entrada else None
+
+    def _registrar(self, url: str, entrada: dict):
+        with self._lock:
+            self._indice[url] = entrada
+            self._revalidadas.add(url)
+            self._guardar_indice()
+
+    def _resultado(self, url: str, entrada: dict, estado: str) -> ResultadoCache:
+        return ResultadoCache(
+            url=url,
+            ruta=self.ruta_objeto(entrada["sha256"], entrada.get("extension", "")),
+            sha256=entrada["sha256"],
+            bytes=entrada["bytes"],
+            estado=estado,
+        )
+
+    def obtener(self, url: str, transporte: Transporte | None = None,
+                timeout: float = TIMEOUT, forzar: bool = False) -> ResultadoCache:
+        """Devolver el archivo local de ``url``, descargandolo solo si cambio.
+
+        Con ``forzar=True`` se revalida contra el servidor aunque la URL ya
+        se haya revalidado en este proceso.
+        """
+        with self._lock_url(url):
+            entrada = self.entrada(url)
+            vigente = entrada is not None and self.ruta_objeto(
+                entrada["sha256"], entrada.get("extension", "")).exists()
+
+            if vigente and not forzar and url in self._revalidadas:
+                return self._resultado(url, entrada, "hit")
+
+            headers = {}
+            if vigente:
+                if entrada.get("etag"):
+                    headers["If-None-Match"] = entrada["etag"]
+                if entrada.get("last_modified"):
+                    headers["If-Modified-Since"] = entrada["last_modified"]
+
+            parcial = self.ruta_parcial(url)
+            transporte = transporte or transporte_defecto()
+            res = transporte.descargar(url, parcial, headers=headers, timeout=timeout)
+            if res.no_modificado and vigente:
+                entrada["revalidado"] = time.time()
+                self._registrar(url, entrada)
+                return self._resultado(url, entrada, "hit")
+
+            sha256 = sha256_archivo(parcial)
+            nueva = {
+                "sha256": sha256,
+                "bytes": res.bytes,
+                "extension": _extension(url),
+                "etag": res.headers.get("ETag"),
+                "last_modified": res.headers.get("Last-Modified"),
+                "descargado": time.time(),
+                "revalidado": time.time(),
+            }
+            destino = self.ruta_objeto(sha256, nueva["extension"])
+            if destino.exists():
+                parcial.unlink()
+            else:
+                self.objetos.mkdir(parents=True, exist_ok=True)
+                os.replace(parcial, destino)
+            estado = "igual" if vigente and entrada["sha256"] == sha256 else "miss"
+            self._registrar(url, nueva)
+            return self._resultado(url, nueva, estado)
+
+
+def sha256_archivo(ruta: Path) -> str:
+    """SHA-256 del contenido de un archivo local."""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(CHUNK), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def materializar(origen: Path, destino: Path):
+    """Exponer un objeto del cache en ``destino`` (enlace duro o copia)."""
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    if destino.exists():
+        if os.path.samefile(origen, destino):
+            return
+        destino.unlink()
+    try:
+        os.link(origen, destino)
+    except OSError:
+        shutil.copyfile(origen, destino)
+
+
+_cache_defecto: CacheRaw | None = None
+
+
+def cache_defecto() -> CacheRaw:
+    """Instancia compartida del cache en ``datos/raw/_cache``."""
+    global _cache_defecto
+    if _cache_defecto is None:
+        _cache_defecto = CacheRaw()
+    return _cache_defecto
+
+
+def ruta_local(url: str) -> Path:
+    """Ruta local de ``url`` usando el cache compartido."""
+    return cache_defecto().obtener(url).ruta
@@ -0,0 +1,136 @@
+"""
+Lectura del catalogo de fuentes (datos/catalogo.yaml).
+
+Cada entrada de ``fuentes.<fuente>.urls`` se convierte en un ``Recurso``:
+una URL descargable identificada por la fuente y su clave de anio, incluidas
+las variantes ``<anio>_v1`` / ``<anio>_v2``. La seccion ``insumos`` describe
+las tablas auxiliares (DIVIPOLA, poblacion DANE) y la seccion ``socrata`` las
+consultas SoQL que se resuelven en el servidor de datos.gov.co.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from urllib.parse import unquote, urlparse
+
+import yaml
+
+CATALOGO_PATH = Path("datos/catalogo.yaml")
+
+
+@dataclass(frozen=True)
+class Recurso:
+    """Archivo de una fuente para un anio (o variante de anio)."""
+
+    fuente: str
+    clave: str
+    url: str
+    nombre: str | None = None
+
+    @property
+    def anio(self) -> int:
+        """Anio de la clave (``"2018_v2"`` -> 2018)."""
+        return int(self.clave.split("_")[0])
+
+    @property
+    def variante(self) -> str | None:
+        """Sufijo de variante (``"v2"``) o None si la clave es solo el anio."""
+        partes = self.clave.split("_", 1)
+        return partes[1] if len(partes) > 1 else None
+
+    @property
+    def extension(self) -> str:
+        """Extension del archivo segun la URL (``.xlsx``, ``.xls``...)."""
+        return PurePosixPath(unquote(urlparse(self.url).path)).suffix.lower()
+
+    def destino(self, raiz: Path) -> Path:
+        """Ruta local ``<raiz>/<fuente>/<clave><ext>``."""
+        return Path(raiz) / self.fuente / f"{self.clave}{self.extension}"
+
+
+@dataclass(frozen=True)
+class ConsultaSocrata:
+    """Consulta SoQL sobre un recurso Socrata.
+
+    ``select``, ``where`` y ``group`` se envian tal cual como ``$select``,
+    ``$where`` y ``$group``: la proyeccion, el filtro y la agregacion los
+    hace el servidor y solo viaja el resultado.
+
+    Con ``incremental=True`` (solo consultas sin ``group``) las filas se
+    sincronizan por ``:updated_at`` y se fusionan por ``clave`` en Parquet
+    bronce particionado por la columna ``particion``.
+    """
+
+    nombre: str
+    url: str
+    select: str | None = None
+    where: str | None = None
+    group: str | None = None
+    order: str | None = None
+    tam_pagina: int = 50_000
+    incremental: bool = False
+    clave: str = ":id"
+    particion: str | None = None
+
+    def parametros(self) -> dict[str, str]:
+        """Parametros SoQL (sin ``$limit`` / ``$offset``).
+
+        Sin ``order`` explicito se ordena por las columnas agrupadas o por
+        ``:id``, para que las paginas no se solapen ni salten filas.
+        """
+        params = {
+            "$select": self.select,
+            "$where": self.where,
+            "$group": self.group,
+            "$order": self.order or self.group or ":id",
+        }
+        return {k: v for k, v in params.items() if v}
+
+    def destino(self, raiz: Path) -> Path:
+        """Ruta local ``<raiz>/socrata/<nombre>.parquet``."""
+        return Path(raiz) / "socrata" / f"{self.nombre}.parquet"
+
+
+def cargar_catalogo(ruta: Path = CATALOGO_PATH) -> dict:
+    """Leer el catalogo YAML completo."""
+    with open(ruta, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+def listar_recursos(catalogo: dict | None = None, fuentes=None) -> list[Recurso]:
+    """Aplanar ``fuentes.*.urls`` en una lista de recursos.
+
+    Si se pasa ``fuentes`` se conservan solo esas fuentes.
+    """
+    if catalogo is None:
+        catalogo = cargar_catalogo()
+
+    recursos = []
+    for fuente, meta in (catalogo.get("fuentes") or {}).items():
+        if fuentes and fuente not in fuentes:
+            continue
+        for clave, url in ((meta or {}).get("urls") or {}).items():
+            recursos.append(Recurso(fuente=fuente, clave=str(clave), url=url,
+                                    nombre=meta.get("nombre")))
+    return recursos
+
+
+def listar_insumos(catalogo: dict | None = None) -> dict[str, dict]:
+    """Insumos auxiliares del catalogo (DIVIPOLA, poblacion DANE...) por nombre."""
+    if catalogo is None:
+        catalogo = cargar_catalogo()
+    return dict(catalogo.get("insumos") or {})
+
+
+def listar_consultas(catalogo: dict | None = None, nombres=None) -> list[ConsultaSocrata]:
+    """Consultas de la seccion ``socrata`` (opcionalmente solo ``nombres``)."""
+    if catalogo is None:
+        catalogo = cargar_catalogo()
+
+    consultas = []
+    for nombre, meta in (catalogo.get("socrata") or {}).items():
+        if nombres and nombre not in nombres:
+            continue
+        campos = {k: meta[k] for k in ("select", "where", "group", "order", "tam_pagina",
+                                       "incremental", "clave", "particion") if meta.get(k)}
+        consultas.append(ConsultaSocrata(nombre=nombre, url=meta["url"], **campos))
+    return consultas
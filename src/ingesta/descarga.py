@@ -0,0 +1,102 @@
+"""
+Descarga concurrente de los recursos del catalogo.
+
+Las descargas son I/O de red, asi que se reparten en un pool acotado de
+hilos; el tiempo total queda dominado por los archivos mas lentos y no
+por la suma de todas las esperas. Cada archivo pasa por el cache de
+``src.ingesta.cache``, asi que los que no cambiaron cuestan un 304, y por el
+transporte de ``src.ingesta.transporte``: conexiones reutilizadas, tope por
+host, reintentos y reanudacion de descargas cortadas.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+import requests
+
+from src.ingesta.cache import CacheRaw, materializar
+from src.ingesta.catalogo import Recurso
+from src.ingesta.transporte import MAX_POR_HOST, Transporte
+
+RAW_DIR = Path("datos/raw")
+MAX_WORKERS = 8
+TIMEOUT = 120
+CACHE_SUBDIR = "_cache"
+
+
+@dataclass
+class ResultadoDescarga:
+    """Resultado de descargar un recurso."""
+
+    recurso: Recurso
+    ruta: Path | None
+    bytes: int = 0
+    segundos: float = 0.0
+    error: str | None = None
+    cache: str | None = None
+    sha256: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def descargar(recurso: Recurso, raiz: Path = RAW_DIR, timeout: float = TIMEOUT,
+              transporte: Transporte | None = None,
+              cache: CacheRaw | None = None) -> ResultadoDescarga:
+    """Descargar un recurso a ``<raiz>/<fuente>/<clave><ext>``.
+
+    La descarga pasa por el cache de ``<raiz>/_cache``: si el archivo no
+    cambio en el servidor se reutiliza la copia local tras un 304. ``cache``
+    queda en ``"hit"``, ``"miss"`` o ``"igual"`` (se volvio a bajar, pero el
+    contenido no cambio).
+    """
+    cache = cache or CacheRaw(Path(raiz) / CACHE_SUBDIR)
+    destino = recurso.destino(raiz)
+    inicio = time.perf_counter()
+    try:
+        res = cache.obtener(recurso.url, transporte=transporte, timeout=timeout)
+        materializar(res.ruta, destino)
+    except (requests.RequestException, OSError) as e:
+        return ResultadoDescarga(recurso, None, segundos=time.perf_counter() - inicio,
+                                 error=f"{type(e).__name__}: {e}")
+    return ResultadoDescarga(recurso, destino, bytes=res.bytes,
+                             segundos=time.perf_counter() - inicio,
+                             cache=res.estado, sha256=res.sha256)
+
+
+def descargar_todo(recursos: list[Recurso], raiz: Path = RAW_DIR,
+                   max_workers: int = MAX_WORKERS, timeout: float = TIMEOUT,
+                   verbose: bool = True, max_por_host: int = MAX_POR_HOST,
+                   tasa_max: float | None = None) -> list[ResultadoDescarga]:
+    """Descargar todos los recursos con un pool de ``max_workers`` hilos.
+
+    Como mucho ``max_por_host`` descargas van al mismo servidor a la vez y,
+    si se indica, no se hacen mas de ``tasa_max`` peticiones por segundo.
+    Los resultados se devuelven en el mismo orden que ``recursos``.
+    """
+    resultados: list[ResultadoDescarga | None] = [None] * len(recursos)
+    cache = CacheRaw(Path(raiz) / CACHE_SUBDIR)
+    with (
+        Transporte(max_por_host=max_por_host, tasa_max=tasa_max,
+                   max_conexiones=max_workers, timeout=timeout) as transporte,
+        ThreadPoolExecutor(max_workers=max_workers) as pool,
+    ):
+        futuros = {
+            pool.submit(descargar, r, raiz, timeout, transporte, cache): i
+            for i, r in enumerate(recursos)
+        }
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            res = futuro.result()
+            resultados[i] = res
+            if verbose:
+                r = res.recurso
+                if res.ok:
+                    print(f"✅ {r.fuente} {r.clave}: {res.bytes:,} bytes "
+                          f"en {res.segundos:.1f}s ({res.cache})")
+                else:
+                    print(f"⚠️ {r.fuente} {r.clave}: {res.error}")
+    return resultados
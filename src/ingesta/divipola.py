@@ -0,0 +1,111 @@
+"""
+Cliente de DIVIPOLA (codigos DANE de departamentos y municipios).
+
+El recurso Socrata ``gdxc-w37w`` se pagina con ``$limit`` / ``$offset``
+ordenado por ``:id``, se normaliza y tipa una sola vez y se guarda como
+Parquet en ``datos/raw/divipola/``. Mientras la copia tenga menos de
+``TTL_DIAS`` dias no se vuelve a consultar la API, y dentro de un mismo
+proceso todos los consumidores reciben el mismo DataFrame.
+
+Uso:
+    from src.ingesta.divipola import cargar_divipola
+    divipola = cargar_divipola()
+"""
+
+import time
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+from src.ingesta.bronce import escribir_parquet, leer_metadatos
+from src.ingesta.catalogo import listar_insumos
+from src.ingesta.normalizacion import normalizar
+from src.ingesta.transporte import Transporte, transporte_defecto
+
+DIVIPOLA_PATH = Path("datos/raw/divipola/divipola.parquet")
+TTL_DIAS = 30
+TAM_PAGINA = 1000
+TIMEOUT = 60
+
+COLUMNAS_TEXTO = ["dpto", "nom_mpio", "tipo_municipio"]
+COLUMNAS_CODIGO = ["cod_dpto", "cod_mpio"]
+COLUMNAS_COORDENADAS = ["longitud", "latitud"]
+
+_memo: dict[Path, pd.DataFrame] = {}
+
+
+def url_divipola(catalogo: dict | None = None) -> str:
+    """URL del recurso DIVIPOLA declarada en ``insumos`` del catalogo."""
+    return listar_insumos(catalogo)["divipola"]["url"]
+
+
+def descargar_paginas(url: str, tam_pagina: int = TAM_PAGINA,
+                      transporte: Transporte | None = None, timeout: int = TIMEOUT) -> list[dict]:
+    """Todas las filas de un recurso Socrata, pagina por pagina.
+
+    Se pide ``$order=:id`` para que las paginas no se solapen ni salten
+    filas, y se termina con la primera pagina incompleta.
+    """
+    transporte = transporte or transporte_defecto()
+    filas, offset = [], 0
+    while True:
+        params = {"$limit": tam_pagina, "$offset": offset, "$order": ":id"}
+        pagina = transporte.get(url, params=params, timeout=timeout).json()
+        filas.extend(pagina)
+        if len(pagina) < tam_pagina:
+            return filas
+        offset += tam_pagina
+
+
+def normalizar_divipola(filas) -> pd.DataFrame:
+    """DataFrame tipado: nombres en mayusculas sin tildes, codigos enteros."""
+    df = pd.DataFrame(filas)
+    for col in COLUMNAS_TEXTO:
+        if col in df.columns:
+            df[col] = normalizar(df[col], nulo="")
+    for col in COLUMNAS_CODIGO:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    for col in COLUMNAS_COORDENADAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].astype("string").str.replace(",", "."),
+                                    errors="coerce")
+    return df
+
+
+def vigente(ruta: Path, ttl_dias: float = TTL_DIAS) -> bool:
+    """True si existe una copia local con menos de ``ttl_dias`` dias."""
+    if not ruta.exists():
+        return False
+    descargado = leer_metadatos(ruta).get("descargado", 0)
+    return time.time() - descargado < ttl_dias * 86400
+
+
+def cargar_divipola(ruta: Path = DIVIPOLA_PATH, url: str | None = None,
+                    ttl_dias: float = TTL_DIAS, forzar: bool = False,
+                    transporte: Transporte | None = None) -> pd.DataFrame:
+    """DIVIPOLA normalizada, desde memoria, desde la copia local o desde la API.
+
+    El resultado se comparte entre todos los llamados del proceso: quien
+    necesite modificarlo debe trabajar sobre una copia. Si la API falla y
+    hay una copia vencida, se usa esa copia con una advertencia.
+    """
+    ruta = Path(ruta)
+    clave = ruta.resolve()
+    if not forzar and clave in _memo:
+        return _memo[clave]
+
+    if forzar or not vigente(ruta, ttl_dias):
+        url = url or url_divipola()
+        try:
+            df = normalizar_divipola(descargar_paginas(url, transporte=transporte))
+            escribir_parquet(df, ruta, {"url": url, "descargado": time.time(), "filas": len(df)})
+            print(f"📥 DIVIPOLA: {len(df):,} municipios descargados")
+        except (requests.RequestException, ValueError) as e:
+            if not ruta.exists():
+                raise
+            print(f"⚠️ DIVIPOLA: no se pudo actualizar ({e}), se usa la copia local")
+
+    _memo[clave] = pd.read_parquet(ruta)
+    return _memo[clave]
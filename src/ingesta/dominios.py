@@ -0,0 +1,126 @@
+"""
+Deteccion de columnas intercambiadas por el dominio de sus valores.
+
+En 2021 ``delitos_sexuales_9.xls`` traia ``DEPARTAMENTO`` y ``ARMAS_MEDIOS``
+intercambiadas: los encabezados estaban bien, pero los valores no. Para
+cada columna de texto con dominio conocido se toma una muestra de valores
+distintos y se mide que fraccion cae en cada dominio (departamentos, armas
+y medios, genero, grupos de edad). Si una columna se parece mas a otro
+dominio que al suyo, y las columnas mal ubicadas forman una permutacion
+entre si, se renombran.
+
+Los valores que pertenecen a mas de un dominio (``NO REPORTADO``) no
+cuentan. Los conjuntos se normalizan una sola vez y se memoizan; la
+comparacion es un ``isin`` sobre unos cientos de valores por columna.
+
+Uso:
+    renombres = detectar_intercambios(df)   # {"DEPARTAMENTO": "ARMAS_MEDIOS", ...}
+    df = df.rename(columns=renombres)
+"""
+
+import pandas as pd
+
+from src.ingesta.esquema import normalizar_nombre
+
+MUESTRA = 500
+# Fraccion minima de la muestra dentro del dominio ajeno para proponer un cambio
+UMBRAL = 0.6
+# Por encima de esta fraccion en su propio dominio una columna nunca se mueve
+UMBRAL_PROPIO = 0.3
+
+DEPARTAMENTOS = [
+    "AMAZONAS", "ANTIOQUIA", "ARAUCA", "ATLÁNTICO", "BOLÍVAR", "BOYACÁ", "CALDAS",
+    "CAQUETÁ", "CASANARE", "CAUCA", "CESAR", "CHOCÓ", "CÓRDOBA", "CUNDINAMARCA",
+    "GUAINÍA", "GUAJIRA", "LA GUAJIRA", "GUAVIARE", "HUILA", "MAGDALENA", "META", "NARIÑO",
+    "NORTE DE SANTANDER", "PUTUMAYO", "QUINDÍO", "RISARALDA", "SAN ANDRÉS",
+    "SAN ANDRÉS Y PROVIDENCIA", "SANTANDER", "SUCRE", "TOLIMA", "VALLE", "VALLE DEL CAUCA",
+    "VAUPÉS", "VICHADA", "BOGOTÁ D.C.", "BOGOTÁ, D.C.", "CUNDINAMARCA - BOGOTÁ",
+]
+
+ARMAS_MEDIOS = [
+    "ARMA BLANCA", "ARMA BLANCA / CORTOPUNZANTE", "ARMA DE FUEGO", "CONTUNDENTES",
+    "SIN EMPLEO DE ARMAS", "ESCOPOLAMINA", "LLAVE MAESTRA", "PERRO", "JERINGA",
+    "ARTEFACTO EXPLOSIVO/CARGA DINAMITA",
+    "VEHICULO", "MOTO", "CORTANTES", "PUNZANTES", "CORTOPUNZANTES", "CUCHILLA",
+    "BOLSA PLASTICA", "CINTAS/CINTURON", "COMBUSTIBLE", "ACIDO", "AGUA CALIENTE",
+    "POLVORA(FUEGOS PIROTECNICOS)", "SUSTANCIAS TOXICAS", "GRANADA DE MANO",
+    "MINA ANTIPERSONA", "ARMA TRAUMATICA", "LICOR ADULTERADO", "ALUCINOGENOS", "DIRECTA",
+    "CELULAR", "TELEFONO", "LLAMADA TELEFONICA", "MENSAJE DE TEXTO", "REDES SOCIALES",
+    "CARTA EXTORSIVA", "CORREO ELECTRONICO", "PALANCAS", "SOGA", "PRENDAS DE VESTIR",
+    "MEDICAMENTOS", "QUIMICOS", "NO REPORTADO",
+]
+
+GENEROS = ["MASCULINO", "FEMENINO", "NO REPORTADO", "NO RESPORTADO", "NO REGISTRA"]
+
+EDADES = ["ADULTOS", "ADOLESCENTES", "MENORES", "NO REPORTADO", "NO RESPORTADO", "NO REGISTRA"]
+
+_dominios: dict[str, set[str]] | None = None
+
+
+def _departamentos_divipola() -> list[str]:
+    """Nombres de departamento de la copia local de DIVIPOLA, si existe.
+
+    No se consulta la API: la lectura de libros no depende de la red.
+    """
+    from src.ingesta.divipola import DIVIPOLA_PATH, cargar_divipola
+
+    if not DIVIPOLA_PATH.exists():
+        return []
+    try:
+        return cargar_divipola(ttl_dias=float("inf"))["dpto"].dropna().unique().tolist()
+    except (OSError, ValueError, KeyError):  # copia ilegible (ArrowInvalid) o sin "dpto"
+        return []
+
+
+def dominios() -> dict[str, set[str]]:
+    """Conjuntos normalizados de valores por columna, sin los ambiguos.
+
+    Se calculan una vez por proceso.
+    """
+    global _dominios
+    if _dominios is None:
+        crudos = {
+            "DEPARTAMENTO": DEPARTAMENTOS + _departamentos_divipola(),
+            "ARMAS_MEDIOS": ARMAS_MEDIOS,
+            "GENERO": GENEROS,
+            "AGRUPA_EDAD_PERSONA": EDADES,
+        }
+        normalizados = {col: {normalizar_nombre(v) for v in valores}
+                        for col, valores in crudos.items()}
+        conteo = pd.Series([v for s in normalizados.values() for v in s]).value_counts()
+        ambiguos = set(conteo[conteo > 1].index)
+        _dominios = {col: valores - ambiguos for col, valores in normalizados.items()}
+    return _dominios
+
+
+def puntajes(df: pd.DataFrame, muestra: int = MUESTRA) -> pd.DataFrame:
+    """Fraccion de valores distintos de cada columna (filas) en cada dominio (columnas)."""
+    conjuntos = dominios()
+    todos = set().union(*conjuntos.values())
+    filas = {}
+    for col in (c for c in conjuntos if c in df.columns):
+        valores = pd.Series(df[col].dropna().astype("string").unique()[:muestra])
+        valores = valores.map(normalizar_nombre)
+        valores = valores[valores.isin(todos)]
+        if valores.empty:
+            continue
+        filas[col] = {dom: valores.isin(conj).mean() for dom, conj in conjuntos.items()}
+    return pd.DataFrame.from_dict(filas, orient="index")
+
+
+def detectar_intercambios(df: pd.DataFrame, muestra: int = MUESTRA) -> dict[str, str]:
+    """Renombres ``{columna_actual: columna_correcta}`` para columnas intercambiadas.
+
+    Solo se propone un renombre si las columnas mal ubicadas forman una
+    permutacion entre si (A<->B, A->B->C->A); si no, se devuelve ``{}``.
+    """
+    tabla = puntajes(df, muestra)
+    renombres = {}
+    for col in tabla.index:
+        mejor = tabla.loc[col].idxmax()
+        if (mejor != col and tabla.loc[col, mejor] >= UMBRAL
+                and tabla.loc[col].get(col, 0) < UMBRAL_PROPIO):
+            renombres[col] = mejor
+    if set(renombres) != set(renombres.values()):
+        return {}
+    return renombres
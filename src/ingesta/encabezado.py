@@ -0,0 +1,87 @@
+"""
+Deteccion de la fila de encabezado de los libros de la Policia Nacional.
+
+Los archivos traen un numero variable de filas de titulo antes de la tabla.
+En lugar de probar ``pd.read_excel(..., header=n)`` con varios ``n`` (una
+lectura completa por intento), se leen una sola vez las primeras filas, se
+puntua cada fila contra las columnas objetivo y el cuerpo se lee una unica
+vez desde la fila elegida.
+"""
+
+import unicodedata
+
+import pandas as pd
+
+COLUMNAS_OBJETIVO = [
+    "DEPARTAMENTO", "MUNICIPIO", "CODIGO_DANE",
+    "ARMAS_MEDIOS", "FECHA_HECHO", "GENERO",
+    "AGRUPA_EDAD_PERSONA", "CANTIDAD",
+]
+
+# Palabras clave que identifican cada columna objetivo dentro de una celda
+PALABRAS_CLAVE = {
+    "DEPARTAMENTO": ("DEPARTAMENTO", "DEPTO", "DPTO"),
+    "MUNICIPIO": ("MUNICIPIO", "MUNICICPIO", "MPIO"),
+    "CODIGO_DANE": ("CODIGO", "DANE"),
+    "ARMAS_MEDIOS": ("ARMA", "MEDIO"),
+    "FECHA_HECHO": ("FECHA",),
+    "GENERO": ("GENERO", "SEXO"),
+    "AGRUPA_EDAD_PERSONA": ("EDAD",),
+    "CANTIDAD": ("CANTIDAD",),
+}
+
+MAX_FILAS_PREVIEW = 40
+MIN_COINCIDENCIAS = 3
+# Las notas al pie son textos largos que mencionan varias columnas
+MAX_LARGO_CELDA = 40
+
+
+def _normalizar_celda(valor) -> str:
+    if pd.isna(valor):
+        return ""
+    texto = unicodedata.normalize("NFKD", str(valor).strip().upper())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def puntuar_fila(valores) -> int:
+    """Numero de columnas objetivo distintas presentes en una fila."""
+    celdas = [c for c in map(_normalizar_celda, valores) if c and len(c) <= MAX_LARGO_CELDA]
+    return sum(
+        any(clave in celda for celda in celdas for clave in claves)
+        for claves in PALABRAS_CLAVE.values()
+    )
+
+
+def detectar_encabezado(preview: pd.DataFrame,
+                        min_coincidencias: int = MIN_COINCIDENCIAS) -> int | None:
+    """Indice (0-based) de la fila con mas columnas objetivo.
+
+    ``preview`` debe leerse con ``header=None``. Devuelve None si ninguna
+    fila alcanza ``min_coincidencias``.
+    """
+    mejor, mejor_puntaje = None, min_coincidencias - 1
+    for idx, fila in enumerate(preview.itertuples(index=False, name=None)):
+        puntaje = puntuar_fila(fila)
+        if puntaje > mejor_puntaje:
+            mejor, mejor_puntaje = idx, puntaje
+            if puntaje == len(PALABRAS_CLAVE):
+                break
+    return mejor
+
+
+def leer_con_encabezado(ruta, max_filas: int = MAX_FILAS_PREVIEW, header: int | None = None,
+                        **kwargs) -> tuple[pd.DataFrame, int]:
+    """Leer un libro detectando su fila de encabezado.
+
+    Se leen ``max_filas`` filas sin encabezado para la deteccion y luego el
+    cuerpo completo una sola vez. Con ``header`` se omite la deteccion.
+    Devuelve ``(df, fila_encabezado)``.
+    """
+    if header is None:
+        preview = pd.read_excel(ruta, header=None, nrows=max_filas, **kwargs)
+        header = detectar_encabezado(preview)
+        if header is None:
+            raise ValueError(
+                f"No se detecto la fila de encabezado en las primeras {max_filas} filas"
+            )
+    return pd.read_excel(ruta, header=header, **kwargs), header
@@ -0,0 +1,109 @@
+"""
+Registro de esquema: nombres estandar de columnas y sus alias.
+
+Reune en un solo lugar los diccionarios ``renombrar`` de cada bloque anual y
+el ``SYN_MAP`` de ``Union_bases.ipynb``. Las reglas se compilan una vez en
+una sola expresion regular con un grupo por columna estandar, y la
+resolucion de cada encabezado se memoiza por su huella (la tupla de
+celdas): un formato de libro ya visto se resuelve con una busqueda en un
+diccionario.
+
+Los alias cortos y ambiguos (``DEP``, ``CIUDAD``, ``ARMA``, ``MEDIO``) no
+entran en la expresion regular: solo cuentan si el nombre normalizado es
+exactamente ese token, y pierden frente a cualquier otro alias de la misma
+columna. ``TOTAL`` no es alias de ``CANTIDAD``: en varios libros es la
+columna o fila de totales.
+
+Uso:
+    from src.ingesta.esquema import renombrar
+    df = renombrar(df)
+"""
+
+import re
+import unicodedata
+
+import pandas as pd
+
+# Columna estandar -> alias aceptados, sobre el nombre ya normalizado
+# (mayusculas, sin tildes, separadores convertidos a "_")
+ALIAS = {
+    "DEPARTAMENTO": [r"DEPARTAMENTO", r"DEPTO", r"DPTO"],
+    # Tolera los errores de tipeo de algunos anios (MUNICICPIO, MUNICPIO)
+    "MUNICIPIO": [r"MUNICIPIO", r"MUNICI?C?PIO", r"MPIO"],
+    "CODIGO_DANE": [r"CODIGO_DANE", r"COD_DANE", r"CODIGO_DANE_MUNICIPIO", r"CODIGODANE",
+                    r"CODDANE"],
+    "ARMAS_MEDIOS": [r"ARMAS?_?(?:Y_|S_)?MEDIOS?", r"ARMA_EMPLE\w*"],
+    "FECHA_HECHO": [r"FECHA_HECHO", r"FECHA", r"FECHA_DEL_HECHO", r"FEC_HECHO"],
+    "GENERO": [r"GENERO", r"SEXO"],
+    "AGRUPA_EDAD_PERSONA": [r"AGRUPA_EDAD_PER_?SONA", r"AGRUPA_EDAD", r"GRUPO_EDAD",
+                            r"RANGO_EDAD", r"EDAD_GRUPO", r"GRUPO_ETARIO"],
+    "CANTIDAD": [r"CANTIDAD", r"NRO_CASOS", r"NUM_CASOS", r"CASOS"],
+}
+
+# Alias cortos que solo valen como nombre exacto, con la menor prioridad
+ALIAS_EXACTOS = {
+    "DEP": "DEPARTAMENTO",
+    "CIUDAD": "MUNICIPIO",
+    "ARMA": "ARMAS_MEDIOS",
+    "MEDIO": "ARMAS_MEDIOS",
+}
+
+PATRON = re.compile(
+    "^(?:" + "|".join(f"(?P<{col}>{'|'.join(alias)})" for col, alias in ALIAS.items()) + ")$"
+)
+
+_cache: dict[tuple, dict[int, str]] = {}
+
+
+def normalizar_nombre(valor) -> str:
+    """Nombre de columna en mayusculas, sin tildes y con ``_`` como separador."""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    texto = unicodedata.normalize("NFKD", str(valor).upper())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^A-Z0-9]+", "_", texto).strip("_")
+
+
+def canonico(valor) -> str | None:
+    """Columna estandar a la que corresponde un nombre (o None)."""
+    nombre = normalizar_nombre(valor)
+    m = PATRON.match(nombre)
+    return m.lastgroup if m else ALIAS_EXACTOS.get(nombre)
+
+
+def resolver(encabezado) -> dict[int, str]:
+    """Posicion -> columna estandar para una fila de encabezado.
+
+    Si varias columnas resuelven al mismo nombre estandar gana la que ya
+    lo usa literalmente, despues la primera con un alias de ``ALIAS`` y
+    por ultimo la primera con un alias de ``ALIAS_EXACTOS``.
+    """
+    huella = tuple("" if v is None else str(v) for v in encabezado)
+    resultado = _cache.get(huella)
+    if resultado is not None:
+        return resultado
+
+    candidatos: dict[str, list[int]] = {}
+    for pos, valor in enumerate(huella):
+        col = canonico(valor)
+        if col:
+            candidatos.setdefault(col, []).append(pos)
+    resultado = {}
+    for col, posiciones in candidatos.items():
+        nombres = {p: normalizar_nombre(huella[p]) for p in posiciones}
+        resultado[min(posiciones, key=lambda p: (nombres[p] != col,
+                                                 nombres[p] in ALIAS_EXACTOS, p))] = col
+    _cache[huella] = resultado
+    return resultado
+
+
+def renombrar(df: pd.DataFrame) -> pd.DataFrame:
+    """Renombrar las columnas de ``df`` a sus nombres estandar.
+
+    Las columnas que no corresponden a ninguna estandar quedan con su
+    nombre normalizado.
+    """
+    mapa = resolver(df.columns)
+    df = df.copy(deep=False)
+    df.columns = [mapa.get(i) or normalizar_nombre(c) for i, c in enumerate(df.columns)]
+    return df
@@ -0,0 +1,292 @@
+"""
+Lectura por lotes, con memoria acotada, de los libros de delitos.
+
+Los libros grandes (``hurto_a_personas``, ``violencia_intrafamiliar``) no se
+cargan completos: las filas se recorren en modo de solo lectura y se
+entregan en DataFrames de ``tam_lote`` filas. La proyeccion a las columnas
+validas y el descarte de filas basura se hacen en cada lote, asi que el pico
+de memoria depende del tamano del lote y no del libro.
+
+Esa cota solo vale con ``openpyxl`` (``.xlsx`` en streaming), el motor por
+defecto para ``.xlsx``. ``xlrd`` y ``calamine`` cargan la hoja completa al
+abrirla: con ellos los lotes acotan los DataFrames, pero no las celdas ya
+decodificadas de la hoja (``calamine`` solo se usa en ``.xlsx`` si se pide).
+
+``escribir_por_lotes`` es la entrada para producir Parquet: cada lote se
+tipa y se agrega al archivo antes de leer el siguiente. ``leer_libro``
+concatena todos los lotes y queda para libros chicos y pruebas.
+
+Con el primer lote con datos se revisa si alguna columna trae valores de
+otra (ver ``src.ingesta.dominios``); si es asi, el renombre se aplica a
+todos los lotes del libro.
+
+Uso:
+    for lote in leer_por_lotes("datos/raw/hurto_personas/2022.xlsx"):
+        ...
+    filas = escribir_por_lotes("datos/raw/hurto_personas/2022.xlsx", destino)
+"""
+
+import re
+from itertools import chain, islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.ingesta import motores
+from src.ingesta.dominios import detectar_intercambios
+from src.ingesta.encabezado import (
+    COLUMNAS_OBJETIVO,
+    MAX_FILAS_PREVIEW,
+    MIN_COINCIDENCIAS,
+    puntuar_fila,
+)
+from src.ingesta.esquema import resolver
+
+TAM_LOTE = 50_000
+
+BASURA_REGEX = (
+    "TOTAL|FUENTE|SIEDCO|Elaborado|Revisado|Autorizado|Ley 1098|"
+    "Agrupación referente|Contador|DUIN|POLICÍA NACIONAL|"
+    "DIRECCIÓN|GRUPO DE INFORMACIÓN|LESIONES|PERÍODO|MINISTERIO"
+)
+PATRON_BASURA = re.compile(BASURA_REGEX, re.IGNORECASE)
+# Filas del final de la hoja en las que se busca el pie de pagina
+MAX_FILAS_PIE = 30
+COLUMNAS_TEXTO_BASURA = ["DEPARTAMENTO", "MUNICIPIO", "ARMAS_MEDIOS"]
+COLUMNAS_TEXTO = ["DEPARTAMENTO", "MUNICIPIO", "ARMAS_MEDIOS", "GENERO", "AGRUPA_EDAD_PERSONA"]
+COLUMNAS_ENTERAS = ["CODIGO_DANE", "CANTIDAD"]
+
+
+def iterar_filas(ruta, hoja=0, motor: str | None = None):
+    """Recorrer las filas de la hoja como tuplas de valores.
+
+    El motor (openpyxl, xlrd o calamine) se elige por extension salvo que
+    se indique ``motor``; ver ``src.ingesta.motores``.
+    """
+    return motores.iterar_filas(ruta, hoja=hoja, motor=motor)
+
+
+def mascara_vacias(df: pd.DataFrame) -> np.ndarray:
+    """Filas sin ningun valor (nulos o texto solo con espacios)."""
+    vacias = np.ones(len(df), dtype=bool)
+    for col in df.columns:
+        s = df[col]
+        llena = s.notna().to_numpy()
+        if s.dtype == object or pd.api.types.is_string_dtype(s):
+            llena &= s.astype("string").str.strip().fillna("").ne("").to_numpy()
+        vacias &= ~llena
+    return vacias
+
+
+def mascara_basura(df: pd.DataFrame) -> np.ndarray:
+    """Filas cuyo texto coincide con ``PATRON_BASURA``.
+
+    Las columnas de texto se unen con un separador y el patron se evalua
+    una sola vez por fila, en lugar de filtrar columna por columna.
+    """
+    cols = [c for c in COLUMNAS_TEXTO_BASURA if c in df.columns]
+    if not cols or df.empty:
+        return np.zeros(len(df), dtype=bool)
+    texto = df[cols[0]].astype("string").fillna("")
+    for col in cols[1:]:
+        texto = texto + "\x1f" + df[col].astype("string").fillna("")
+    return texto.str.contains(PATRON_BASURA).fillna(False).to_numpy(dtype=bool)
+
+
+def inicio_pie(df: pd.DataFrame, max_filas: int = MAX_FILAS_PIE) -> int:
+    """Posicion donde empieza el pie de pagina (``len(df)`` si no hay).
+
+    Se recorre hacia atras desde la ultima fila mientras las filas esten
+    vacias o sean de basura (TOTAL, FUENTE, Elaborado...). Solo se miran
+    las ultimas ``max_filas`` filas.
+    """
+    cola = df.iloc[-max_filas:]
+    es_pie = mascara_vacias(cola) | mascara_basura(cola)
+    fin = len(df)
+    for pie in es_pie[::-1]:
+        if not pie:
+            break
+        fin -= 1
+    return fin
+
+
+def limpiar_lote(df: pd.DataFrame, ultimo: bool = False) -> pd.DataFrame:
+    """Quitar filas vacias, de titulos y de pie de pagina de un lote.
+
+    Con ``ultimo=True`` el pie se corta antes buscando su limite desde el
+    final. El resto de las filas se filtra con una sola mascara combinada.
+    """
+    if ultimo:
+        df = df.iloc[:inicio_pie(df)]
+    descartar = mascara_vacias(df) | mascara_basura(df)
+    ubicacion = [c for c in ("DEPARTAMENTO", "MUNICIPIO") if c in df.columns]
+    if ubicacion:
+        descartar |= mascara_vacias(df[ubicacion])
+    df = df[~descartar]
+    if "CODIGO_DANE" in df.columns:
+        df = df.assign(CODIGO_DANE=pd.to_numeric(df["CODIGO_DANE"], errors="coerce"))
+    return df
+
+
+def leer_por_lotes(ruta, tam_lote: int = TAM_LOTE, columnas=COLUMNAS_OBJETIVO, hoja=0,
+                   max_filas_preview: int = MAX_FILAS_PREVIEW, info: dict | None = None,
+                   motor: str | None = None):
+    """Generar DataFrames de hasta ``tam_lote`` filas con las ``columnas`` pedidas.
+
+    La fila de encabezado se detecta en las primeras ``max_filas_preview``
+    filas. Si se pasa ``info`` se completa con ``fila_encabezado``,
+    ``columnas`` (las encontradas), ``filas_leidas``, ``filas_validas``,
+    ``motor`` e ``intercambios`` (columnas renombradas por su contenido).
+
+    La memoria solo queda acotada por ``tam_lote`` con ``motor="openpyxl"``;
+    ``xlrd`` (``.xls``) y ``calamine`` tienen la hoja entera en memoria
+    mientras se recorre.
+    """
+    motor = motores.elegir_motor(ruta, motor)
+    filas = iterar_filas(ruta, hoja=hoja, motor=motor)
+    preview = list(islice(filas, max_filas_preview))
+
+    puntajes = [puntuar_fila(f) for f in preview]
+    mejor = max(range(len(puntajes)), key=puntajes.__getitem__, default=None)
+    if mejor is None or puntajes[mejor] < MIN_COINCIDENCIAS:
+        filas.close()
+        raise ValueError(f"No se detecto la fila de encabezado en {ruta}")
+
+    indices = {nombre: i for i, nombre in resolver(preview[mejor]).items() if nombre in columnas}
+    presentes = [c for c in columnas if c in indices]
+    posiciones = [indices[c] for c in presentes]
+
+    if info is not None:
+        info.update(fila_encabezado=mejor, columnas=presentes, filas_leidas=0, filas_validas=0,
+                    motor=motor, intercambios={})
+    renombres = None
+
+    def _lote(bloque, ultimo=False):
+        datos = {
+            col: [f[pos] if pos < len(f) else None for f in bloque]
+            for col, pos in zip(presentes, posiciones)
+        }
+        nonlocal renombres
+        df = limpiar_lote(pd.DataFrame(datos, columns=presentes), ultimo=ultimo)
+        if renombres is None and not df.empty:
+            renombres = detectar_intercambios(df)
+            if info is not None:
+                info["intercambios"] = renombres
+        if renombres:
+            df = df.rename(columns=renombres)[presentes]
+        if info is not None:
+            info["filas_leidas"] += len(bloque)
+            info["filas_validas"] += len(df)
+        return df
+
+    try:
+        bloque = []
+        for fila in chain(preview[mejor + 1:], filas):
+            # Un lote lleno se procesa recien al llegar la fila siguiente, para
+            # que el ultimo lote (el que tiene el pie) siempre se sepa ultimo
+            if len(bloque) >= tam_lote:
+                df = _lote(bloque)
+                bloque = []
+                if not df.empty:
+                    yield df
+            bloque.append(fila)
+        if bloque:
+            df = _lote(bloque, ultimo=True)
+            if not df.empty:
+                yield df
+    finally:
+        filas.close()
+
+
+def leer_libro(ruta, tam_lote: int = TAM_LOTE, columnas=COLUMNAS_OBJETIVO, hoja=0,
+               info: dict | None = None, motor: str | None = None) -> pd.DataFrame:
+    """Leer un libro completo por lotes y concatenar el resultado.
+
+    Tiene el libro entero en memoria: para escribir Parquet usar
+    ``escribir_por_lotes``.
+    """
+    info = {} if info is None else info
+    lotes = list(leer_por_lotes(ruta, tam_lote=tam_lote, columnas=columnas, hoja=hoja, info=info,
+                                motor=motor))
+    if not lotes:
+        return pd.DataFrame(columns=info["columnas"])
+    return pd.concat(lotes, ignore_index=True)
+
+
+def tipar(df: pd.DataFrame) -> pd.DataFrame:
+    """Asignar tipos estables a las columnas de un libro o de un lote.
+
+    Texto como ``string``, codigos y cantidades como ``Int64`` y
+    ``FECHA_HECHO`` siempre como texto: las celdas fecha de Excel en ISO
+    (``2022-01-03 00:00:00``) y los enteros ``YYYYMMDD`` sin el ``.0``. Asi
+    todos los lotes de un libro tienen el mismo esquema, aunque unos traigan
+    fechas y otros texto; la fecha se interpreta en la transformacion.
+    """
+    df = df.copy()
+    for col in COLUMNAS_TEXTO:
+        if col in df.columns:
+            df[col] = df[col].astype("string").str.strip()
+    for col in COLUMNAS_ENTERAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int64")
+    if "FECHA_HECHO" in df.columns:
+        fecha = df["FECHA_HECHO"]
+        if pd.api.types.is_datetime64_any_dtype(fecha):
+            df["FECHA_HECHO"] = fecha.dt.strftime("%Y-%m-%d %H:%M:%S").astype("string")
+        else:
+            numero = pd.to_numeric(fecha, errors="coerce")
+            texto = fecha.astype("string")
+            entero = numero.notna() & (numero % 1 == 0)
+            texto[entero] = numero[entero].astype("int64").astype("string")
+            df["FECHA_HECHO"] = texto
+    return df
+
+
+def escribir_por_lotes(ruta, destino: Path, metadatos=None, constantes: dict | None = None,
+                       tam_lote: int = TAM_LOTE, columnas=COLUMNAS_OBJETIVO, hoja=0,
+                       info: dict | None = None, motor: str | None = None) -> int:
+    """Leer ``ruta`` por lotes y agregar cada lote tipado al Parquet ``destino``.
+
+    Cada lote pasa por ``tipar``, recibe las columnas ``constantes`` y se
+    escribe con un ``pq.ParquetWriter`` antes de leer el siguiente, asi que
+    nunca hay mas de un lote en memoria. ``metadatos`` es una funcion de
+    ``info`` a ``{clave: bytes}`` que se llama al abrir el escritor, cuando
+    ya se conocen la fila de encabezado, el motor y los intercambios. La
+    escritura es atomica (``.tmp``). Devuelve el numero de filas escritas.
+    """
+    info = {} if info is None else info
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + ".tmp")
+    escritor, esquema, filas = None, None, 0
+
+    def _tabla(df):
+        df = tipar(df).assign(**(constantes or {}))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    try:
+        lotes = leer_por_lotes(ruta, tam_lote=tam_lote, columnas=columnas, hoja=hoja, info=info,
+                               motor=motor)
+        for lote in chain(lotes, [None]):
+            if lote is None:
+                if escritor is not None:
+                    break
+                lote = pd.DataFrame(columns=info["columnas"])   # libro sin filas validas
+            tabla = _tabla(lote)
+            if escritor is None:
+                esquema = tabla.schema.with_metadata({**(tabla.schema.metadata or {}),
+                                                      **(metadatos(info) if metadatos else {})})
+                escritor = pq.ParquetWriter(temporal, esquema)
+            escritor.write_table(tabla.cast(esquema))
+            filas += len(tabla)
+        escritor.close()
+        temporal.replace(destino)
+    except BaseException:
+        if escritor is not None:
+            escritor.close()
+        temporal.unlink(missing_ok=True)
+        raise
+    return filas
@@ -2,23 +2,169 @@
 Punto de entrada del pipeline de ingesta.
 
 Uso:
-    poetry run python -m src.ingesta.main
+    poetry run python -m src.ingesta.main [--workers N] [--jobs N] [--fuentes F1 F2 ...]
 
 Este script orquesta la descarga de datos crudos desde las fuentes
-definidas en datos/catalogo.yaml y los almacena en datos/raw/.
+definidas en datos/catalogo.yaml, los almacena en datos/raw/ y convierte
+cada libro una sola vez a Parquet en datos/interim/bronze/. Las consultas
+de la seccion ``socrata`` del catalogo se resuelven en el servidor y se
+guardan como Parquet en datos/raw/socrata/.
 """
 
+import argparse
+import json
+import time
 from pathlib import Path
 
+from src.ingesta.bronce import BRONZE_DIR, convertir_todo
+from src.ingesta.catalogo import (
+    CATALOGO_PATH,
+    cargar_catalogo,
+    listar_consultas,
+    listar_recursos,
+)
+from src.ingesta.descarga import MAX_WORKERS, ResultadoDescarga, descargar_todo
+from src.ingesta.manifiesto import Manifiesto
+from src.ingesta.metricas import Metricas
+from src.ingesta.motores import MOTORES
+from src.ingesta.plan import ordenar, resumen_plan, sondear_todo
+from src.ingesta.servidor_prueba import reescribir_catalogo
+from src.ingesta.socrata import PARALELO, descargar_consultas
+from src.ingesta.transporte import MAX_POR_HOST, Transporte
+from src.ingesta.variantes import consolidar_variantes
+
 RAW_DIR = Path("datos/raw")
+ARTIFACTS_DIR = Path("artifacts")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline de ingesta")
+    parser.add_argument("--catalogo", type=Path, default=CATALOGO_PATH)
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Descargas simultaneas (default: %(default)s)")
+    parser.add_argument("--max-por-host", type=int, default=MAX_POR_HOST,
+                        help="Descargas simultaneas contra un mismo servidor "
+                             "(default: %(default)s)")
+    parser.add_argument("--tasa-max", type=float, default=None,
+                        help="Maximo de peticiones por segundo (default: sin limite)")
+    parser.add_argument("--sin-sondeo", action="store_true",
+                        help="No hacer el HEAD previo ni ordenar las descargas por tamano")
+    parser.add_argument("--paginas-paralelo", type=int, default=PARALELO,
+                        help="Paginas Socrata pedidas a la vez (default: %(default)s)")
+    parser.add_argument("--sin-socrata", action="store_true",
+                        help="No ejecutar las consultas Socrata del catalogo")
+    parser.add_argument("--socrata-completa", action="store_true",
+                        help="Ignorar las marcas de agua y resincronizar todo")
+    parser.add_argument("--bronze-dir", type=Path, default=BRONZE_DIR)
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Procesos para convertir a Parquet (default: uno por CPU)")
+    parser.add_argument("--motor", choices=sorted(MOTORES), default=None,
+                        help="Motor de lectura de Excel "
+                             "(default: el mejor instalado por extension)")
+    parser.add_argument("--forzar-bronce", action="store_true",
+                        help="Reconvertir a Parquet aunque el crudo no haya cambiado")
+    parser.add_argument("--artifacts-dir", type=Path, default=ARTIFACTS_DIR)
+    parser.add_argument("--fuentes", nargs="*", default=None,
+                        help="Limitar la ingesta a estas fuentes del catalogo")
+    parser.add_argument("--espejo", default=None,
+                        help="Descargar desde un espejo local (src.ingesta.servidor_prueba)")
+    return parser.parse_args(argv)
 
 
-def main():
+def main(argv=None):
     """Ejecutar pipeline de ingesta completo."""
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    # TODO: Implementar ingesta desde las fuentes del proyecto
+    args = parse_args(argv)
+    args.raw_dir.mkdir(parents=True, exist_ok=True)
+
+    catalogo = cargar_catalogo(args.catalogo)
+    if args.espejo:
+        catalogo = reescribir_catalogo(catalogo, args.espejo)
+    recursos = listar_recursos(catalogo, fuentes=args.fuentes)
+    print(f"📥 {len(recursos)} archivos en el catalogo, {args.workers} descargas simultaneas")
+
+    metricas = Metricas("ingesta")
+    muertos = []
+    if not args.sin_sondeo:
+        inicio = time.perf_counter()
+        with Transporte(max_por_host=args.max_por_host, tasa_max=args.tasa_max) as transporte:
+            sondeos = sondear_todo(recursos, transporte)
+        for s in sondeos:
+            metricas.registrar(s.recurso.fuente, s.recurso.clave, sondeo_s=round(s.segundos, 3),
+                               bytes_esperados=s.bytes)
+        muertos = [s for s in sondeos if s.muerto]
+        recursos = ordenar(recursos, sondeos)
+        metricas.pasos["sondeo_s"] = round(time.perf_counter() - inicio, 3)
+        print(resumen_plan(sondeos, args.workers))
+
+    inicio = time.perf_counter()
+    resultados = descargar_todo(recursos, raiz=args.raw_dir, max_workers=args.workers,
+                                max_por_host=args.max_por_host, tasa_max=args.tasa_max)
+    fallidos = [r for r in resultados if not r.ok]
+    for r in resultados:
+        metricas.registrar(r.recurso.fuente, r.recurso.clave, anio=r.recurso.anio,
+                           descarga_s=round(r.segundos, 3), bytes=r.bytes, cache=r.cache,
+                           error=r.error)
+    print(f"\nDescargados {len(resultados) - len(fallidos)}/{len(resultados)} archivos "
+          f"en {time.perf_counter() - inicio:.1f}s")
+    if muertos:
+        print(f"   {len(muertos)} enlaces muertos en el sondeo no se intentaron")
+    for s in muertos:
+        fallidos.append(ResultadoDescarga(s.recurso, None,
+                                          error=f"HTTP {s.codigo} (enlace muerto en el sondeo)"))
+
+    manifiesto = Manifiesto(args.raw_dir)
+    for r in resultados:
+        if r.ok:
+            manifiesto.registrar(r.ruta, url=r.recurso.url, fuente=r.recurso.fuente,
+                                 clave=r.recurso.clave, sha256=r.sha256)
+    manifiesto.guardar()
+
+    consultas = [] if args.sin_socrata else listar_consultas(catalogo, nombres=args.fuentes)
+    if consultas:
+        with Transporte(max_por_host=args.max_por_host, tasa_max=args.tasa_max) as transporte:
+            socrata = descargar_consultas(consultas, raiz=args.raw_dir, transporte=transporte,
+                                          paralelo=args.paginas_paralelo,
+                                          bronze_dir=args.bronze_dir,
+                                          completa=args.socrata_completa)
+        for r in socrata:
+            metricas.registrar("socrata", r.consulta.nombre, descarga_s=round(r.segundos, 3),
+                               bytes=r.bytes, paginas=r.paginas, filas_salida=r.filas,
+                               particiones=r.particiones, error=r.error)
+        fallidos += [r for r in socrata if not r.ok]
+
+    inicio = time.perf_counter()
+    bronce = convertir_todo([r.recurso for r in resultados if r.ok], raw_dir=args.raw_dir,
+                            bronze_dir=args.bronze_dir, jobs=args.jobs,
+                            forzar=args.forzar_bronce, motor=args.motor)
+    fallidos += [r for r in bronce if not r.ok]
+    for r in bronce:
+        metricas.registrar(r.recurso.fuente, r.recurso.clave, parseo_s=round(r.segundos, 3),
+                           fila_encabezado=r.fila_encabezado, filas_entrada=r.filas_leidas,
+                           filas_salida=r.filas, reutilizado=r.reutilizado,
+                           rss_pico_mb=r.rss_pico_mb, intercambios=r.intercambios or None,
+                           error=r.error)
+    print(f"\nConvertidos a Parquet {sum(r.ok for r in bronce)}/{len(bronce)} libros "
+          f"en {time.perf_counter() - inicio:.1f}s")
+
+    solapamiento = consolidar_variantes(args.bronze_dir)
+    args.artifacts_dir.mkdir(parents=True, exist_ok=True)
+    if solapamiento:
+        with open(args.artifacts_dir / "solapamiento_variantes.json", "w", encoding="utf-8") as f:
+            json.dump(solapamiento, f, indent=2, ensure_ascii=False)
+
+    metricas.escribir(args.artifacts_dir)
+    print("\n" + metricas.resumen())
+
+    if fallidos:
+        print("⚠️ Fallidos:")
+        for r in fallidos:
+            origen = getattr(r, "recurso", None)
+            nombre = f"{origen.fuente} {origen.clave}" if origen else f"socrata {r.consulta.nombre}"
+            print(f"   {nombre}: {r.error}")
     print("Pipeline de ingesta ejecutado correctamente.")
+    return 1 if fallidos else 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1,141 @@
+"""
+Manifiesto de los archivos crudos en ``datos/raw``.
+
+La ingesta registra, por cada archivo descargado, su ruta relativa, tamano,
+``mtime``, un hash rapido (BLAKE2 del tamano y los primeros y ultimos 64 KB),
+el SHA-256 completo, la URL de origen y la clave del catalogo. Las etapas
+siguientes preguntan al manifiesto en lugar de volver a leer los archivos.
+Para saber si un archivo cambio (``cambio``):
+
+1. Si tamano y ``mtime`` coinciden, no cambio.
+2. Si no, se calcula el hash rapido; si difiere, cambio (sin leerlo completo).
+3. Solo si el hash rapido coincide se recalcula el SHA-256 completo.
+
+``sha256`` necesita el valor y no solo la respuesta, asi que se salta el
+paso 2: si tamano o ``mtime`` no coinciden lee el archivo completo.
+
+Uso:
+    manifiesto = Manifiesto(Path("datos/raw"))
+    sha256 = manifiesto.sha256(Path("datos/raw/abigeato/2019.xlsx"))
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from src.ingesta.cache import sha256_archivo
+
+RAW_DIR = Path("datos/raw")
+NOMBRE = "manifiesto.json"
+MUESTRA = 1 << 16
+
+
+def hash_rapido(ruta: Path) -> str:
+    """BLAKE2 del tamano y de los extremos del archivo (no lee el archivo completo)."""
+    tamano = os.path.getsize(ruta)
+    h = hashlib.blake2b(str(tamano).encode(), digest_size=16)
+    with open(ruta, "rb") as f:
+        h.update(f.read(MUESTRA))
+        if tamano > MUESTRA:
+            f.seek(max(MUESTRA, tamano - MUESTRA))
+            h.update(f.read(MUESTRA))
+    return h.hexdigest()
+
+
+class Manifiesto:
+    """Indice ``manifiesto.json`` de los archivos de un directorio de crudos."""
+
+    def __init__(self, raiz: Path = RAW_DIR):
+        self.raiz = Path(raiz)
+        self.ruta = self.raiz / NOMBRE
+        self._lock = threading.Lock()
+        self.entradas: dict[str, dict] = {}
+        if self.ruta.exists():
+            with open(self.ruta, encoding="utf-8") as f:
+                self.entradas = json.load(f)
+
+    def _clave(self, ruta: Path) -> str:
+        ruta = Path(ruta)
+        try:
+            return ruta.relative_to(self.raiz).as_posix()
+        except ValueError:
+            return ruta.as_posix()
+
+    def entrada(self, ruta: Path) -> dict | None:
+        return self.entradas.get(self._clave(ruta))
+
+    def registrar(self, ruta: Path, url: str | None = None, fuente: str | None = None,
+                  clave: str | None = None, sha256: str | None = None) -> dict:
+        """Registrar ``ruta`` con su estado actual en disco.
+
+        Si no se pasa ``sha256`` se calcula (o se reutiliza el registrado si
+        el archivo no cambio).
+        """
+        ruta = Path(ruta)
+        stat = ruta.stat()
+        previa = self.entrada(ruta) or {}
+        if sha256 is None:
+            sha256 = self.sha256(ruta)
+        entrada = {
+            "ruta": self._clave(ruta),
+            "bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash_rapido": hash_rapido(ruta),
+            "sha256": sha256,
+            "url": url or previa.get("url"),
+            "fuente": fuente or previa.get("fuente"),
+            "clave": clave or previa.get("clave"),
+        }
+        with self._lock:
+            self.entradas[entrada["ruta"]] = entrada
+        return entrada
+
+    def sin_cambios(self, ruta: Path) -> bool:
+        """True si tamano y ``mtime`` de ``ruta`` coinciden con lo registrado."""
+        entrada = self.entrada(ruta)
+        if entrada is None:
+            return False
+        try:
+            stat = Path(ruta).stat()
+        except FileNotFoundError:
+            return False
+        return stat.st_size == entrada["bytes"] and stat.st_mtime_ns == entrada["mtime_ns"]
+
+    def cambio(self, ruta: Path) -> bool:
+        """True si el contenido de ``ruta`` ya no es el registrado (o no hay registro).
+
+        Un hash rapido distinto basta para responder sin leer el archivo.
+        """
+        entrada = self.entrada(ruta)
+        if entrada is None or not Path(ruta).exists():
+            return True
+        if self.sin_cambios(ruta):
+            return False
+        if hash_rapido(ruta) != entrada["hash_rapido"]:
+            return True
+        return self.sha256(ruta) != entrada["sha256"]
+
+    def sha256(self, ruta: Path) -> str:
+        """SHA-256 de ``ruta``, leyendo el archivo solo si tamano o ``mtime`` cambiaron."""
+        entrada = self.entrada(ruta)
+        if entrada is None:
+            return sha256_archivo(ruta)
+        if self.sin_cambios(ruta):
+            return entrada["sha256"]
+        sha256 = sha256_archivo(ruta)
+        if sha256 == entrada["sha256"]:
+            # Mismo contenido con otro mtime (copia, touch): actualizar la entrada
+            stat = Path(ruta).stat()
+            with self._lock:
+                entrada.update(bytes=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return sha256
+
+    def guardar(self):
+        """Escribir el manifiesto de forma atomica."""
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta.with_name(NOMBRE + ".tmp")
+        with self._lock, open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.entradas, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(temporal, self.ruta)
@@ -0,0 +1,130 @@
+"""
+Metricas estructuradas de cada corrida del pipeline.
+
+Cada etapa (ingesta, transformacion) acumula un registro por recurso
+(fuente, clave) con tiempos, bytes, estado del cache, fila de encabezado,
+filas de entrada y salida y pico de memoria. Al final de la corrida se
+escribe ``artifacts/metricas_<etapa>.json`` con el detalle, se agrega una
+linea de resumen a ``artifacts/metricas_historial.jsonl`` para comparar
+corridas en el tiempo y se imprime una tabla con los recursos mas lentos.
+
+Uso:
+    metricas = Metricas("ingesta")
+    metricas.registrar("abigeato", "2019", descarga_s=1.2, bytes=123456)
+    metricas.escribir(Path("artifacts"))
+    print(metricas.resumen())
+"""
+
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+ARTIFACTS_DIR = Path("artifacts")
+HISTORIAL = "metricas_historial.jsonl"
+MAX_FILAS_RESUMEN = 10
+
+# Columnas de la tabla resumen: (campo, titulo, formato)
+COLUMNAS_RESUMEN = [
+    ("descarga_s", "descarga", "{:.1f}s"),
+    ("bytes", "MB", "{:.1f}"),
+    ("cache", "cache", "{}"),
+    ("parseo_s", "parseo", "{:.1f}s"),
+    ("lectura_s", "lectura", "{:.2f}s"),
+    ("fila_encabezado", "enc.", "{}"),
+    ("filas_entrada", "filas ent.", "{:,}"),
+    ("filas_salida", "filas sal.", "{:,}"),
+    ("rss_pico_mb", "RSS MB", "{:.0f}"),
+]
+
+CAMPOS_TIEMPO = ("descarga_s", "parseo_s", "lectura_s")
+
+
+def rss_pico_mb() -> float | None:
+    """Pico de memoria residente del proceso actual, en MB (None si no se puede medir)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+@dataclass
+class Metricas:
+    """Metricas de una etapa del pipeline, por recurso (fuente, clave)."""
+
+    etapa: str
+    inicio: float = field(default_factory=time.time)
+    recursos: dict[tuple[str, str], dict] = field(default_factory=dict)
+    # Tiempos de pasos que no son por recurso (p. ej. parseo de fechas)
+    pasos: dict[str, float] = field(default_factory=dict)
+
+    def registrar(self, fuente: str, clave: str, **valores):
+        """Agregar o actualizar valores del recurso (fuente, clave)."""
+        registro = self.recursos.setdefault((fuente, clave), {"fuente": fuente, "clave": clave})
+        registro.update({k: v for k, v in valores.items() if v is not None})
+
+    def total(self, campo: str) -> float:
+        return sum(r.get(campo) or 0 for r in self.recursos.values())
+
+    def a_dict(self) -> dict:
+        return {
+            "etapa": self.etapa,
+            "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)),
+            "segundos": round(time.time() - self.inicio, 3),
+            "rss_pico_mb": rss_pico_mb(),
+            "pasos": self.pasos,
+            "recursos": list(self.recursos.values()),
+        }
+
+    def escribir(self, artifacts_dir: Path = ARTIFACTS_DIR) -> Path:
+        """Escribir el detalle de la corrida y agregarla al historial."""
+        artifacts_dir = Path(artifacts_dir)
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
+        datos = self.a_dict()
+        destino = artifacts_dir / f"metricas_{self.etapa}.json"
+        with open(destino, "w", encoding="utf-8") as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+
+        resumen = {k: v for k, v in datos.items() if k != "recursos"}
+        resumen["recursos"] = len(self.recursos)
+        for campo in CAMPOS_TIEMPO + ("bytes", "filas_entrada", "filas_salida"):
+            if any(campo in r for r in self.recursos.values()):
+                resumen[campo] = round(self.total(campo), 3)
+        with open(artifacts_dir / HISTORIAL, "a", encoding="utf-8") as f:
+            f.write(json.dumps(resumen, ensure_ascii=False) + "\n")
+        return destino
+
+    def resumen(self, n: int = MAX_FILAS_RESUMEN) -> str:
+        """Tabla de los ``n`` recursos mas lentos (suma de sus tiempos)."""
+        registros = sorted(
+            self.recursos.values(),
+            key=lambda r: sum(r.get(c) or 0 for c in CAMPOS_TIEMPO),
+            reverse=True,
+        )[:n]
+        columnas = [c for c in COLUMNAS_RESUMEN if any(c[0] in r for r in registros)]
+
+        def _celda(registro, campo, formato):
+            valor = registro.get(campo)
+            if valor is None:
+                return "-"
+            if campo == "bytes":
+                valor = valor / 1e6
+            return formato.format(valor)
+
+        filas = [["recurso"] + [titulo for _, titulo, _ in columnas]]
+        for r in registros:
+            filas.append([f"{r['fuente']} {r['clave']}"]
+                         + [_celda(r, campo, formato) for campo, _, formato in columnas])
+        anchos = [max(len(f[i]) for f in filas) for i in range(len(filas[0]))]
+        lineas = [
+            "  ".join(celda.ljust(a) if i == 0 else celda.rjust(a)
+                      for i, (celda, a) in enumerate(zip(fila, anchos)))
+            for fila in filas
+        ]
+        lineas.insert(1, "-" * len(lineas[0]))
+        titulo = f"📊 {self.etapa}: {len(self.recursos)} recursos, los mas lentos:"
+        return titulo + "\n" + "\n".join(lineas)
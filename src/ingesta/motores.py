@@ -0,0 +1,122 @@
+"""
+Motores de lectura de Excel detras de una sola interfaz.
+
+Cada motor es una funcion ``(ruta, hoja) -> iterador de tuplas`` que recorre
+la hoja fila por fila, con ``None`` en las celdas vacias y las filas
+alineadas desde la celda A1, de modo que la fila de encabezado detectada es
+la misma con cualquier motor.
+
+- ``openpyxl``: ``.xlsx`` en modo ``read_only`` (streaming del XML).
+- ``xlrd``: ``.xls`` binario, con hojas cargadas bajo demanda.
+- ``calamine``: lector nativo en Rust (``python-calamine``), para ``.xls`` y
+  ``.xlsx``. Es opcional; si esta instalado se prefiere para ``.xls``. En
+  ``.xlsx`` carga la hoja completa, asi que ahi solo se usa si se pide
+  (``--motor calamine``): por defecto gana el streaming de ``openpyxl``.
+
+Uso:
+    from src.ingesta.motores import elegir_motor, iterar_filas
+    for fila in iterar_filas("datos/raw/abigeato/2019.xlsx", motor="openpyxl"):
+        ...
+"""
+
+import zipfile
+from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
+
+
+def _iterar_openpyxl(ruta, hoja=0):
+    import openpyxl
+
+    libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        ws = libro.worksheets[hoja] if isinstance(hoja, int) else libro[hoja]
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _iterar_xlrd(ruta, hoja=0):
+    import xlrd
+
+    libro = xlrd.open_workbook(ruta, on_demand=True)
+    try:
+        sheet = libro.sheet_by_index(hoja) if isinstance(hoja, int) else libro.sheet_by_name(hoja)
+        for i in range(sheet.nrows):
+            yield tuple(None if v == "" else v for v in sheet.row_values(i))
+    finally:
+        libro.release_resources()
+
+
+def _iterar_calamine(ruta, hoja=0):
+    from python_calamine import CalamineWorkbook
+
+    libro = CalamineWorkbook.from_path(str(ruta))
+    try:
+        sheet = (libro.get_sheet_by_index(hoja) if isinstance(hoja, int)
+                 else libro.get_sheet_by_name(hoja))
+        # calamine rellena las filas iniciales pero no las columnas vacias a la izquierda
+        relleno = (None,) * (sheet.start[1] if sheet.start else 0)
+        for fila in sheet.iter_rows():
+            yield relleno + tuple(None if v == "" else v for v in fila)
+    finally:
+        libro.close()
+
+
+# Motor -> (funcion, modulo que requiere, extensiones que lee)
+MOTORES = {
+    "calamine": (_iterar_calamine, "python_calamine", (".xls", ".xlsx", ".xlsm")),
+    "openpyxl": (_iterar_openpyxl, "openpyxl", (".xlsx", ".xlsm")),
+    "xlrd": (_iterar_xlrd, "xlrd", (".xls",)),
+}
+
+# Orden de preferencia por extension: en .xlsx primero el que lee en streaming
+PREFERENCIA = {
+    ".xlsx": ["openpyxl", "calamine"],
+    ".xlsm": ["openpyxl", "calamine"],
+    ".xls": ["calamine", "xlrd"],
+}
+
+
+def _errores_lectura() -> tuple[type[Exception], ...]:
+    errores = [OSError, ValueError, KeyError, zipfile.BadZipFile]
+    for modulo, nombre in (("openpyxl.utils.exceptions", "InvalidFileException"),
+                           ("xlrd", "XLRDError"), ("python_calamine", "CalamineError")):
+        try:
+            errores.append(getattr(import_module(modulo), nombre))
+        except (ImportError, AttributeError):
+            pass
+    return tuple(errores)
+
+
+# Errores que puede lanzar un motor con un libro ilegible o corrupto
+ERRORES_LECTURA = _errores_lectura()
+
+
+def motores_disponibles() -> list[str]:
+    """Motores cuyo paquete esta instalado."""
+    return [nombre for nombre, (_, modulo, _) in MOTORES.items() if find_spec(modulo)]
+
+
+def motores_para(ruta) -> list[str]:
+    """Motores instalados que pueden leer ``ruta``, en orden de preferencia."""
+    extension = Path(ruta).suffix.lower()
+    disponibles = motores_disponibles()
+    return [m for m in PREFERENCIA.get(extension, ["openpyxl"]) if m in disponibles]
+
+
+def elegir_motor(ruta, motor: str | None = None) -> str:
+    """Motor a usar para ``ruta``: ``motor`` si se pide, si no el preferido."""
+    if motor:
+        if motor not in MOTORES:
+            raise ValueError(f"Motor desconocido: {motor} (opciones: {', '.join(MOTORES)})")
+        return motor
+    candidatos = motores_para(ruta)
+    if not candidatos:
+        raise ValueError(f"No hay motor instalado para leer {ruta}")
+    return candidatos[0]
+
+
+def iterar_filas(ruta, hoja=0, motor: str | None = None):
+    """Recorrer las filas de la hoja como tuplas con el motor elegido."""
+    return MOTORES[elegir_motor(ruta, motor)][0](ruta, hoja)
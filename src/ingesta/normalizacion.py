@@ -0,0 +1,97 @@
+"""
+Normalizacion de texto por valores unicos.
+
+``MUNICIPIO`` tiene ~1.100 valores distintos en millones de filas, pero los
+cuadernos normalizaban fila por fila con ``.apply`` (``unidecode`` +
+``upper`` + ``split/join``), y varias veces por anio. Aqui cada columna se
+factoriza (``pd.factorize``), solo los valores unicos pasan por Python y el
+resultado vuelve a las filas indexando con los codigos enteros. Los valores
+ya vistos se memoizan por funcion durante todo el proceso, asi que el
+segundo anio (o la segunda columna con los mismos nombres) casi no cuesta.
+
+Todas las funciones devuelven series ``string`` con el mismo indice, salvo
+``normalizar_celdas``, que conserva el dtype y las celdas que no son texto.
+
+Uso:
+    from src.ingesta.normalizacion import limpiar_municipio, normalizar
+    df["DEPARTAMENTO"] = normalizar(df["DEPARTAMENTO"])
+    df["MUNICIPIO"] = limpiar_municipio(df["MUNICIPIO"])
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+PATRON_CT = re.compile(r"\(CT\)", re.IGNORECASE)
+
+# funcion -> {valor original -> valor normalizado}
+_memo: dict[object, dict] = {}
+
+
+def normalizar_valor(valor) -> str:
+    """Mayusculas, sin tildes (NFKD a ASCII) y con espacios simples."""
+    texto = unicodedata.normalize("NFKD", str(valor).upper())
+    texto = texto.encode("ascii", "ignore").decode("ascii")
+    return " ".join(texto.split())
+
+
+def limpiar_municipio_valor(valor) -> str:
+    """Como ``normalizar_valor`` pero sin el sufijo ``(CT)`` de las capitales."""
+    return normalizar_valor(PATRON_CT.sub("", str(valor)))
+
+
+def por_valores_unicos(serie: pd.Series, funcion, nulo=pd.NA) -> pd.Series:
+    """Aplicar ``funcion`` solo a los valores distintos de ``serie``.
+
+    Los nulos no pasan por ``funcion`` y quedan como ``nulo``.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    memo = _memo.setdefault(funcion, {})
+    faltantes = [v for v in unicos if v not in memo]
+    for valor in faltantes:
+        memo[valor] = funcion(valor)
+    resultados = np.array([memo[v] for v in unicos] + [nulo], dtype=object)
+    # El codigo -1 de los nulos cae en la ultima posicion (``nulo``)
+    return pd.Series(resultados[codigos], index=serie.index, name=serie.name, dtype="string")
+
+
+def normalizar(serie: pd.Series, nulo=pd.NA) -> pd.Series:
+    """``normalizar`` / ``normalizar_texto`` de los cuadernos, por valores unicos.
+
+    Los cuadernos devolvian ``""`` para los nulos; pasar ``nulo=""`` para
+    conservar ese comportamiento.
+    """
+    return por_valores_unicos(serie, normalizar_valor, nulo)
+
+
+def normalizar_celdas(serie: pd.Series) -> pd.Series:
+    """``normalizar_texto`` celda a celda de los cuadernos: solo cambia las celdas ``str``.
+
+    Numeros, fechas y nulos de una columna ``object`` quedan como estaban
+    (``normalizar`` los convertiria a texto).
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    es_texto = np.array([isinstance(v, str) for v in unicos] + [False], dtype=bool)[codigos]
+    if not es_texto.any():
+        return serie
+    serie = serie.copy()
+    serie[es_texto] = normalizar(serie[es_texto]).to_numpy(dtype=object)
+    return serie
+
+
+def limpiar_municipio(serie: pd.Series, nulo=pd.NA) -> pd.Series:
+    """``limpiar_municipio`` de los cuadernos, por valores unicos."""
+    return por_valores_unicos(serie, limpiar_municipio_valor, nulo)
+
+
+def normalizar_texto(df: pd.DataFrame, columnas=None) -> pd.DataFrame:
+    """Copia de ``df`` con las columnas de texto (o ``columnas``) normalizadas."""
+    df = df.copy()
+    if columnas is None:
+        columnas = [c for c in df.columns
+                    if df[c].dtype == object or pd.api.types.is_string_dtype(df[c])]
+    for col in columnas:
+        df[col] = normalizar(df[col])
+    return df
@@ -0,0 +1,118 @@
+"""
+Plan de descarga: sondeo previo con HEAD y orden de mayor a menor.
+
+Antes de descargar se hace un HEAD concurrente a todas las URLs del
+catalogo para conocer su ``Content-Length`` y detectar enlaces muertos
+(404/410) sin esperar a la descarga. Luego los recursos se ordenan de mayor
+a menor: con un pool de hilos que toma tareas en orden de llegada, empezar
+por los archivos grandes (regla LPT) evita que al final quede un solo hilo
+ocupado con ``hurto_a_personas`` mientras el resto espera.
+
+Los recursos sin tamano conocido van primero: pueden ser los mas grandes.
+
+Uso:
+    sondeos = sondear_todo(recursos, transporte)
+    recursos = ordenar(recursos, sondeos)
+    print(resumen_plan(sondeos, workers=8))
+"""
+
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+
+from src.ingesta.catalogo import Recurso
+from src.ingesta.transporte import Transporte
+
+MAX_WORKERS = 16
+TIMEOUT = 30
+CODIGOS_MUERTOS = {404, 410}
+
+
+@dataclass
+class Sondeo:
+    """Resultado del HEAD previo de un recurso."""
+
+    recurso: Recurso
+    bytes: int | None = None
+    codigo: int | None = None
+    segundos: float = 0.0
+    error: str | None = None
+
+    @property
+    def muerto(self) -> bool:
+        return self.codigo in CODIGOS_MUERTOS
+
+
+def sondear(recurso: Recurso, transporte: Transporte, timeout: float = TIMEOUT) -> Sondeo:
+    """HEAD de ``recurso.url``; un error de red deja el tamano sin conocer."""
+    inicio = time.perf_counter()
+    try:
+        resp = transporte.head(recurso.url, timeout=timeout)
+    except requests.RequestException as e:
+        return Sondeo(recurso, segundos=time.perf_counter() - inicio,
+                      error=f"{type(e).__name__}: {e}")
+    largo = resp.headers.get("Content-Length", "")
+    return Sondeo(recurso, bytes=int(largo) if largo.isdigit() and resp.ok else None,
+                  codigo=resp.status_code, segundos=time.perf_counter() - inicio)
+
+
+def sondear_todo(recursos: list[Recurso], transporte: Transporte,
+                 max_workers: int = MAX_WORKERS, timeout: float = TIMEOUT) -> list[Sondeo]:
+    """Sondear todos los recursos en paralelo, en el mismo orden que ``recursos``."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda r: sondear(r, transporte, timeout), recursos))
+
+
+def ordenar(recursos: list[Recurso], sondeos: list[Sondeo]) -> list[Recurso]:
+    """Recursos vivos de mayor a menor; los de tamano desconocido primero."""
+    tamanos = {s.recurso: s.bytes for s in sondeos}
+    muertos = {s.recurso for s in sondeos if s.muerto}
+    vivos = [r for r in recursos if r not in muertos]
+    return sorted(vivos, key=lambda r: -(tamanos.get(r) if tamanos.get(r) is not None
+                                         else float("inf")))
+
+
+def makespan(tamanos: list[int], workers: int) -> list[int]:
+    """Carga (bytes) de cada hilo si los trabajos se reparten en el orden dado.
+
+    Simula el pool: cada trabajo va al primer hilo que queda libre.
+    """
+    cargas = [0] * max(1, workers)
+    heapq.heapify(cargas)
+    for tamano in tamanos:
+        heapq.heappush(cargas, heapq.heappop(cargas) + tamano)
+    return sorted(cargas, reverse=True)
+
+
+def resumen_plan(sondeos: list[Sondeo], workers: int, n: int = 10) -> str:
+    """Tabla del plan: archivos mas grandes, enlaces muertos y carga por hilo."""
+    conocidos = sorted((s for s in sondeos if s.bytes is not None), key=lambda s: -s.bytes)
+    muertos = [s for s in sondeos if s.muerto]
+    desconocidos = [s for s in sondeos if s.bytes is None and not s.muerto]
+    total = sum(s.bytes for s in conocidos)
+
+    lineas = [(f"🗺️ Plan de descarga: {len(sondeos) - len(muertos)} archivos, "
+               f"{total / 1e6:,.1f} MB conocidos, {len(desconocidos)} sin tamano, "
+               f"{len(muertos)} enlaces muertos")]
+    acumulado = 0
+    for s in conocidos[:n]:
+        acumulado += s.bytes
+        lineas.append(f"   {s.recurso.fuente:<28} {s.recurso.clave:<8} {s.bytes / 1e6:>9,.1f} MB"
+                      f"  ({acumulado / total if total else 1:>4.0%} acumulado)")
+    if len(conocidos) > n:
+        lineas.append(f"   ... {len(conocidos) - n} archivos mas")
+
+    tamanos = [s.bytes for s in conocidos]
+    lpt, ingenuo = makespan(tamanos, workers), makespan(tamanos[::-1], workers)
+    lineas.append(f"   Carga del hilo mas ocupado ({workers} hilos): {lpt[0] / 1e6:,.1f} MB "
+                  f"de mayor a menor vs {ingenuo[0] / 1e6:,.1f} MB de menor a mayor "
+                  f"(ideal {total / max(1, workers) / 1e6:,.1f} MB)")
+    for s in muertos:
+        lineas.append(f"   💀 {s.recurso.fuente} {s.recurso.clave}: HTTP {s.codigo}")
+    for s in desconocidos:
+        lineas.append(f"   ❔ {s.recurso.fuente} {s.recurso.clave}: "
+                      f"{s.error or f'HTTP {s.codigo} sin Content-Length'}")
+    return "\n".join(lineas)
@@ -0,0 +1,149 @@
+"""
+Proyecciones de poblacion municipal del DANE (2018-2042).
+
+El libro ``PPED-AreaSexoEdadMun`` trae una fila por municipio, anio y area
+(cabecera, rural y total) con cientos de columnas por sexo y edad, pero el
+pipeline solo usa la poblacion total. La hoja se recorre una vez en modo de
+solo lectura, se conservan seis columnas de las filas de area ``Total`` y
+el resultado se guarda como tabla larga ordenada por (DPMP, AÑO) en
+``datos/raw/poblacion/poblacion.parquet``. Mientras el libro crudo no cambie
+(mismo SHA-256) no se vuelve a abrir el Excel.
+
+Uso:
+    from src.ingesta.poblacion import buscar_poblacion
+    df["POBLACION"] = buscar_poblacion(df["CODIGO_DANE"], df["AÑO"])
+"""
+
+from itertools import chain, islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.ingesta.bronce import escribir_parquet, leer_metadatos
+from src.ingesta.cache import cache_defecto
+from src.ingesta.catalogo import listar_insumos
+from src.ingesta.esquema import normalizar_nombre
+from src.ingesta.lector import iterar_filas
+from src.ingesta.normalizacion import normalizar
+
+POBLACION_PATH = Path("datos/raw/poblacion/poblacion.parquet")
+MAX_FILAS_PREVIEW = 20
+
+# Nombre normalizado en el libro -> columna de la tabla larga
+COLUMNAS = {
+    "DP": "DP",
+    "DPNOM": "DPNOM",
+    "DPMP": "DPMP",
+    "MPIO": "MPNOM",
+    "ANO": "AÑO",
+    "AREA_GEOGRAFICA": "AREA_GEOGRAFICA",
+    "TOTAL": "TOTAL",
+}
+
+_memo: dict[Path, pd.DataFrame] = {}
+_claves: dict[Path, np.ndarray] = {}
+
+
+def leer_libro_poblacion(ruta, hoja=0) -> pd.DataFrame:
+    """Filas de area ``Total`` del libro del DANE, solo con las columnas usadas.
+
+    El encabezado es la primera fila de la vista previa que trae ``DPMP`` y
+    ``AÑO``.
+    """
+    filas = iterar_filas(ruta, hoja=hoja)
+    try:
+        preview = list(islice(filas, MAX_FILAS_PREVIEW))
+        for i, fila in enumerate(preview):
+            nombres = [normalizar_nombre(v) for v in fila]
+            if "DPMP" in nombres and "ANO" in nombres:
+                break
+        else:
+            raise ValueError(f"No se encontro el encabezado DPMP / AÑO en {ruta}")
+
+        posiciones = {COLUMNAS[n]: j for j, n in enumerate(nombres) if n in COLUMNAS}
+        faltantes = set(COLUMNAS.values()) - set(posiciones)
+        if faltantes:
+            raise ValueError(f"Faltan columnas en {ruta}: {sorted(faltantes)}")
+
+        area = posiciones["AREA_GEOGRAFICA"]
+        columnas = [c for c in COLUMNAS.values() if c != "AREA_GEOGRAFICA"]
+        seleccion = [
+            tuple(f[posiciones[c]] for c in columnas)
+            for f in chain(preview[i + 1:], filas)
+            if len(f) > area and isinstance(f[area], str) and f[area].strip().upper() == "TOTAL"
+        ]
+    finally:
+        filas.close()
+    return pd.DataFrame(seleccion, columns=columnas)
+
+
+def tipar_poblacion(df: pd.DataFrame) -> pd.DataFrame:
+    """Codigos y poblacion enteros, nombres normalizados, orden por (DPMP, AÑO)."""
+    df = df.copy()
+    for col in ["DP", "DPMP", "AÑO", "TOTAL"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").round().astype("Int64")
+    for col in ["DPNOM", "MPNOM"]:
+        df[col] = normalizar(df[col])
+    df = df.dropna(subset=["DPMP", "AÑO"]).drop_duplicates(subset=["DPMP", "AÑO"])
+    return df.sort_values(["DPMP", "AÑO"], ignore_index=True)
+
+
+def cargar_poblacion(ruta: Path = POBLACION_PATH, url: str | None = None,
+                     hoja=None, forzar: bool = False, cache=None) -> pd.DataFrame:
+    """Tabla larga (DPMP, AÑO) -> TOTAL, compartida por todo el proceso.
+
+    El libro se obtiene del cache de crudos; si su SHA-256 coincide con el
+    del Parquet guardado se reutiliza el Parquet. Quien necesite modificar
+    el resultado debe trabajar sobre una copia.
+    """
+    ruta = Path(ruta)
+    clave = ruta.resolve()
+    if not forzar and clave in _memo:
+        return _memo[clave]
+
+    if url is None or hoja is None:
+        insumo = listar_insumos()["poblacion"]
+        url = url or insumo["url"]
+        hoja = insumo.get("hoja", 0) if hoja is None else hoja
+
+    crudo = (cache or cache_defecto()).obtener(url)
+    if forzar or not ruta.exists() or leer_metadatos(ruta).get("sha256") != crudo.sha256:
+        df = tipar_poblacion(leer_libro_poblacion(crudo.ruta, hoja=hoja))
+        escribir_parquet(df, ruta, {"url": url, "sha256": crudo.sha256, "hoja": hoja,
+                                    "filas": len(df)})
+        print(f"📌 Poblacion DANE: {df['DPMP'].nunique():,} municipios, "
+              f"{df['AÑO'].min()}-{df['AÑO'].max()}")
+
+    _memo[clave] = pd.read_parquet(ruta)
+    _claves.pop(clave, None)
+    return _memo[clave]
+
+
+def buscar_poblacion(codigos, anios, ruta: Path = POBLACION_PATH) -> np.ndarray:
+    """Poblacion total para cada par (codigo, anio); NaN si no existe.
+
+    ``codigos`` puede traer DPMP de 5 digitos o el ``CODIGO_DANE`` de 8
+    digitos de la Policia (DPMP seguido de ``000``). La busqueda es una sola
+    ``np.searchsorted`` sobre la clave ``DPMP * 10000 + AÑO``.
+    """
+    tabla = cargar_poblacion(ruta)
+    clave = Path(ruta).resolve()
+    if clave not in _claves:
+        _claves[clave] = (tabla["DPMP"].to_numpy("int64") * 10000
+                          + tabla["AÑO"].to_numpy("int64"))
+    indice = _claves[clave]
+    totales = tabla["TOTAL"].to_numpy("float64", na_value=np.nan)
+
+    codigos = pd.to_numeric(pd.Series(codigos), errors="coerce").astype("float64").to_numpy()
+    anios = pd.to_numeric(pd.Series(anios), errors="coerce").astype("float64").to_numpy()
+    validos = ~(np.isnan(codigos) | np.isnan(anios))
+    if not len(indice):
+        return np.full(len(codigos), np.nan)
+
+    codigos = np.nan_to_num(codigos, nan=0).astype("int64")
+    codigos = np.where(codigos >= 100_000, codigos // 1000, codigos)
+    buscadas = np.where(validos, codigos * 10000 + np.nan_to_num(anios, nan=0).astype("int64"), -1)
+    pos = np.minimum(np.searchsorted(indice, buscadas), len(indice) - 1)
+    encontradas = validos & (indice[pos] == buscadas)
+    return np.where(encontradas, totales[pos], np.nan)
@@ -0,0 +1,517 @@
+"""
+Servidor HTTP local que reproduce las fuentes del catalogo sin red.
+
+Sirve copias grabadas de cada URL de ``datos/catalogo.yaml`` (libros de la
+Policia, API DIVIPOLA de datos.gov.co y libro de poblacion del DANE) para
+ejecutar y medir la ingesta en una maquina sin acceso a internet. La
+latencia, el ancho de banda y los errores del servidor son configurables.
+La latencia es fija y cada error o corte se decide a partir de ``semilla``,
+la ruta pedida y el numero de intento sobre esa ruta, no de un generador
+compartido: el resultado no depende del orden en que los hilos atienden
+las peticiones, y la concurrencia, los reintentos y el cache de la ingesta
+se pueden comparar entre corridas.
+
+Como un servidor real, respeta ``If-None-Match`` / ``If-Modified-Since``
+(304) y ``Range`` (206); con ``If-Range`` el rango solo se sirve si el
+validador coincide con el ``ETag`` o el ``Last-Modified`` actuales, si no
+se responde el archivo completo (200).
+
+Una URL ``https://<host>/<ruta>?<query>`` se sirve como
+``http://127.0.0.1:<puerto>/<host>/<ruta>?<query>``.
+
+Uso:
+    poetry run python -m src.ingesta.servidor_prueba grabar --destino datos/fixtures
+    poetry run python -m src.ingesta.servidor_prueba servir --destino datos/fixtures \\
+        --puerto 8765 --latencia 0.2 --ancho-banda 500000 --tasa-error 0.05
+    poetry run python -m src.ingesta.main --espejo http://127.0.0.1:8765
+"""
+
+import argparse
+import copy
+import email.utils
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+from src.ingesta.catalogo import (
+    cargar_catalogo,
+    listar_consultas,
+    listar_insumos,
+    listar_recursos,
+)
+
+FIXTURES_DIR = Path("datos/fixtures")
+LIMITE_SOCRATA = 50_000
+BLOQUE = 1 << 14
+
+
+def clave_url(url: str) -> str:
+    """Clave de grabacion de una URL: ``<host><ruta>[?<query>]`` sin esquema."""
+    partes = urlparse(url)
+    clave = f"{partes.netloc}{partes.path}"
+    return f"{clave}?{partes.query}" if partes.query else clave
+
+
+def reescribir_url(url: str, base_url: str) -> str:
+    """URL equivalente servida por el espejo ``base_url``."""
+    return f"{base_url.rstrip('/')}/{clave_url(url)}"
+
+
+def reescribir_catalogo(catalogo: dict, base_url: str) -> dict:
+    """Copia del catalogo con todas las URLs apuntando al espejo."""
+    nuevo = copy.deepcopy(catalogo)
+    for meta in (nuevo.get("fuentes") or {}).values():
+        urls = (meta or {}).get("urls") or {}
+        for clave, url in urls.items():
+            urls[clave] = reescribir_url(url, base_url)
+    for meta in [*(nuevo.get("insumos") or {}).values(), *(nuevo.get("socrata") or {}).values()]:
+        if meta and meta.get("url"):
+            meta["url"] = reescribir_url(meta["url"], base_url)
+    return nuevo
+
+
+class Grabacion:
+    """Copias grabadas de URLs en un directorio con un ``indice.json``."""
+
+    def __init__(self, raiz: Path = FIXTURES_DIR):
+        self.raiz = Path(raiz)
+        self.ruta_indice = self.raiz / "indice.json"
+        self._lock = threading.Lock()
+        self.indice = {}
+        if self.ruta_indice.exists():
+            with open(self.ruta_indice, encoding="utf-8") as f:
+                self.indice = json.load(f)
+
+    def agregar(self, url: str, contenido: bytes, content_type: str | None = None,
+                socrata: bool = False):
+        """Guardar ``contenido`` como respuesta de ``url``.
+
+        Con ``socrata=True`` el contenido es el arreglo JSON completo y el
+        servidor resuelve la consulta SoQL de cada peticion sobre el.
+        """
+        sha256 = hashlib.sha256(contenido).hexdigest()
+        nombre = sha256 + (Path(urlparse(url).path).suffix or "")
+        (self.raiz / "archivos").mkdir(parents=True, exist_ok=True)
+        (self.raiz / "archivos" / nombre).write_bytes(contenido)
+        with self._lock:
+            self.indice[clave_url(url)] = {
+                "archivo": f"archivos/{nombre}",
+                "content_type": content_type or mimetypes.guess_type(url)[0]
+                or "application/octet-stream",
+                "etag": f'"{sha256[:16]}"',
+                "last_modified": email.utils.formatdate(time.time(), usegmt=True),
+                "socrata": socrata,
+            }
+            self._guardar()
+
+    def _guardar(self):
+        self.raiz.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta_indice.with_suffix(".json.tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(self.indice, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(temporal, self.ruta_indice)
+
+    def buscar(self, clave: str) -> dict | None:
+        """Entrada grabada para ``clave`` (o para su ruta sin query si es Socrata)."""
+        entrada = self.indice.get(clave)
+        if entrada is None and "?" in clave:
+            entrada = self.indice.get(clave.split("?", 1)[0])
+            if entrada is not None and not entrada.get("socrata"):
+                entrada = None
+        return entrada
+
+    def contenido(self, entrada: dict) -> bytes:
+        return (self.raiz / entrada["archivo"]).read_bytes()
+
+
+def grabar(raiz: Path = FIXTURES_DIR, catalogo: dict | None = None, session=None,
+           verbose: bool = True) -> Grabacion:
+    """Descargar todas las URLs del catalogo y guardarlas en ``raiz``."""
+    catalogo = catalogo if catalogo is not None else cargar_catalogo()
+    grabacion = Grabacion(raiz)
+    cliente = session or requests.Session()
+
+    pendientes = [(r.url, False) for r in listar_recursos(catalogo)]
+    for meta in listar_insumos(catalogo).values():
+        pendientes.append((meta["url"], bool(meta.get("socrata_id"))))
+    pendientes += [(c.url, True) for c in listar_consultas(catalogo)]
+
+    for url, socrata in pendientes:
+        if clave_url(url) in grabacion.indice:
+            continue
+        destino = f"{url}?$limit={LIMITE_SOCRATA}" if socrata else url
+        try:
+            resp = cliente.get(destino, timeout=300)
+            resp.raise_for_status()
+        except requests.RequestException as e:
+            if verbose:
+                print(f"⚠️ {url}: {e}")
+            continue
+        grabacion.agregar(url, resp.content, resp.headers.get("Content-Type"), socrata=socrata)
+        if verbose:
+            print(f"✅ {url}: {len(resp.content):,} bytes")
+    return grabacion
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "ServidorPrueba"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._responder(cuerpo=False)
+
+    def do_GET(self):
+        self._responder(cuerpo=True)
+
+    def _enviar_estado(self, codigo: int, headers: dict | None = None):
+        self.server.registrar(self.path, codigo)
+        self.send_response(codigo)
+        for nombre, valor in (headers or {}).items():
+            self.send_header(nombre, valor)
+        if codigo >= 300:
+            self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _responder(self, cuerpo: bool):
+        srv = self.server
+        intento = srv.intento(self.command, self.path)
+        if srv.latencia:
+            time.sleep(srv.latencia)
+        if srv.sortear(srv.tasa_error, "error", self.path, intento):
+            return self._enviar_estado(srv.codigo_error)
+
+        clave = self.path.lstrip("/")
+        entrada = srv.grabacion.buscar(clave)
+        if entrada is None:
+            return self._enviar_estado(404)
+
+        datos = srv.grabacion.contenido(entrada)
+        if entrada.get("socrata"):
+            datos, extra = _consultar_socrata(datos, clave)
+        else:
+            extra = {}
+        validadores = {"ETag": entrada["etag"], "Last-Modified": entrada["last_modified"]}
+
+        if self.headers.get("If-None-Match") == entrada["etag"] or (
+                "If-None-Match" not in self.headers
+                and self.headers.get("If-Modified-Since") == entrada["last_modified"]):
+            return self._enviar_estado(304, validadores)
+
+        codigo, inicio, fin = 200, 0, len(datos)
+        rango = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        if rango and if_range is not None and if_range not in validadores.values():
+            rango = None   # el archivo cambio desde la descarga parcial: va completo
+        if rango:
+            inicio = int(rango.group(1))
+            fin = min(int(rango.group(2)) + 1, len(datos)) if rango.group(2) else len(datos)
+            if inicio >= len(datos):
+                return self._enviar_estado(416, {"Content-Range": f"bytes */{len(datos)}"})
+            codigo = 206
+
+        self.server.registrar(self.path, codigo)
+        self.send_response(codigo)
+        self.send_header("Content-Type", entrada["content_type"])
+        self.send_header("Content-Length", str(fin - inicio))
+        self.send_header("Accept-Ranges", "bytes")
+        if codigo == 206:
+            self.send_header("Content-Range", f"bytes {inicio}-{fin - 1}/{len(datos)}")
+        for nombre, valor in {**validadores, **extra}.items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        if not cuerpo:
+            return
+
+        cortar = srv.sortear(srv.tasa_corte, "corte", self.path, intento)
+        limite = inicio + (fin - inicio) // 2 if cortar else fin
+        for pos in range(inicio, limite, BLOQUE):
+            bloque = datos[pos:min(pos + BLOQUE, limite)]
+            self.wfile.write(bloque)
+            if srv.ancho_banda:
+                time.sleep(len(bloque) / srv.ancho_banda)
+        if cortar:
+            self.close_connection = True
+
+
+_AGREGADOS = {
+    "count": len,
+    "sum": lambda v: sum(float(x) for x in v),
+    "min": lambda v: min(v, key=_ordenable),
+    "max": lambda v: max(v, key=_ordenable),
+    "avg": lambda v: sum(float(x) for x in v) / len(v),
+}
+_FUNCIONES = {
+    "date_extract_y": lambda v: v[:4] if v else None,
+    "date_extract_m": lambda v: str(int(v[5:7])) if v else None,
+    "upper": lambda v: v.upper() if v else v,
+}
+_COMPARACION = re.compile(
+    r"^\s*(?P<campo>.+?)\s*(?P<op>>=|<=|!=|<>|=|>|<|\bIS\s+NOT\s+NULL\b|\bIS\s+NULL\b)"
+    r"\s*(?P<valor>'(?:[^']|'')*'|[-\d.]+)?\s*$", re.IGNORECASE)
+_LLAMADA = re.compile(r"^(\w+)\((.*)\)$")
+
+
+def _partir(texto: str, separador: str = ",") -> list[str]:
+    """Partir ``texto`` por ``separador`` fuera de parentesis y comillas."""
+    partes, nivel, comillas, actual = [], 0, False, ""
+    for c in texto:
+        if c == "'":
+            comillas = not comillas
+        elif not comillas and c in "()":
+            nivel += 1 if c == "(" else -1
+        if c == separador and not nivel and not comillas:
+            partes.append(actual.strip())
+            actual = ""
+        else:
+            actual += c
+    return partes + [actual.strip()] if actual.strip() else partes
+
+
+def _ordenable(valor):
+    """Clave de orden: numeros como numeros, el resto como texto, nulos al final."""
+    if valor is None:
+        return (2, 0, "")
+    try:
+        return (0, float(valor), "")
+    except (TypeError, ValueError):
+        return (1, 0, str(valor))
+
+
+def _evaluar(expresion: str, fila: dict):
+    llamada = _LLAMADA.match(expresion)
+    if llamada and llamada.group(1).lower() in _FUNCIONES:
+        return _FUNCIONES[llamada.group(1).lower()](_evaluar(llamada.group(2).strip(), fila))
+    return fila.get(expresion)
+
+
+def _cumple(condicion: str, fila: dict) -> bool:
+    """Evaluar ``campo <op> literal`` unidas por AND."""
+    for parte in re.split(r"\s+AND\s+", condicion, flags=re.IGNORECASE):
+        parte = parte.strip()
+        while parte.startswith("(") and parte.count("(") > parte.count(")"):
+            parte = parte[1:]
+        while parte.endswith(")") and parte.count(")") > parte.count("("):
+            parte = parte[:-1]
+        m = _COMPARACION.match(parte)
+        if not m:
+            raise ValueError(f"$where no soportado: {parte}")
+        valor = _evaluar(m.group("campo"), fila)
+        op = m.group("op").upper().replace(" ", "")
+        if op in ("ISNULL", "ISNOTNULL"):
+            if (valor is None) != (op == "ISNULL"):
+                return False
+            continue
+        literal = m.group("valor") or ""
+        literal = literal[1:-1].replace("''", "'") if literal.startswith("'") else literal
+        if valor is None:
+            return False
+        a, b = _ordenable(valor), _ordenable(literal)
+        if a[0] != b[0]:
+            a, b = (1, 0, str(valor)), (1, 0, literal)
+        if not {"=": a == b, "!=": a != b, "<>": a != b, ">": a > b, ">=": a >= b,
+                "<": a < b, "<=": a <= b}[op]:
+            return False
+    return True
+
+
+def _proyectar(select: str, filas: list[dict], group: str | None):
+    """Aplicar ``$select`` (con ``$group`` y agregados): filas, nombres y tipos."""
+    columnas = []
+    visibles = list(dict.fromkeys(k for f in filas for k in f if not k.startswith(":")))
+    expresiones = [e for x in _partir(select) for e in (visibles if x == "*" else [x])]
+    for expresion in expresiones:
+        m = re.match(r"^(.*?)\s+AS\s+(\w+)$", expresion, re.IGNORECASE)
+        expresion, alias = (m.group(1).strip(), m.group(2)) if m else (expresion, None)
+        llamada = _LLAMADA.match(expresion)
+        agregado = llamada and llamada.group(1).lower() in _AGREGADOS
+        nombre = alias or (f"{llamada.group(1).lower()}_{llamada.group(2).strip('*') or 'all'}"
+                           if agregado else expresion)
+        columnas.append((nombre, expresion, agregado and llamada.group(1).lower(),
+                         agregado and llamada.group(2).strip()))
+
+    nombres = [c[0] for c in columnas]
+    tipos = ["number" if c[2] else "text" for c in columnas]
+    if not any(c[2] for c in columnas) and not group:
+        return [{n: _evaluar(e, f) for n, e, _, _ in columnas} for f in filas], nombres, tipos
+
+    claves = _partir(group) if group else []
+    grupos: dict[tuple, list[dict]] = {}
+    for fila in filas:
+        grupos.setdefault(tuple(_evaluar(c, fila) for c in claves), []).append(fila)
+    if not claves and not grupos:
+        grupos[()] = []
+    resultado = []
+    for miembros in grupos.values():
+        salida = {}
+        for nombre, expresion, agregado, argumento in columnas:
+            if agregado:
+                valores = miembros if argumento == "*" else [
+                    v for v in (_evaluar(argumento, f) for f in miembros) if v is not None]
+                valor = _AGREGADOS[agregado](valores) if valores or agregado == "count" else None
+                if isinstance(valor, float) and valor.is_integer():
+                    valor = int(valor)
+                salida[nombre] = None if valor is None else str(valor)
+            else:
+                salida[nombre] = _evaluar(expresion, miembros[0]) if miembros else None
+        resultado.append(salida)
+    return resultado, nombres, tipos
+
+
+def _consultar_socrata(datos: bytes, clave: str) -> tuple[bytes, dict]:
+    """Resolver un subconjunto de SoQL sobre un arreglo JSON grabado.
+
+    Soporta ``$select`` (``*``, columnas, alias, ``count/sum/min/max/avg`` y
+    ``date_extract_y/m``), ``$where`` con comparaciones unidas por AND,
+    ``$group``, ``$order`` y ``$limit`` / ``$offset``. Las columnas de
+    sistema (``:id``, ``:updated_at``) solo salen si se piden; si la
+    grabacion no trae ``:id`` se usa la posicion de la fila.
+    """
+    query = dict(parse_qsl(urlparse("//" + clave).query))
+    filas = [
+        {":id": f"row-{i:08d}", **fila} for i, fila in enumerate(json.loads(datos))
+    ]
+    if query.get("$where"):
+        filas = [f for f in filas if _cumple(query["$where"], f)]
+
+    headers = {}
+    if query.get("$select"):
+        filas, nombres, tipos = _proyectar(query["$select"], filas, query.get("$group"))
+        headers = {"X-SODA2-Fields": json.dumps(nombres), "X-SODA2-Types": json.dumps(tipos)}
+
+    for expresion in reversed(_partir(query.get("$order") or "")):
+        partes = expresion.split()
+        descendente = len(partes) > 1 and partes[1].upper() == "DESC"
+        filas.sort(key=lambda f, c=partes[0]: _ordenable(_evaluar(c, f)), reverse=descendente)
+
+    offset = int(query.get("$offset", 0))
+    limite = int(query.get("$limit", 1000))
+    sistema = not query.get("$select")
+    pagina = [
+        {k: v for k, v in f.items() if v is not None and not (sistema and k.startswith(":"))}
+        for f in filas[offset:offset + limite]
+    ]
+    return json.dumps(pagina, ensure_ascii=False).encode(), headers
+
+
+class ServidorPrueba(ThreadingHTTPServer):
+    """Espejo HTTP local de las fuentes grabadas.
+
+    ``latencia`` en segundos antes de cada respuesta, ``ancho_banda`` en
+    bytes/s por conexion, ``tasa_error`` probabilidad de responder
+    ``codigo_error`` y ``tasa_corte`` probabilidad de cortar la conexion a
+    mitad del cuerpo. Los sorteos dependen solo de ``semilla``, la ruta y el
+    numero de intento (ver ``sortear``).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, raiz: Path = FIXTURES_DIR, host: str = "127.0.0.1", puerto: int = 0,
+                 latencia: float = 0.0, ancho_banda: float | None = None,
+                 tasa_error: float = 0.0, codigo_error: int = 503, tasa_corte: float = 0.0,
+                 semilla: int = 0):
+        super().__init__((host, puerto), _Handler)
+        self.grabacion = raiz if isinstance(raiz, Grabacion) else Grabacion(raiz)
+        self.latencia = latencia
+        self.ancho_banda = ancho_banda
+        self.tasa_error = tasa_error
+        self.codigo_error = codigo_error
+        self.tasa_corte = tasa_corte
+        self.peticiones: list[tuple[str, int]] = []
+        self.semilla = semilla
+        self._intentos: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    @property
+    def base_url(self) -> str:
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def url(self, original: str) -> str:
+        return reescribir_url(original, self.base_url)
+
+    def intento(self, metodo: str, ruta: str) -> int:
+        """Numero de peticiones ``metodo`` anteriores a ``ruta`` (0 la primera)."""
+        with self._lock:
+            n = self._intentos.get((metodo, ruta), 0)
+            self._intentos[metodo, ruta] = n + 1
+        return n
+
+    def sortear(self, probabilidad: float, evento: str, ruta: str, intento: int) -> bool:
+        """Decision determinista de ``evento`` para el ``intento`` sobre ``ruta``."""
+        if not probabilidad:
+            return False
+        azar = random.Random(f"{self.semilla}:{evento}:{ruta}:{intento}")
+        return azar.random() < probabilidad
+
+    def registrar(self, ruta: str, codigo: int):
+        with self._lock:
+            self.peticiones.append((ruta, codigo))
+
+    def iniciar(self) -> "ServidorPrueba":
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Espejo local de las fuentes del catalogo")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_grabar = sub.add_parser("grabar", help="Descargar y grabar todas las fuentes")
+    p_grabar.add_argument("--destino", type=Path, default=FIXTURES_DIR)
+
+    p_servir = sub.add_parser("servir", help="Servir las fuentes grabadas")
+    p_servir.add_argument("--destino", type=Path, default=FIXTURES_DIR)
+    p_servir.add_argument("--host", default="127.0.0.1")
+    p_servir.add_argument("--puerto", type=int, default=8765)
+    p_servir.add_argument("--latencia", type=float, default=0.0)
+    p_servir.add_argument("--ancho-banda", type=float, default=None, help="bytes/s")
+    p_servir.add_argument("--tasa-error", type=float, default=0.0)
+    p_servir.add_argument("--codigo-error", type=int, default=503)
+    p_servir.add_argument("--tasa-corte", type=float, default=0.0)
+    p_servir.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.comando == "grabar":
+        grabar(args.destino)
+        return
+
+    servidor = ServidorPrueba(args.destino, host=args.host, puerto=args.puerto,
+                              latencia=args.latencia, ancho_banda=args.ancho_banda,
+                              tasa_error=args.tasa_error, codigo_error=args.codigo_error,
+                              tasa_corte=args.tasa_corte, semilla=args.semilla)
+    print(f"🛰️ Sirviendo {len(servidor.grabacion.indice)} URLs en {servidor.base_url}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
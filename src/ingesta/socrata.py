@@ -0,0 +1,403 @@
+"""
+Ingesta de recursos Socrata (datos.gov.co) con la consulta resuelta en el servidor.
+
+Cada ``ConsultaSocrata`` del catalogo envia su ``$select`` / ``$where`` /
+``$group`` al servidor, de modo que la proyeccion, el filtro y la agregacion
+no viajan por la red: para conteos municipales se descargan unas miles de
+filas agregadas en lugar de millones de registros crudos.
+
+Las paginas (``$limit`` / ``$offset``) se piden en tandas de ``paralelo``
+peticiones simultaneas a traves del ``Transporte`` compartido y se escriben
+en orden, cada una como un row group, a un Parquet temporal que se renombra
+al terminar. Nunca se tiene en memoria mas de una tanda.
+
+Los tipos salen del encabezado ``X-SODA2-Types`` de la respuesta: ``number``
+pasa a ``float64``, las fechas a ``timestamp[ms]``, ``checkbox`` a ``bool`` y
+el resto queda como texto. Los campos geograficos (``point``, ``location``...)
+llegan como objetos JSON y se guardan como su texto JSON.
+
+Las consultas ``incremental`` no se vuelven a descargar completas: se guarda
+por dataset la marca de agua (el mayor ``:updated_at`` visto y los ``:id``
+vistos con esa marca de tiempo), se piden solo las filas con ``:updated_at``
+desde esa marca y se fusionan por clave en las particiones bronce que tocan.
+El costo de la actualizacion mensual depende del tamano del cambio, no del
+tamano del dataset. Una sincronizacion completa escribe las particiones en
+un directorio aparte y solo lo pone en lugar del anterior (y luego actualiza
+la marca) si todo salio bien.
+
+Uso:
+    from src.ingesta.socrata import descargar_consultas
+    resultados = descargar_consultas(listar_consultas(), raiz=Path("datos/raw"))
+"""
+
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import requests
+
+from src.ingesta.bronce import BRONZE_DIR, CLAVE_METADATOS, escribir_parquet
+from src.ingesta.catalogo import ConsultaSocrata
+from src.ingesta.transporte import Transporte, transporte_defecto
+
+PARALELO = 4
+TIMEOUT = 120
+MARCA = "_marca.json"
+SIN_PARTICION = "datos"
+# Errores esperables al pedir, decodificar o escribir una consulta
+ERRORES_SOCRATA = (requests.RequestException, OSError, ValueError, KeyError, pa.ArrowException)
+
+TIPOS = {
+    "number": pa.float64(),
+    "double": pa.float64(),
+    "money": pa.float64(),
+    "calendar_date": pa.timestamp("ms"),
+    "floating_timestamp": pa.timestamp("ms"),
+    "checkbox": pa.bool_(),
+}
+
+
+@dataclass
+class ResultadoSocrata:
+    """Resultado de descargar una consulta."""
+
+    consulta: ConsultaSocrata
+    ruta: Path | None
+    filas: int = 0
+    paginas: int = 0
+    bytes: int = 0
+    segundos: float = 0.0
+    particiones: int = 0
+    marca: dict | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def esquema_respuesta(headers, pagina: list[dict]) -> pa.Schema:
+    """Esquema Arrow a partir de ``X-SODA2-Fields`` / ``X-SODA2-Types``.
+
+    Si el servidor no envia esos encabezados se usan las claves de la
+    primera pagina, todas como texto.
+    """
+    campos = headers.get("X-SODA2-Fields")
+    if campos:
+        nombres = json.loads(campos)
+        tipos = json.loads(headers.get("X-SODA2-Types") or "[]") or ["text"] * len(nombres)
+    else:
+        nombres = list(dict.fromkeys(k for fila in pagina for k in fila))
+        tipos = ["text"] * len(nombres)
+    return pa.schema([(n, TIPOS.get(t, pa.string())) for n, t in zip(nombres, tipos)])
+
+
+def _texto_celda(valor) -> str | None:
+    """Celda JSON como texto: objetos, listas y booleanos como JSON, el resto con ``str``."""
+    if valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, (dict, list, bool)):
+        return json.dumps(valor, ensure_ascii=False)
+    return str(valor)
+
+
+def tabla_pagina(pagina: list[dict], esquema: pa.Schema) -> pa.Table:
+    """Filas JSON de una pagina como tabla con ``esquema``.
+
+    Socrata serializa los numeros como texto, pero los ``checkbox`` llegan
+    como ``true``/``false`` y los puntos o ubicaciones como objetos: todo se
+    pasa a texto (``_texto_celda``) y luego se convierte columna a columna.
+    """
+    columnas_texto = {c.name: [_texto_celda(f.get(c.name)) for f in pagina] for c in esquema}
+    crudo = pa.table(columnas_texto, schema=pa.schema([(c.name, pa.string()) for c in esquema]))
+    columnas = [
+        crudo.column(c.name) if c.type == pa.string() else pc.cast(crudo.column(c.name), c.type)
+        for c in esquema
+    ]
+    return pa.Table.from_arrays(columnas, schema=esquema)
+
+
+def descargar_consulta(consulta: ConsultaSocrata, raiz: Path,
+                       transporte: Transporte | None = None, paralelo: int = PARALELO,
+                       timeout: float = TIMEOUT, params_extra: dict | None = None,
+                       destino: Path | None = None) -> ResultadoSocrata:
+    """Descargar ``consulta`` paginada y en paralelo a ``destino``.
+
+    Por defecto ``destino`` es ``consulta.destino(raiz)``.
+    """
+    inicio = time.perf_counter()
+    transporte = transporte or transporte_defecto()
+    destino = Path(destino) if destino else consulta.destino(raiz)
+    params = {**consulta.parametros(), **(params_extra or {})}
+    tam = consulta.tam_pagina
+
+    def _pagina(offset):
+        resp = transporte.get(consulta.url, timeout=timeout,
+                              params={**params, "$limit": tam, "$offset": offset})
+        return resp.headers, resp.json(), len(resp.content)
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporal = destino.with_name(destino.name + ".tmp")
+    escritor, esquema = None, None
+    filas = paginas = total_bytes = 0
+    try:
+        with ThreadPoolExecutor(max_workers=paralelo) as pool:
+            offset, terminado = 0, False
+            while not terminado:
+                tanda = list(pool.map(_pagina, range(offset, offset + tam * paralelo, tam)))
+                offset += tam * paralelo
+                for headers, pagina, n_bytes in tanda:
+                    if escritor is None:
+                        esquema = esquema_respuesta(headers, pagina).with_metadata({
+                            CLAVE_METADATOS: json.dumps({
+                                "url": consulta.url,
+                                "parametros": params,
+                                "descargado": time.time(),
+                            }, ensure_ascii=False).encode(),
+                        })
+                        escritor = pq.ParquetWriter(temporal, esquema)
+                    if pagina:
+                        escritor.write_table(tabla_pagina(pagina, esquema))
+                    filas += len(pagina)
+                    paginas += 1
+                    total_bytes += n_bytes
+                    if len(pagina) < tam:
+                        terminado = True
+                        break
+        escritor.close()
+        temporal.replace(destino)
+    except ERRORES_SOCRATA as e:
+        if escritor is not None:
+            escritor.close()
+        temporal.unlink(missing_ok=True)
+        return ResultadoSocrata(consulta, None, segundos=time.perf_counter() - inicio,
+                                error=f"{type(e).__name__}: {e}")
+    return ResultadoSocrata(consulta, destino, filas=filas, paginas=paginas, bytes=total_bytes,
+                            segundos=time.perf_counter() - inicio)
+
+
+def directorio_incremental(consulta: ConsultaSocrata, bronze_dir: Path = BRONZE_DIR) -> Path:
+    """Directorio ``<bronze_dir>/socrata/<nombre>/`` con las particiones."""
+    return Path(bronze_dir) / "socrata" / consulta.nombre
+
+
+def leer_marca(directorio: Path) -> dict | None:
+    """Marca de agua guardada (``{"updated_at": ..., "ids": [...]}``) o None."""
+    try:
+        with open(Path(directorio) / MARCA, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def guardar_marca(directorio: Path, marca: dict):
+    temporal = Path(directorio) / (MARCA + ".tmp")
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(marca, f, indent=2)
+    os.replace(temporal, Path(directorio) / MARCA)
+
+
+def consulta_delta(consulta: ConsultaSocrata, marca: dict | None) -> ConsultaSocrata:
+    """La consulta restringida a filas con ``:updated_at`` desde ``marca``.
+
+    Se usa ``>=`` y no ``>``: las filas con la misma marca de tiempo que
+    llegaron despues de la corrida anterior tambien entran. Las ya vistas
+    (misma marca de tiempo y un ``:id`` de los guardados en la marca) se
+    descartan en ``sincronizar`` antes de fusionar.
+    """
+    if consulta.group:
+        raise ValueError(f"{consulta.nombre}: una consulta agregada no puede ser incremental")
+    select = ", ".join(dict.fromkeys([":id", ":updated_at", consulta.clave,
+                                      consulta.select or "*"]))
+    where = consulta.where
+    if marca:
+        filtro = f":updated_at >= '{marca['updated_at']}'"
+        where = f"({where}) AND {filtro}" if where else filtro
+    return replace(consulta, select=select, where=where, order=":updated_at, :id")
+
+
+def _texto_marca(valor) -> str:
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+    return str(valor)
+
+
+def _ids_marca(marca: dict) -> set[str]:
+    """``:id`` vistos con la marca de tiempo (las marcas viejas guardaban uno solo)."""
+    return set(marca.get("ids") or ([marca["id"]] if marca.get("id") else []))
+
+
+def nueva_marca(cambios: pd.DataFrame, marca: dict | None) -> dict:
+    """Mayor ``:updated_at`` de ``cambios`` y todos los ``:id`` con esa marca de tiempo.
+
+    Los ``:id`` de Socrata no tienen un orden util, asi que solo se usan
+    por igualdad para desempatar filas con la misma marca de tiempo.
+    """
+    textos = cambios[":updated_at"].map(_texto_marca)
+    ultima = _texto_marca(cambios[":updated_at"].max())
+    ids = set(cambios.loc[textos == ultima, ":id"].astype(str))
+    if marca and marca["updated_at"] == ultima:
+        ids |= _ids_marca(marca)
+    return {"updated_at": ultima, "ids": sorted(ids)}
+
+
+def _particiones(directorio: Path) -> list[Path]:
+    return sorted(r for r in Path(directorio).glob("*.parquet") if not r.name.startswith("_"))
+
+
+def valores_particion(serie: pd.Series) -> pd.Series:
+    """Nombre de particion de cada fila (``nulo`` para los faltantes).
+
+    Las columnas ``number`` llegan como ``float64``: si todos los valores son
+    enteros se pasan a ``Int64`` para que el anio 2019 se guarde en
+    ``2019.parquet`` y no en ``2019.0.parquet``.
+    """
+    if pd.api.types.is_float_dtype(serie) and (serie.dropna() % 1 == 0).all():
+        serie = serie.astype("Int64")
+    return serie.astype("string").fillna("nulo")
+
+
+def _reemplazar_directorio(nuevo: Path, directorio: Path):
+    """Poner ``nuevo`` en lugar de ``directorio`` y borrar el anterior."""
+    viejo = directorio.with_name(directorio.name + ".viejo")
+    shutil.rmtree(viejo, ignore_errors=True)
+    if directorio.exists():
+        directorio.replace(viejo)
+    nuevo.replace(directorio)
+    shutil.rmtree(viejo, ignore_errors=True)
+
+
+def fusionar(delta: pd.DataFrame, directorio: Path, clave: str,
+             particion: str | None, metadatos: dict) -> int:
+    """Fusionar ``delta`` por ``clave`` en las particiones que toca.
+
+    Las filas de ``delta`` reemplazan a las de igual clave. Las claves se
+    quitan de todas las particiones, no solo de la suya: si un cambio mueve
+    la fila de particion (se corrige el anio, por ejemplo) la version vieja
+    no queda duplicada. De las particiones que no reciben filas solo se lee
+    la columna ``clave``, y solo se reescriben si tenian alguna de esas
+    claves. Devuelve el numero de particiones reescritas.
+    """
+    if particion:
+        grupos = dict(list(delta.groupby(valores_particion(delta[particion]), sort=True)))
+    else:
+        grupos = {SIN_PARTICION: delta}
+    claves = delta[clave]
+    reescritas = 0
+    for ruta in _particiones(directorio):
+        if ruta.stem in grupos:
+            continue
+        presentes = pq.read_table(ruta, columns=[clave]).column(clave).to_pandas()
+        if not presentes.isin(claves).any():
+            continue
+        previas = pd.read_parquet(ruta)
+        restantes = previas[~previas[clave].isin(claves)]
+        if len(restantes):
+            escribir_parquet(restantes.reset_index(drop=True), ruta,
+                             {**metadatos, "particion": ruta.stem, "filas": len(restantes)})
+        else:
+            ruta.unlink()
+        reescritas += 1
+    for valor, cambios in grupos.items():
+        ruta = Path(directorio) / f"{valor}.parquet"
+        if ruta.exists():
+            previas = pd.read_parquet(ruta)
+            previas = previas[~previas[clave].isin(claves)]
+            cambios = pd.concat([previas, cambios], ignore_index=True)
+        escribir_parquet(cambios.sort_values(clave, ignore_index=True), ruta,
+                         {**metadatos, "particion": str(valor), "filas": len(cambios)})
+        reescritas += 1
+    return reescritas
+
+
+def sincronizar(consulta: ConsultaSocrata, bronze_dir: Path = BRONZE_DIR,
+                transporte: Transporte | None = None, paralelo: int = PARALELO,
+                completa: bool = False) -> ResultadoSocrata:
+    """Traer solo las filas cambiadas desde la ultima marca y fusionarlas.
+
+    Sin marca (primera corrida) o con ``completa=True`` se descarga todo.
+    Las filas borradas en el origen no se detectan: para eso hace falta una
+    sincronizacion completa. Esta escribe las particiones en
+    ``<nombre>.tmp/`` y las pone en lugar de las anteriores solo al final;
+    si algo falla quedan intactas las particiones y la marca previas.
+    """
+    inicio = time.perf_counter()
+    directorio = directorio_incremental(consulta, bronze_dir)
+    marca = None if completa else leer_marca(directorio)
+    try:
+        delta = consulta_delta(consulta, marca)
+    except ValueError as e:
+        return ResultadoSocrata(consulta, None, error=f"ValueError: {e}")
+    temporal = directorio / "_delta.parquet"
+    salida = directorio.with_name(directorio.name + ".tmp") if completa else directorio
+    res = descargar_consulta(delta, bronze_dir, transporte=transporte, paralelo=paralelo,
+                             destino=temporal)
+    res.consulta = consulta
+    if not res.ok:
+        return res
+    try:
+        cambios = pd.read_parquet(temporal)
+        if marca:
+            vistas = ((cambios[":updated_at"].map(_texto_marca) == marca["updated_at"])
+                      & cambios[":id"].astype(str).isin(_ids_marca(marca)))
+            cambios = cambios[~vistas]
+        res.filas = len(cambios)
+        if completa:
+            shutil.rmtree(salida, ignore_errors=True)
+            salida.mkdir(parents=True)
+        if len(cambios):
+            res.particiones = fusionar(cambios, salida, consulta.clave, consulta.particion,
+                                       {"url": consulta.url, "sincronizado": time.time()})
+        if completa:
+            _reemplazar_directorio(salida, directorio)
+        if len(cambios):
+            marca = nueva_marca(cambios, marca)
+            guardar_marca(directorio, marca)
+        res.ruta = directorio
+    except ERRORES_SOCRATA as e:
+        res.ruta, res.error = None, f"{type(e).__name__}: {e}"
+        if completa:
+            shutil.rmtree(salida, ignore_errors=True)
+    finally:
+        temporal.unlink(missing_ok=True)
+    res.marca = marca
+    res.segundos = time.perf_counter() - inicio
+    return res
+
+
+def descargar_consultas(consultas: list[ConsultaSocrata], raiz: Path,
+                        transporte: Transporte | None = None, paralelo: int = PARALELO,
+                        verbose: bool = True, bronze_dir: Path = BRONZE_DIR,
+                        completa: bool = False) -> list[ResultadoSocrata]:
+    """Descargar todas las consultas, una tras otra (cada una pagina en paralelo).
+
+    Las consultas ``incremental`` se sincronizan en ``bronze_dir``; el resto
+    se descarga completa en ``raiz``.
+    """
+    resultados = []
+    for consulta in consultas:
+        if consulta.incremental:
+            res = sincronizar(consulta, bronze_dir, transporte=transporte, paralelo=paralelo,
+                              completa=completa)
+        else:
+            res = descargar_consulta(consulta, raiz, transporte=transporte, paralelo=paralelo)
+        resultados.append(res)
+        if verbose:
+            if res.ok and consulta.incremental:
+                print(f"🔄 {consulta.nombre}: {res.filas:,} filas nuevas o cambiadas en "
+                      f"{res.particiones} particiones ({res.bytes / 1e6:.2f} MB, "
+                      f"{res.segundos:.1f}s)")
+            elif res.ok:
+                print(f"🛰️ {consulta.nombre}: {res.filas:,} filas en {res.paginas} paginas "
+                      f"({res.bytes / 1e6:.2f} MB, {res.segundos:.1f}s)")
+            else:
+                print(f"⚠️ {consulta.nombre}: {res.error}")
+    return resultados
@@ -0,0 +1,266 @@
+"""
+Capa de transporte HTTP compartida por la ingesta.
+
+Todas las peticiones pasan por una sola ``requests.Session`` con conexiones
+persistentes (keep-alive), un tope de peticiones simultaneas por host, un
+limite global de peticiones por segundo y reintentos con espera exponencial
+con jitter ante errores de red, 429 y 5xx.
+
+Los archivos se descargan a un ``.part`` con nombre fijo por URL. Si la
+transferencia se corta, el siguiente intento (o la siguiente corrida)
+continua desde el ultimo byte recibido con ``Range`` / ``If-Range`` en
+lugar de empezar de cero.
+
+Uso:
+    transporte = Transporte(max_por_host=4, tasa_max=10)
+    res = transporte.descargar(url, Path("datos/raw/_cache/objetos/x.part"))
+"""
+
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIMEOUT = 120
+CHUNK = 1 << 15
+REINTENTOS = 5
+ESPERA_BASE = 0.5
+ESPERA_MAX = 30.0
+MAX_POR_HOST = 4
+MAX_CONEXIONES = 16
+CODIGOS_REINTENTABLES = {408, 425, 429, 500, 502, 503, 504}
+ERRORES_REINTENTABLES = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class ErrorReintentable(requests.RequestException):
+    """Respuesta que vale la pena reintentar (429, 5xx, cuerpo incompleto)."""
+
+    def __init__(self, mensaje: str, espera: float | None = None):
+        super().__init__(mensaje)
+        self.espera = espera
+
+
+@dataclass
+class ResultadoTransferencia:
+    """Resultado de ``Transporte.descargar``."""
+
+    codigo: int
+    headers: dict
+    bytes: int = 0
+    intentos: int = 1
+    reanudada: bool = False
+
+    @property
+    def no_modificado(self) -> bool:
+        return self.codigo == 304
+
+
+def _espera_retry_after(resp) -> float | None:
+    valor = resp.headers.get("Retry-After", "")
+    return float(valor) if valor.strip().isdigit() else None
+
+
+class Transporte:
+    """Sesion HTTP con pool, topes por host, limite global y reintentos."""
+
+    def __init__(self, max_por_host: int = MAX_POR_HOST, tasa_max: float | None = None,
+                 reintentos: int = REINTENTOS, espera_base: float = ESPERA_BASE,
+                 espera_max: float = ESPERA_MAX, max_conexiones: int = MAX_CONEXIONES,
+                 timeout: float = TIMEOUT):
+        self.max_por_host = max_por_host
+        self.tasa_max = tasa_max
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.timeout = timeout
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        self._lock = threading.Lock()
+        self._hosts: dict[str, threading.BoundedSemaphore] = {}
+        self._proximo_turno = 0.0
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _semaforo(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            return self._hosts.setdefault(host, threading.BoundedSemaphore(self.max_por_host))
+
+    def _esperar_tasa(self):
+        """Espaciar las peticiones para no superar ``tasa_max`` por segundo."""
+        if not self.tasa_max:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo_turno)
+            self._proximo_turno = turno + 1 / self.tasa_max
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+    @contextmanager
+    def _turno(self, url: str):
+        with self._semaforo(url):
+            self._esperar_tasa()
+            yield
+
+    def espera(self, intento: int, minima: float | None = None) -> float:
+        """Espera antes del reintento ``intento`` (exponencial con jitter completo)."""
+        tope = min(self.espera_max, self.espera_base * 2 ** intento)
+        return max(minima or 0.0, random.uniform(0, tope))
+
+    def _con_reintentos(self, funcion, url: str):
+        for intento in range(self.reintentos + 1):
+            try:
+                with self._turno(url):
+                    return funcion(intento)
+            except ERRORES_REINTENTABLES + (ErrorReintentable,) as e:
+                if intento == self.reintentos:
+                    raise
+                time.sleep(self.espera(intento, getattr(e, "espera", None)))
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET completo (sin streaming) con reintentos; para respuestas pequenas."""
+        kwargs.setdefault("timeout", self.timeout)
+
+        def _pedir(_intento):
+            resp = self.session.get(url, **kwargs)
+            if resp.status_code in CODIGOS_REINTENTABLES:
+                raise ErrorReintentable(f"HTTP {resp.status_code} en {url}",
+                                        _espera_retry_after(resp))
+            resp.raise_for_status()
+            return resp
+
+        return self._con_reintentos(_pedir, url)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """HEAD con reintentos. No lanza por 4xx: el codigo lo interpreta quien llama.
+
+        Si el servidor no implementa HEAD (405/501) se pide el primer byte
+        con ``Range`` y el tamano total sale de ``Content-Range``.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.setdefault("allow_redirects", True)
+
+        def _pedir(_intento):
+            resp = self.session.head(url, **kwargs)
+            if resp.status_code in (405, 501):
+                with self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True,
+                                      timeout=kwargs["timeout"]) as resp:
+                    total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                    if total.isdigit():
+                        resp.headers["Content-Length"] = total
+            if resp.status_code in CODIGOS_REINTENTABLES:
+                raise ErrorReintentable(f"HTTP {resp.status_code} en {url}",
+                                        _espera_retry_after(resp))
+            return resp
+
+        return self._con_reintentos(_pedir, url)
+
+    def descargar(self, url: str, parcial: Path, headers: dict | None = None,
+                  timeout: float | None = None) -> ResultadoTransferencia:
+        """Descargar ``url`` en ``parcial``, continuando una descarga anterior.
+
+        Junto al ``.part`` se guarda el validador (ETag o Last-Modified) de la
+        respuesta; si existe, se pide solo el resto con ``Range`` e
+        ``If-Range``. Si el servidor responde 200 en lugar de 206 (el archivo
+        cambio o no soporta rangos) se empieza de cero. Con 304 el ``.part``
+        no se toca.
+        """
+        parcial = Path(parcial)
+        parcial.parent.mkdir(parents=True, exist_ok=True)
+        ruta_validador = parcial.with_name(parcial.name + ".json")
+        timeout = timeout or self.timeout
+        estado = {"reanudada": False}
+
+        def _pedir(intento):
+            pedido = dict(headers or {})
+            validador = _leer_validador(ruta_validador, url)
+            offset = parcial.stat().st_size if parcial.exists() and validador else 0
+            if offset:
+                pedido["Range"] = f"bytes={offset}-"
+                pedido["If-Range"] = validador
+
+            with self.session.get(url, headers=pedido, stream=True, timeout=timeout) as resp:
+                if resp.status_code == 304:
+                    return ResultadoTransferencia(304, resp.headers, intentos=intento + 1)
+                if resp.status_code == 416:
+                    parcial.unlink(missing_ok=True)
+                    ruta_validador.unlink(missing_ok=True)
+                    raise ErrorReintentable(f"Rango invalido en {url}", espera=0)
+                if resp.status_code in CODIGOS_REINTENTABLES:
+                    raise ErrorReintentable(f"HTTP {resp.status_code} en {url}",
+                                            _espera_retry_after(resp))
+                resp.raise_for_status()
+
+                if resp.status_code == 206 and offset:
+                    modo = "ab"
+                    estado["reanudada"] = True
+                else:
+                    modo, offset = "wb", 0
+                    nuevo = resp.headers.get("ETag") or resp.headers.get("Last-Modified")
+                    if nuevo:
+                        _guardar_validador(ruta_validador, url, nuevo)
+                    else:
+                        ruta_validador.unlink(missing_ok=True)
+
+                esperados = resp.headers.get("Content-Length")
+                recibidos = 0
+                with open(parcial, modo) as f:
+                    for bloque in resp.iter_content(CHUNK):
+                        f.write(bloque)
+                        recibidos += len(bloque)
+                if esperados is not None and recibidos < int(esperados):
+                    raise ErrorReintentable(
+                        f"Cuerpo incompleto en {url}: {recibidos}/{esperados} bytes")
+
+            ruta_validador.unlink(missing_ok=True)
+            return ResultadoTransferencia(resp.status_code, resp.headers,
+                                          bytes=offset + recibidos, intentos=intento + 1,
+                                          reanudada=estado["reanudada"])
+
+        return self._con_reintentos(_pedir, url)
+
+
+def _leer_validador(ruta: Path, url: str) -> str | None:
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return datos.get("validador") if datos.get("url") == url else None
+
+
+def _guardar_validador(ruta: Path, url: str, validador: str):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "validador": validador}, f)
+
+
+_transporte_defecto: Transporte | None = None
+
+
+def transporte_defecto() -> Transporte:
+    """Instancia compartida por el proceso."""
+    global _transporte_defecto
+    if _transporte_defecto is None:
+        _transporte_defecto = Transporte()
+    return _transporte_defecto
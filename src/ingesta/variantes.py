@@ -0,0 +1,202 @@
+"""
+Union sin duplicados de las variantes ``<anio>_v1`` / ``<anio>_v2``.
+
+Para algunos anios el catalogo trae dos archivos de la misma fuente que se
+solapan parcialmente. Cada fila se resume en una huella de 64 bits
+(``pd.util.hash_pandas_object``) calculada sobre las columnas clave
+normalizadas, y las variantes se procesan de a una: solo se conserva en
+memoria el conteo de huellas ya vistas, nunca dos frames completos a la vez.
+
+Las filas identicas dentro de un mismo archivo son hechos distintos, asi que
+la union es de multiconjuntos: una huella que aparece 3 veces en v1 y 5 en
+v2 aparece 5 veces en el resultado.
+"""
+
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.ingesta.bronce import BRONZE_DIR, CLAVE_METADATOS, leer_metadatos
+from src.ingesta.encabezado import COLUMNAS_OBJETIVO
+from src.ingesta.normalizacion import normalizar
+from src.transformacion.fechas import parsear_fechas
+
+PATRON_VARIANTE = re.compile(r"^(\d{4})_(v\d+)$")
+
+
+def normalizar_claves(df: pd.DataFrame, columnas=COLUMNAS_OBJETIVO) -> pd.DataFrame:
+    """Columnas clave en una forma comparable entre variantes.
+
+    ``FECHA_HECHO`` se interpreta con ``parsear_fechas`` antes de llevarla a
+    ``YYYYMMDD``, asi una celda de fecha y un texto ``dd/mm/yyyy`` del mismo
+    dia dan la misma clave; lo que no se puede interpretar se compara como
+    texto.
+    """
+    claves = {}
+    for col in [c for c in columnas if c in df.columns]:
+        s = df[col]
+        if col == "FECHA_HECHO":
+            s = parsear_fechas(s).dt.strftime("%Y%m%d").astype("string").fillna(
+                s.astype("string").str.strip())
+        elif pd.api.types.is_numeric_dtype(s):
+            s = s.astype("Int64")
+        else:
+            s = normalizar(s)
+        claves[col] = s.astype("string").fillna("")
+    return pd.DataFrame(claves, index=df.index)
+
+
+def huellas(df: pd.DataFrame, columnas=COLUMNAS_OBJETIVO) -> np.ndarray:
+    """Huella uint64 de cada fila sobre las columnas clave normalizadas."""
+    return pd.util.hash_pandas_object(normalizar_claves(df, columnas), index=False).to_numpy()
+
+
+def filtrar_nuevas(h: np.ndarray, vistas: pd.Series) -> np.ndarray:
+    """Mascara de filas que exceden lo ya visto para su huella.
+
+    ``vistas`` cuenta cuantas veces se emitio cada huella. La k-esima
+    aparicion de una huella en ``h`` se conserva si k >= vistas[huella].
+    """
+    serie = pd.Series(h)
+    rango = serie.groupby(serie, sort=False).cumcount().to_numpy()
+    previas = serie.map(vistas).fillna(0).to_numpy()
+    return rango >= previas
+
+
+def unir_variantes(rutas: list[Path], destino: Path, columnas=COLUMNAS_OBJETIVO) -> list[dict]:
+    """Escribir en ``destino`` la union sin duplicados de los Parquet ``rutas``.
+
+    Una primera pasada lee solo las columnas clave para decidir que filas
+    conservar; la segunda copia esas filas variante por variante. Devuelve
+    el reporte de solapamiento: por variante, filas leidas, filas nuevas y
+    filas que ya estaban en variantes anteriores.
+    """
+    vistas = pd.Series(dtype="int64", index=pd.Index([], dtype="uint64"))
+    mascaras, reporte = [], []
+    for ruta in rutas:
+        presentes = [c for c in columnas if c in pq.read_schema(ruta).names]
+        h = huellas(pd.read_parquet(ruta, columns=presentes), presentes)
+        nuevas = filtrar_nuevas(h, vistas)
+        vistas = pd.concat([vistas, pd.Series(h).value_counts()]).groupby(level=0).max()
+        mascaras.append(nuevas)
+        reporte.append({
+            "variante": Path(ruta).stem,
+            "filas": len(h),
+            "nuevas": int(nuevas.sum()),
+            "solapadas": int((~nuevas).sum()),
+        })
+
+    esquema = _esquema_unido([pq.read_schema(r) for r in rutas])
+    esquema = esquema.with_metadata({
+        **(esquema.metadata or {}),
+        CLAVE_METADATOS: json.dumps({
+            "variantes": [leer_metadatos(r) for r in rutas],
+            "solapamiento": reporte,
+        }, ensure_ascii=False).encode(),
+    })
+    temporal = destino.with_name(destino.name + ".tmp")
+    with pq.ParquetWriter(temporal, esquema) as writer:
+        for ruta, nuevas in zip(rutas, mascaras):
+            tabla = pq.read_table(ruta).filter(pa.array(nuevas))
+            writer.write_table(_alinear(tabla, esquema))
+    temporal.replace(destino)
+    return reporte
+
+
+def _esquema_unido(esquemas: list[pa.Schema]) -> pa.Schema:
+    """Esquema con todas las columnas de las variantes, en orden de aparicion.
+
+    Los tipos de cada columna se unifican con ``pa.unify_schemas``; si no hay
+    promocion posible (p. ej. fecha en una variante y texto en otra) la
+    columna queda como texto. Los metadatos ``pandas`` de la primera variante
+    se conservan solo para las columnas cuyo tipo no cambio.
+    """
+    tipos = defaultdict(list)
+    for esquema in esquemas:
+        for campo in esquema:
+            tipos[campo.name].append(campo.type)
+    campos = []
+    for nombre, lista in tipos.items():
+        try:
+            unido = pa.unify_schemas([pa.schema([(nombre, t)]) for t in lista],
+                                     promote_options="permissive")
+            tipo = unido.field(nombre).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            tipo = pa.string()
+        campos.append(pa.field(nombre, tipo))
+
+    metadatos = dict(esquemas[0].metadata or {})
+    if b"pandas" in metadatos:
+        primero = esquemas[0]
+        cambiadas = {c.name for c in campos if c.name in primero.names
+                     and not primero.field(c.name).type.equals(c.type)}
+        pandas_meta = json.loads(metadatos[b"pandas"])
+        pandas_meta["columns"] = [c for c in pandas_meta.get("columns", [])
+                                  if c.get("field_name") not in cambiadas]
+        metadatos[b"pandas"] = json.dumps(pandas_meta).encode()
+    return pa.schema(campos, metadata=metadatos)
+
+
+def _alinear(tabla: pa.Table, esquema: pa.Schema) -> pa.Table:
+    """Ajustar ``tabla`` al esquema unido, con nulos en las columnas que no trae."""
+    columnas = []
+    for campo in esquema:
+        if campo.name in tabla.column_names:
+            col = tabla.column(campo.name)
+            if not col.type.equals(campo.type):
+                if pa.types.is_timestamp(col.type) and pa.types.is_string(campo.type):
+                    # Mismo texto que ``lector.tipar``: sin fracciones de segundo
+                    col = col.cast(pa.timestamp("s", col.type.tz), safe=False)
+                    col = pc.strftime(col, format="%Y-%m-%d %H:%M:%S")
+                col = col.cast(campo.type)
+        else:
+            col = pa.nulls(len(tabla), campo.type)
+        columnas.append(col)
+    return pa.Table.from_arrays(columnas, schema=esquema)
+
+
+def _clave_variante(metadatos: dict) -> tuple:
+    return metadatos.get("sha256"), metadatos.get("version")
+
+
+def agrupar_variantes(bronze_dir: Path = BRONZE_DIR) -> dict[Path, list[Path]]:
+    """Parquet de variantes agrupados por el archivo unido que les corresponde."""
+    grupos = defaultdict(list)
+    for ruta in sorted(Path(bronze_dir).glob("*/*.parquet")):
+        m = PATRON_VARIANTE.match(ruta.stem)
+        if m:
+            grupos[ruta.with_name(f"{m.group(1)}.parquet")].append(ruta)
+    return dict(grupos)
+
+
+def consolidar_variantes(bronze_dir: Path = BRONZE_DIR, verbose: bool = True) -> dict[str, list]:
+    """Unir todas las variantes de la capa bronce en ``<fuente>/<anio>.parquet``.
+
+    Si el archivo unido ya se genero a partir de variantes con los mismos
+    SHA-256 de crudo y la misma ``VERSION_BRONCE`` no se vuelve a calcular:
+    una variante regenerada con otra version invalida la union.
+    """
+    reportes = {}
+    for destino, rutas in agrupar_variantes(bronze_dir).items():
+        etiqueta = f"{destino.parent.name}/{destino.stem}"
+        claves = [_clave_variante(leer_metadatos(r)) for r in rutas]
+        if destino.exists():
+            previos = leer_metadatos(destino)
+            if [_clave_variante(v) for v in previos.get("variantes", [])] == claves:
+                reportes[etiqueta] = previos["solapamiento"]
+                continue
+        reportes[etiqueta] = unir_variantes(rutas, destino)
+        if verbose:
+            detalle = ", ".join(
+                f"{r['variante']}: {r['nuevas']:,} nuevas / {r['solapadas']:,} repetidas"
+                for r in reportes[etiqueta]
+            )
+            print(f"🔀 {etiqueta}: {detalle}")
+    return reportes
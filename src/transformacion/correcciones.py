@@ -0,0 +1,117 @@
+"""
+Correcciones de (departamento, municipio) con una tabla de reglas.
+
+En 2021 el departamento se corregia con ``df.apply(corregir_departamento,
+axis=1)`` (una funcion de Python por fila) y cada par de
+``correcciones_municipios_finales`` construia una mascara booleana sobre
+toda la base. Aqui las reglas viven en ``datos/correcciones.yaml`` (para
+cualquier anio) y se aplican sobre los pares distintos: la base se
+factoriza por (anio, departamento, municipio), cada combinacion se busca
+una vez en un diccionario y el resultado vuelve a las filas indexando con
+los codigos enteros.
+
+Uso:
+    reglas = cargar_reglas()
+    info = {}
+    df = aplicar_correcciones(df, reglas, info=info)   # info["filas_corregidas"]
+    df["DEPARTAMENTO"] = corregir_departamento(df, divipola, info=info)
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.ingesta.normalizacion import normalizar_valor
+
+CORRECCIONES_PATH = Path("datos/correcciones.yaml")
+COMODIN = "*"
+
+
+def cargar_reglas(ruta: Path = CORRECCIONES_PATH) -> dict[tuple, tuple[str, str]]:
+    """Reglas ``(anio | None, departamento, municipio) -> (departamento, municipio)``."""
+    with open(ruta, encoding="utf-8") as f:
+        crudo = yaml.safe_load(f) or {}
+    reglas = {}
+    for regla in crudo.get("reglas") or []:
+        dpto, mpio = (normalizar_valor(v) if v != COMODIN else v for v in regla["de"])
+        nuevo = tuple(normalizar_valor(v) for v in regla["a"])
+        for anio in regla.get("anios") or [None]:
+            reglas[anio, dpto, mpio] = nuevo
+    return reglas
+
+
+def corregir_par(reglas: dict, anio, dpto: str, mpio: str) -> tuple[str, str] | None:
+    """Regla que aplica al par, o None.
+
+    Gana la regla del anio sobre la general y la del departamento sobre ``*``.
+    """
+    for a in ((anio, None) if anio is not None else (None,)):
+        for d in (dpto, COMODIN):
+            if (a, d, mpio) in reglas:
+                return reglas[a, d, mpio]
+    return None
+
+
+def aplicar_correcciones(df: pd.DataFrame, reglas: dict, col_dpto: str = "DEPARTAMENTO",
+                         col_mpio: str = "MUNICIPIO", col_anio: str = "AÑO",
+                         info: dict | None = None) -> pd.DataFrame:
+    """Copia de ``df`` con las reglas aplicadas sobre las combinaciones distintas.
+
+    Sin columna ``col_anio`` solo aplican las reglas generales. Si se pasa
+    ``info`` se completa con ``filas_corregidas`` y ``pares_corregidos``.
+    """
+    anios = (pd.to_numeric(df[col_anio], errors="coerce").astype("Int64")
+             if col_anio in df.columns else pd.Series(pd.NA, index=df.index, dtype="Int64"))
+    claves = pd.MultiIndex.from_arrays([anios.fillna(-1),
+                                        df[col_dpto].astype("string").fillna(""),
+                                        df[col_mpio].astype("string").fillna("")])
+    codigos, unicos = pd.factorize(claves)
+
+    nuevos, cambia = [], []
+    for anio, dpto, mpio in unicos:
+        nuevo = corregir_par(reglas, None if anio == -1 else int(anio), dpto, mpio)
+        cambia.append(nuevo is not None and nuevo != (dpto, mpio))
+        nuevos.append(nuevo or (dpto, mpio))
+
+    df = df.copy()
+    corregidas = np.asarray(cambia, dtype=bool)[codigos]
+    if corregidas.any():
+        nuevos = np.array(nuevos, dtype=object)[codigos[corregidas]]
+        df.loc[corregidas, col_dpto] = nuevos[:, 0]
+        df.loc[corregidas, col_mpio] = nuevos[:, 1]
+    if info is not None:
+        info.update(filas_corregidas=int(corregidas.sum()), pares_corregidos=int(sum(cambia)))
+    return df
+
+
+def departamentos_por_municipio(divipola: pd.DataFrame) -> pd.Series:
+    """Departamento de cada municipio cuyo nombre existe en un solo departamento.
+
+    Los nombres repetidos (``SAN PEDRO``, ``SAN ANDRES``) no se incluyen: con
+    ellos no se puede deducir el departamento.
+    """
+    pares = divipola[["nom_mpio", "dpto"]].drop_duplicates()
+    unicos = pares[~pares["nom_mpio"].duplicated(keep=False)]
+    return unicos.set_index("nom_mpio")["dpto"]
+
+
+def corregir_departamento(df: pd.DataFrame, divipola: pd.DataFrame,
+                          col_dpto: str = "DEPARTAMENTO", col_mpio: str = "MUNICIPIO",
+                          info: dict | None = None) -> pd.Series:
+    """Departamento de DIVIPOLA segun el municipio, o el actual si no se puede deducir.
+
+    Reemplaza ``df.apply(corregir_departamento, axis=1)``: el mapa se aplica
+    solo a los municipios distintos. Si se pasa ``info`` se completa con
+    ``filas_departamento`` (filas cuyo departamento cambia).
+    """
+    codigos, unicos = pd.factorize(df[col_mpio])
+    mapeados = pd.Series(unicos).map(departamentos_por_municipio(divipola)).to_numpy()
+    correcto = np.append(mapeados, None)[codigos]   # codigo -1 (nulo) -> None
+    correcto = pd.Series(correcto, index=df.index, dtype="string")
+    actual = df[col_dpto].astype("string")
+    if info is not None:
+        cambia = correcto.notna() & correcto.ne(actual).fillna(True)
+        info["filas_departamento"] = int(cambia.sum())
+    return correcto.fillna(actual).rename(col_dpto)
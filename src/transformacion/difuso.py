@@ -0,0 +1,149 @@
+"""
+Busqueda difusa de municipios por bloques y trigramas.
+
+En 2021 cada nombre sin cruzar pasaba por ``get_close_matches`` contra los
+~1.100 municipios de DIVIPOLA, es decir, un ``SequenceMatcher`` en Python
+puro por candidato. Aqui los candidatos se restringen primero al bloque
+(el departamento) y, dentro del bloque, un indice invertido de trigramas
+de caracteres elige los ``CANDIDATOS`` nombres con mas trigramas en comun.
+Solo esos se puntuan con la similitud de Levenshtein normalizada
+(``rapidfuzz`` si esta instalado, si no una implementacion en Python).
+
+Los indices se construyen por bloque la primera vez que se usan. Los
+resultados se guardan en un JSON entre corridas; la huella de los bloques,
+el corte y la version de los alias invalida la cache si algo cambia.
+
+Uso:
+    buscador = BuscadorDifuso({"ANTIOQUIA": ["MEDELLIN", "BELLO"]}, cache=CACHE_PATH)
+    buscador.buscar("MEDELIN", "ANTIOQUIA")   # "MEDELLIN"
+    buscador.guardar()
+"""
+
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rapidfuzz
+except ImportError:
+    _rapidfuzz = None
+
+CACHE_PATH = Path("datos/interim/difuso_municipios.json")
+CORTE = 0.8
+CANDIDATOS = 5
+# Bloque con los nombres de todos los departamentos
+TODOS = ""
+
+
+def trigramas(nombre: str) -> set[str]:
+    """Trigramas de caracteres, con relleno para que cuenten los extremos."""
+    texto = f"  {nombre} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Distancia de edicion (inserciones, borrados y sustituciones)."""
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = actual
+    return anterior[-1]
+
+
+def similitud(a: str, b: str) -> float:
+    """Similitud de Levenshtein normalizada entre 0 y 1."""
+    if _rapidfuzz is not None:
+        return _rapidfuzz.normalized_similarity(a, b)
+    largo = max(len(a), len(b))
+    return 1.0 if not largo else 1 - levenshtein(a, b) / largo
+
+
+class BuscadorDifuso:
+    """Nombre mas parecido dentro de un bloque, con indice de trigramas y cache."""
+
+    def __init__(self, bloques: dict[str, list[str]], corte: float = CORTE,
+                 candidatos: int = CANDIDATOS, cache: Path | None = None, version=0):
+        self.bloques = {b: sorted(set(nombres)) for b, nombres in bloques.items()}
+        self.corte = corte
+        self.candidatos = candidatos
+        self.cache = Path(cache) if cache else None
+        self._indices: dict[str, dict[str, list[int]]] = {}
+
+        huella = json.dumps([version, corte, candidatos, sorted(self.bloques.items())],
+                            ensure_ascii=False)
+        self.huella = hashlib.sha1(huella.encode()).hexdigest()
+        # "bloque|nombre" -> nombre elegido o None
+        self.resultados: dict[str, str | None] = self._leer_cache()
+        self.nuevos = 0
+
+    @classmethod
+    def desde_divipola(cls, divipola: pd.DataFrame, **kwargs) -> "BuscadorDifuso":
+        """Bloques ``dpto`` -> ``nom_mpio`` y el bloque ``TODOS`` con todos los nombres."""
+        bloques = divipola.groupby("dpto")["nom_mpio"].agg(list).to_dict()
+        bloques[TODOS] = divipola["nom_mpio"].tolist()
+        return cls(bloques, **kwargs)
+
+    def _leer_cache(self) -> dict:
+        if self.cache is None or not self.cache.exists():
+            return {}
+        try:
+            with open(self.cache, encoding="utf-8") as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return datos.get("resultados", {}) if datos.get("huella") == self.huella else {}
+
+    def guardar(self):
+        """Escribir la cache si hubo busquedas nuevas."""
+        if self.cache is None or not self.nuevos:
+            return
+        self.cache.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.cache.with_name(self.cache.name + ".tmp")
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"huella": self.huella, "resultados": self.resultados}, f,
+                      ensure_ascii=False, indent=0)
+        os.replace(temporal, self.cache)
+        self.nuevos = 0
+
+    def _indice(self, bloque: str) -> dict[str, list[int]]:
+        if bloque not in self._indices:
+            indice: dict[str, list[int]] = {}
+            for i, nombre in enumerate(self.bloques[bloque]):
+                for trigrama in trigramas(nombre):
+                    indice.setdefault(trigrama, []).append(i)
+            self._indices[bloque] = indice
+        return self._indices[bloque]
+
+    def preseleccion(self, nombre: str, bloque: str = TODOS) -> list[str]:
+        """Los ``candidatos`` nombres del bloque con mas trigramas en comun."""
+        indice = self._indice(bloque)
+        comunes = Counter()
+        for trigrama in trigramas(nombre):
+            comunes.update(indice.get(trigrama, ()))
+        nombres = self.bloques[bloque]
+        return [nombres[i] for i, _ in comunes.most_common(self.candidatos)]
+
+    def buscar(self, nombre: str, bloque: str | None = TODOS) -> str | None:
+        """Nombre del bloque mas parecido a ``nombre`` o None si ninguno pasa el corte.
+
+        Un bloque desconocido (o None) se busca en ``TODOS`` si existe.
+        """
+        bloque = bloque if bloque in self.bloques else TODOS
+        if bloque not in self.bloques:
+            return None
+        llave = f"{bloque}|{nombre}"
+        if llave not in self.resultados:
+            puntajes = [(similitud(nombre, c), -orden, c)
+                        for orden, c in enumerate(self.preseleccion(nombre, bloque))]
+            puntaje, _, mejor = max(puntajes, default=(0.0, 0, None))
+            self.resultados[llave] = mejor if puntaje >= self.corte else None
+            self.nuevos += 1
+        return self.resultados[llave]
@@ -0,0 +1,114 @@
+"""
+Interpretacion vectorizada de ``FECHA_HECHO``.
+
+Los cuadernos convertian la fecha con ``.apply(convertir_fecha)``: un
+``pd.to_datetime`` por celda, con ramas para enteros ``YYYYMMDD`` y texto
+libre (y una variante mas larga para 2021). Aqui la columna se clasifica
+primero por representacion con mascaras vectorizadas y cada grupo se
+convierte con una sola llamada:
+
+- ``fecha``: ya es datetime (celdas de fecha de Excel).
+- ``yyyymmdd``: entero de 8 digitos (``20220103``, o ``"20220103"``).
+- ``serial_excel``: numero de dias desde 1899-12-30 (``44564``), solo entre
+  ``SERIAL_MIN`` y ``SERIAL_MAX`` (1954 a 2119): un entero chico como ``3``
+  es un dato corrupto, no una fecha de 1900.
+- ``iso``: texto ``YYYY-MM-DD[ HH:MM:SS]`` (o con ``/``).
+- ``dd/mm/yyyy``: texto con el dia primero.
+- ``otro``: el resto, con ``format="mixed"`` sobre los valores unicos.
+
+Lo que no se puede interpretar queda como ``NaT`` y se cuenta en
+``no_parseables``.
+
+Uso:
+    reporte = {}
+    df["FECHA_HECHO"] = parsear_fechas(df["FECHA_HECHO"], reporte=reporte)
+    reporte  # {"yyyymmdd": 1200, "iso": 30, "no_parseables": 2, ...}
+"""
+
+import pandas as pd
+
+PATRON_ISO = r"^\d{4}[-/]\d{1,2}[-/]\d{1,2}"
+PATRON_DMY = r"^\d{1,2}/\d{1,2}/\d{4}"
+# Rango de enteros YYYYMMDD y de seriales de Excel aceptados
+YYYYMMDD_MIN, YYYYMMDD_MAX = 19000101, 21001231
+SERIAL_MIN, SERIAL_MAX = 20_000, 80_000
+ORIGEN_EXCEL = "1899-12-30"
+
+
+def clasificar(serie: pd.Series) -> pd.Series:
+    """Representacion de cada celda (``None`` para los nulos)."""
+    clase = pd.Series(None, index=serie.index, dtype="object")
+    presentes = serie.notna()
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        clase[presentes] = "fecha"
+        return clase
+
+    numero = pd.to_numeric(serie, errors="coerce")
+    es_fecha = pd.Series(False, index=serie.index)
+    if serie.dtype == object:
+        # En una columna mixta, lo que no es numero ni texto es un datetime/date
+        try:
+            es_texto = serie.str.len().notna()
+        except AttributeError:  # ninguna celda es texto
+            es_texto = es_fecha
+        es_fecha = presentes & numero.isna() & ~es_texto
+        clase[es_fecha] = "fecha"
+
+    entero = numero.notna() & (numero % 1 == 0)
+    clase[entero & numero.between(YYYYMMDD_MIN, YYYYMMDD_MAX)] = "yyyymmdd"
+    clase[numero.notna() & numero.between(SERIAL_MIN, SERIAL_MAX)] = "serial_excel"
+
+    texto = serie.astype("string").str.strip()
+    libre = presentes & ~es_fecha & numero.isna()
+    clase[libre & texto.str.match(PATRON_ISO).fillna(False)] = "iso"
+    clase[libre & texto.str.match(PATRON_DMY).fillna(False)] = "dd/mm/yyyy"
+    clase[presentes & clase.isna()] = "otro"
+    return clase
+
+
+def parsear_fechas(serie: pd.Series, reporte: dict | None = None) -> pd.Series:
+    """Serie ``datetime64[ns]`` con una conversion vectorizada por representacion.
+
+    Si se pasa ``reporte`` se completa con el numero de celdas de cada
+    representacion, ``nulos`` y ``no_parseables``.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        resultado = serie.astype("datetime64[ns]")
+        clase = clasificar(serie)
+    else:
+        clase = clasificar(serie)
+        resultado = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+        texto = serie.astype("string").str.strip()
+
+        m = clase == "fecha"
+        if m.any():
+            resultado[m] = pd.to_datetime(serie[m], errors="coerce")
+        m = clase == "yyyymmdd"
+        if m.any():
+            numero = pd.to_numeric(serie[m], errors="coerce").astype("int64")
+            resultado[m] = pd.to_datetime(numero.astype("string"), format="%Y%m%d",
+                                          errors="coerce")
+        m = clase == "serial_excel"
+        if m.any():
+            resultado[m] = pd.to_datetime(pd.to_numeric(serie[m], errors="coerce"), unit="D",
+                                          origin=ORIGEN_EXCEL, errors="coerce")
+        m = clase == "iso"
+        if m.any():
+            resultado[m] = pd.to_datetime(texto[m].str.replace("/", "-", regex=False),
+                                          format="ISO8601", errors="coerce")
+        m = clase == "dd/mm/yyyy"
+        if m.any():
+            resultado[m] = pd.to_datetime(texto[m], format="%d/%m/%Y", exact=False,
+                                          errors="coerce")
+        m = clase == "otro"
+        if m.any():
+            codigos, unicos = pd.factorize(texto[m])
+            convertidos = pd.to_datetime(pd.Series(unicos), format="mixed", dayfirst=True,
+                                         errors="coerce")
+            resultado[m] = convertidos.to_numpy()[codigos]
+
+    if reporte is not None:
+        reporte.update(clase.value_counts().to_dict())
+        reporte["nulos"] = int(clase.isna().sum())
+        reporte["no_parseables"] = int((clase.notna() & resultado.isna()).sum())
+    return resultado
@@ -2,22 +2,153 @@
 Punto de entrada del pipeline de transformacion.
 
 Uso:
-    poetry run python -m src.transformacion.main
+    poetry run python -m src.transformacion.main [--fuentes F1 F2 ...]
 
-Este script toma los datos crudos de datos/raw/, aplica limpieza,
-normalizacion y joins, y genera los datos procesados en datos/processed/.
+Este script toma la capa bronce generada por la ingesta
+(datos/interim/bronze/, un Parquet por libro crudo), aplica limpieza,
+normalizacion, correccion de departamento/municipio (reglas de
+datos/correcciones.yaml y departamento deducido del municipio con DIVIPOLA),
+resolucion de municipios a codigos DANE (un solo join con DIVIPOLA) y genera
+los datos procesados en datos/processed/.
 """
 
+import argparse
+import time
 from pathlib import Path
 
-RAW_DIR = Path("datos/raw")
+import pandas as pd
+
+from src.ingesta.bronce import BRONZE_DIR, desactualizados, rutas_bronce
+from src.ingesta.divipola import DIVIPOLA_PATH
+from src.ingesta.manifiesto import RAW_DIR, Manifiesto
+from src.ingesta.metricas import ARTIFACTS_DIR, Metricas
+from src.ingesta.normalizacion import limpiar_municipio, normalizar
+from src.transformacion.correcciones import (
+    CORRECCIONES_PATH,
+    aplicar_correcciones,
+    cargar_reglas,
+    corregir_departamento,
+)
+from src.transformacion.difuso import CACHE_PATH
+from src.transformacion.fechas import parsear_fechas
+from src.transformacion.nomenclator import ALIAS_PATH, COLUMNA_CODIGO, cargar_nomenclator
+
 PROCESSED_DIR = Path("datos/processed")
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline de transformacion")
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    parser.add_argument("--bronze-dir", type=Path, default=BRONZE_DIR)
+    parser.add_argument("--processed-dir", type=Path, default=PROCESSED_DIR)
+    parser.add_argument("--artifacts-dir", type=Path, default=ARTIFACTS_DIR)
+    parser.add_argument("--divipola", type=Path, default=DIVIPOLA_PATH,
+                        help="Copia local de DIVIPOLA para resolver codigos de municipio")
+    parser.add_argument("--alias", type=Path, default=ALIAS_PATH,
+                        help="Tabla de alias de departamentos y municipios")
+    parser.add_argument("--correcciones", type=Path, default=CORRECCIONES_PATH,
+                        help="Reglas de correccion de (departamento, municipio)")
+    parser.add_argument("--cache-difuso", type=Path, default=CACHE_PATH,
+                        help="Cache de busquedas difusas de municipios entre corridas")
+    parser.add_argument("--fuentes", nargs="*", default=None,
+                        help="Limitar la transformacion a estas fuentes del catalogo")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Ejecutar pipeline de transformacion completo."""
-    PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
-    # TODO: Implementar transformaciones del proyecto
+    args = parse_args(argv)
+    args.processed_dir.mkdir(parents=True, exist_ok=True)
+
+    metricas = Metricas("transformacion")
+    rutas = [r for r in rutas_bronce(args.bronze_dir)
+             if not args.fuentes or r.parent.name in args.fuentes]
+    viejos = desactualizados(rutas, Manifiesto(args.raw_dir))
+    if viejos:
+        nombres = ", ".join(f"{r.parent.name}/{r.stem}" for r in viejos)
+        print(f"⚠️ {len(viejos)} Parquet bronce no corresponden a los crudos actuales; "
+              f"conviene correr la ingesta: {nombres}")
+
+    frames = []
+    segundos_fechas = 0.0
+    for ruta in rutas:
+        inicio = time.perf_counter()
+        df = pd.read_parquet(ruta)
+        metricas.registrar(ruta.parent.name, ruta.stem, filas_entrada=len(df),
+                           lectura_s=round(time.perf_counter() - inicio, 3))
+        if "FECHA_HECHO" in df.columns:
+            # Por archivo, para saber que libro trae fechas que no se pueden leer
+            inicio = time.perf_counter()
+            reporte = {}
+            df["FECHA_HECHO"] = parsear_fechas(df["FECHA_HECHO"], reporte=reporte)
+            segundos_fechas += time.perf_counter() - inicio
+            formatos = {k: v for k, v in reporte.items() if k not in ("nulos", "no_parseables")}
+            metricas.registrar(ruta.parent.name, ruta.stem,
+                               fechas_no_parseables=reporte["no_parseables"],
+                               fechas_formatos=formatos)
+            if reporte["no_parseables"]:
+                print(f"⚠️ {ruta.parent.name}/{ruta.stem}: {reporte['no_parseables']:,} "
+                      "FECHA_HECHO sin interpretar")
+        frames.append(df)
+    metricas.pasos["fechas"] = round(segundos_fechas, 3)
+    delitos = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    print(f"🔧 {len(delitos):,} filas leidas de {args.bronze_dir}")
+
+    inicio = time.perf_counter()
+    if "DEPARTAMENTO" in delitos.columns:
+        delitos["DEPARTAMENTO"] = normalizar(delitos["DEPARTAMENTO"])
+    if "MUNICIPIO" in delitos.columns:
+        delitos["MUNICIPIO"] = limpiar_municipio(delitos["MUNICIPIO"])
+    metricas.pasos["normalizacion"] = round(time.perf_counter() - inicio, 3)
+
+    if {"DEPARTAMENTO", "MUNICIPIO"} <= set(delitos.columns) and args.correcciones.exists():
+        inicio = time.perf_counter()
+        info = {}
+        delitos = aplicar_correcciones(delitos, cargar_reglas(args.correcciones), info=info)
+        metricas.pasos["correcciones"] = round(time.perf_counter() - inicio, 3)
+        if info["filas_corregidas"]:
+            print(f"🩹 {info['filas_corregidas']:,} filas corregidas "
+                  f"({info['pares_corregidos']} pares departamento/municipio)")
+
+    if {"DEPARTAMENTO", "MUNICIPIO"} <= set(delitos.columns) and args.divipola.exists():
+        inicio = time.perf_counter()
+        nomenclator = cargar_nomenclator(args.divipola, args.alias, args.cache_difuso)
+        # Municipios de nombre unico en DIVIPOLA: su departamento sale de ahi
+        antes = time.perf_counter()
+        info = {}
+        delitos["DEPARTAMENTO"] = corregir_departamento(delitos, nomenclator.divipola, info=info)
+        metricas.pasos["departamentos"] = round(time.perf_counter() - antes, 3)
+        if info["filas_departamento"]:
+            print(f"🩹 {info['filas_departamento']:,} filas con el departamento de DIVIPOLA")
+        delitos = nomenclator.unir(delitos)
+        nomenclator.guardar()
+        metricas.pasos["nomenclator"] = round(time.perf_counter() - inicio, 3)
+        sin_resolver = nomenclator.sin_resolver()
+        print(f"🗺️ Municipios (alias v{nomenclator.version}): "
+              + ", ".join(f"{n} {metodo}" for metodo, n in nomenclator.conteo().items()))
+        if len(sin_resolver):
+            args.artifacts_dir.mkdir(parents=True, exist_ok=True)
+            destino = args.artifacts_dir / "municipios_sin_coincidencia.csv"
+            sin_resolver.to_csv(destino, index=False)
+            print(f"⚠️ {len(sin_resolver)} municipios sin codigo DANE, ver {destino}")
+    elif "MUNICIPIO" in delitos.columns:
+        print(f"⚠️ No hay copia de DIVIPOLA en {args.divipola}; no se resuelven codigos DANE")
+
+    salida = args.processed_dir / "delitos.parquet"
+    delitos.to_parquet(salida, index=False)
+    print(f"✅ {len(delitos):,} filas en {salida}")
+
+    if {"FUENTE", "AÑO"} <= set(delitos.columns):
+        filas = delitos.groupby(["FUENTE", "AÑO"]).size()
+        for (fuente, anio), n in filas.items():
+            metricas.registrar(fuente, str(anio), filas_salida=int(n))
+        if COLUMNA_CODIGO in delitos.columns:
+            sin_codigo = delitos[COLUMNA_CODIGO].isna().groupby([delitos["FUENTE"],
+                                                                  delitos["AÑO"]]).sum()
+            for (fuente, anio), n in sin_codigo.items():
+                metricas.registrar(fuente, str(anio), filas_sin_codigo=int(n))
+    metricas.escribir(args.artifacts_dir)
+    print("\n" + metricas.resumen())
     print("Pipeline de transformacion ejecutado correctamente.")
 
 
@@ -0,0 +1,177 @@
+"""
+Nomenclator de municipios: (departamento, municipio) -> codigo DANE.
+
+Los cuadernos conciliaban los nombres de los libros con DIVIPOLA encadenando
+``.replace`` con diccionarios por anio, casos especiales de Bogota y hasta
+cinco ``merge(..., indicator=True)`` por anio para ver que seguia sin
+cruzar. Aqui el indice de DIVIPOLA y la tabla de alias
+(``datos/alias_municipios.yaml``, versionada) se construyen una vez y cada
+par distinto de la base se resuelve en este orden:
+
+1. ``exacto``: el par esta en DIVIPOLA.
+2. ``alias``: el par, tras aplicar los alias de departamento, de par o de
+   municipio, esta en DIVIPOLA.
+3. ``nombre_unico``: el municipio existe en un solo departamento (Bogota
+   reportada en Cundinamarca, Cartago en Bolivar).
+4. ``difuso``: el nombre mas parecido entre los municipios del departamento
+   (``src.transformacion.difuso``: trigramas + Levenshtein, con cache).
+
+Los nombres se comparan sin tildes ni signos de puntuacion. Cada par se
+resuelve una sola vez por proceso; la tabla completa se une con DIVIPOLA
+una sola vez, por el codigo entero ``cod_mpio``.
+
+Uso:
+    nomenclator = cargar_nomenclator()
+    delitos = nomenclator.unir(delitos)     # agrega COD_MPIO y las columnas de DIVIPOLA
+    nomenclator.sin_resolver()              # pares que no se pudieron resolver
+"""
+
+import re
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+from src.ingesta.divipola import DIVIPOLA_PATH, cargar_divipola
+from src.ingesta.normalizacion import normalizar_valor
+from src.transformacion.difuso import CACHE_PATH, TODOS, BuscadorDifuso
+
+ALIAS_PATH = Path("datos/alias_municipios.yaml")
+COLUMNA_CODIGO = "COD_MPIO"
+COLUMNAS_DIVIPOLA = ["cod_mpio", "cod_dpto", "dpto", "nom_mpio", "tipo_municipio",
+                     "longitud", "latitud"]
+METODOS = ("exacto", "alias", "nombre_unico", "difuso")
+
+PATRON_SIGNOS = re.compile(r"[^A-Z0-9]")
+
+_memo: dict[tuple, "Nomenclator"] = {}
+
+
+def clave(nombre) -> str:
+    """Nombre normalizado para comparar: sin tildes, signos ni espacios dobles."""
+    if pd.isna(nombre):
+        return ""
+    return " ".join(PATRON_SIGNOS.sub(" ", normalizar_valor(nombre)).split())
+
+
+def cargar_alias(ruta: Path = ALIAS_PATH) -> dict:
+    """Tabla de alias con las claves ya normalizadas."""
+    with open(ruta, encoding="utf-8") as f:
+        crudo = yaml.safe_load(f) or {}
+    departamentos = crudo.get("departamentos") or {}
+    municipios = crudo.get("municipios") or {}
+    return {
+        "version": crudo.get("version", 0),
+        "departamentos": {clave(k): clave(v) for k, v in departamentos.items()},
+        "municipios": {clave(k): clave(v) for k, v in municipios.items()},
+        "pares": {tuple(map(clave, p["de"])): tuple(map(clave, p["a"]))
+                  for p in crudo.get("pares") or []},
+    }
+
+
+class Nomenclator:
+    """Indice de DIVIPOLA con alias, busqueda difusa y memoria de resoluciones."""
+
+    def __init__(self, divipola: pd.DataFrame, alias: dict | None = None, difuso: bool = True,
+                 cache: Path | None = None):
+        alias = alias or {}
+        self.version = alias.get("version", 0)
+        self.alias_dpto = alias.get("departamentos", {})
+        self.alias_mpio = alias.get("municipios", {})
+        self.alias_par = alias.get("pares", {})
+        self.divipola = divipola[[c for c in COLUMNAS_DIVIPOLA if c in divipola.columns]]
+
+        self.indice: dict[tuple[str, str], int] = {}
+        self.por_dpto: dict[str, dict[str, int]] = {}
+        por_nombre: dict[str, set[int]] = {}
+        for dpto, mpio, codigo in zip(divipola["dpto"], divipola["nom_mpio"],
+                                      divipola["cod_mpio"]):
+            if pd.isna(codigo):
+                continue
+            d, m = clave(dpto), clave(mpio)
+            self.indice[d, m] = int(codigo)
+            self.por_dpto.setdefault(d, {})[m] = int(codigo)
+            por_nombre.setdefault(m, set()).add(int(codigo))
+        self.por_nombre = {m: next(iter(c)) for m, c in por_nombre.items() if len(c) == 1}
+        # Un bloque por departamento; sin departamento conocido, los nombres unicos
+        bloques = {d: list(mpios) for d, mpios in self.por_dpto.items()}
+        bloques[TODOS] = list(self.por_nombre)
+        self.buscador = (BuscadorDifuso(bloques, cache=cache, version=self.version)
+                         if difuso else None)
+        # (departamento, municipio) original -> (codigo, metodo)
+        self.memo: dict[tuple, tuple[int | None, str | None]] = {}
+
+    def resolver_par(self, dpto, mpio) -> tuple[int | None, str | None]:
+        """``(codigo, metodo)`` de un par; ``(None, None)`` si no se resuelve."""
+        if (dpto, mpio) not in self.memo:
+            self.memo[dpto, mpio] = self._resolver(clave(dpto), clave(mpio))
+        return self.memo[dpto, mpio]
+
+    def _resolver(self, d: str, m: str) -> tuple[int | None, str | None]:
+        if not m:
+            return None, None
+        if (d, m) in self.indice:
+            return self.indice[d, m], "exacto"
+
+        d = self.alias_dpto.get(d, d)
+        d, m = self.alias_par.get((d, m), (d, self.alias_mpio.get(m, m)))
+        if (d, m) in self.indice:
+            return self.indice[d, m], "alias"
+        if m in self.por_nombre:
+            return self.por_nombre[m], "nombre_unico"
+
+        if self.buscador is not None:
+            bloque = d if d in self.por_dpto else TODOS
+            nombre = self.buscador.buscar(m, bloque)
+            if nombre is not None:
+                return self.por_dpto.get(d, self.por_nombre)[nombre], "difuso"
+        return None, None
+
+    def resolver(self, df: pd.DataFrame, col_dpto: str = "DEPARTAMENTO",
+                 col_mpio: str = "MUNICIPIO") -> pd.Series:
+        """Codigo DANE (``Int64``) de cada fila, resolviendo solo los pares distintos."""
+        pares = pd.MultiIndex.from_arrays([df[col_dpto].astype("string").fillna(""),
+                                           df[col_mpio].astype("string").fillna("")])
+        codigos, unicos = pd.factorize(pares)
+        resueltos = pd.array([self.resolver_par(d, m)[0] for d, m in unicos] + [None],
+                             dtype="Int64")
+        return pd.Series(resueltos[codigos], index=df.index, name=COLUMNA_CODIGO)
+
+    def unir(self, df: pd.DataFrame, col_dpto: str = "DEPARTAMENTO",
+             col_mpio: str = "MUNICIPIO") -> pd.DataFrame:
+        """``df`` con ``COD_MPIO`` y las columnas de DIVIPOLA, en un solo join."""
+        df = df.assign(**{COLUMNA_CODIGO: self.resolver(df, col_dpto, col_mpio)})
+        return df.merge(self.divipola, left_on=COLUMNA_CODIGO, right_on="cod_mpio",
+                        how="left").drop(columns="cod_mpio")
+
+    def conteo(self) -> dict[str, int]:
+        """Pares distintos resueltos por cada metodo (``sin_resolver`` los demas)."""
+        metodos = Counter(metodo or "sin_resolver" for _, metodo in self.memo.values())
+        return {m: metodos[m] for m in METODOS + ("sin_resolver",) if metodos[m]}
+
+    def guardar(self):
+        """Guardar la cache de busquedas difusas para la proxima corrida."""
+        if self.buscador is not None:
+            self.buscador.guardar()
+
+    def sin_resolver(self) -> pd.DataFrame:
+        """Pares que no se pudieron resolver, para revisar o agregar a los alias."""
+        filas = [par for par, (codigo, _) in self.memo.items() if codigo is None]
+        return (pd.DataFrame(filas, columns=["DEPARTAMENTO", "MUNICIPIO"])
+                .sort_values(["DEPARTAMENTO", "MUNICIPIO"], ignore_index=True))
+
+
+def cargar_nomenclator(ruta_divipola: Path = DIVIPOLA_PATH, ruta_alias: Path = ALIAS_PATH,
+                       cache: Path | None = CACHE_PATH) -> Nomenclator:
+    """Nomenclator de la copia local de DIVIPOLA y la tabla de alias.
+
+    Se construye una vez por proceso (por rutas y version de los alias), asi
+    que las resoluciones se comparten entre anios y fuentes.
+    """
+    alias = cargar_alias(ruta_alias)
+    llave = (Path(ruta_divipola).resolve(), Path(ruta_alias).resolve(), alias["version"], cache)
+    if llave not in _memo:
+        divipola = cargar_divipola(ruta_divipola, ttl_dias=float("inf"))
+        _memo[llave] = Nomenclator(divipola, alias, cache=cache)
+    return _memo[llave]
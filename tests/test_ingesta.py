@@ -1,8 +1,903 @@
 """Tests para el modulo de ingesta."""
 
+import json
+import os
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
+import pytest
+
+from src.ingesta.bronce import (
+    convertir_todo,
+    desactualizados,
+    escribir_parquet,
+    leer_bronce,
+    leer_metadatos,
+)
+from src.ingesta.cache import CacheRaw, sha256_archivo
+from src.ingesta.catalogo import ConsultaSocrata, Recurso, listar_consultas, listar_recursos
+from src.ingesta.descarga import descargar_todo
+from src.ingesta.divipola import cargar_divipola
+from src.ingesta.dominios import detectar_intercambios
+from src.ingesta.encabezado import COLUMNAS_OBJETIVO, detectar_encabezado, leer_con_encabezado
+from src.ingesta.esquema import canonico, renombrar, resolver
+from src.ingesta.lector import (
+    escribir_por_lotes,
+    inicio_pie,
+    leer_libro,
+    leer_por_lotes,
+    limpiar_lote,
+    tipar,
+)
+from src.ingesta.main import main as main_ingesta
+from src.ingesta.manifiesto import Manifiesto
+from src.ingesta.motores import motores_para
+from src.ingesta.normalizacion import (
+    limpiar_municipio,
+    normalizar,
+    normalizar_celdas,
+    por_valores_unicos,
+)
+from src.ingesta.plan import makespan, ordenar, resumen_plan, sondear_todo
+from src.ingesta.poblacion import buscar_poblacion, cargar_poblacion
+from src.ingesta.servidor_prueba import Grabacion, ServidorPrueba, reescribir_catalogo
+from src.ingesta.socrata import (
+    descargar_consulta,
+    esquema_respuesta,
+    leer_marca,
+    sincronizar,
+    tabla_pagina,
+)
+from src.ingesta.transporte import Transporte
+from src.ingesta.variantes import consolidar_variantes
+
 
 def test_catalogo_exists():
     """Verificar que el catalogo de datos existe."""
     assert Path("datos/catalogo.yaml").exists()
+
+
+def test_listar_recursos_incluye_variantes():
+    """Las claves _v1/_v2 del catalogo generan recursos independientes."""
+    recursos = listar_recursos()
+    claves = {(r.fuente, r.clave) for r in recursos}
+    assert ("hurto_automotores", "2018_v1") in claves
+    assert ("hurto_automotores", "2018_v2") in claves
+    assert len(recursos) > 100
+
+
+def test_destino_recurso():
+    r = Recurso("abigeato", "2018_v2", "https://x.org/a/abigeato%202018.XLSX?x=1")
+    assert r.anio == 2018
+    assert r.variante == "v2"
+    assert r.destino(Path("raw")) == Path("raw/abigeato/2018_v2.xlsx")
+
+
+@pytest.fixture
+def servidor_local(tmp_path):
+    """Servidor HTTP local que sirve los archivos de ``tmp_path/www``."""
+    www = tmp_path / "www"
+    www.mkdir()
+    peticiones = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def send_response(self, code, message=None):
+            peticiones.append((self.path, code))
+            super().send_response(code, message)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=str(www)))
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    yield www, f"http://127.0.0.1:{server.server_address[1]}", peticiones
+    server.shutdown()
+
+
+def test_descargar_todo(servidor_local, tmp_path):
+    www, base, _ = servidor_local
+    (www / "a.xlsx").write_bytes(b"uno")
+    (www / "b.xls").write_bytes(b"dos" * 1000)
+    recursos = [
+        Recurso("f1", "2020", f"{base}/a.xlsx"),
+        Recurso("f2", "2021_v1", f"{base}/b.xls"),
+        Recurso("f2", "2021_v2", f"{base}/no_existe.xls"),
+    ]
+    raiz = tmp_path / "raw"
+    res = descargar_todo(recursos, raiz=raiz, max_workers=3, verbose=False)
+
+    assert [r.ok for r in res] == [True, True, False]
+    assert (raiz / "f1" / "2020.xlsx").read_bytes() == b"uno"
+    assert (raiz / "f2" / "2021_v1.xls").stat().st_size == 3000
+    assert not list(raiz.rglob("*.part"))
+    assert [r.cache for r in res[:2]] == ["miss", "miss"]
+
+    res = descargar_todo(recursos[:2], raiz=raiz, max_workers=2, verbose=False)
+    assert [r.cache for r in res] == ["hit", "hit"]
+
+
+def test_cache_revalidacion_condicional(servidor_local, tmp_path):
+    www, base, peticiones = servidor_local
+    (www / "a.xlsx").write_bytes(b"contenido")
+    os.utime(www / "a.xlsx", (1_600_000_000, 1_600_000_000))
+    url = f"{base}/a.xlsx"
+
+    cache = CacheRaw(tmp_path / "cache")
+    primero = cache.obtener(url)
+    assert primero.estado == "miss"
+    assert primero.ruta.read_bytes() == b"contenido"
+    assert primero.ruta.name == f"{primero.sha256}.xlsx"
+
+    # Dentro del mismo proceso no se vuelve a consultar el servidor
+    assert cache.obtener(url).hit
+    assert len(peticiones) == 1
+
+    # Un proceso nuevo revalida con If-Modified-Since y recibe 304
+    segundo = CacheRaw(tmp_path / "cache").obtener(url)
+    assert segundo.hit and segundo.sha256 == primero.sha256
+    assert peticiones[-1] == ("/a.xlsx", 304)
+
+    # Sin 304 pero con el mismo contenido: se pago la transferencia, no es un hit
+    os.utime(www / "a.xlsx", (1_700_000_000, 1_700_000_000))
+    igual = CacheRaw(tmp_path / "cache").obtener(url)
+    assert igual.estado == "igual" and not igual.hit
+    assert peticiones[-1] == ("/a.xlsx", 200)
+
+    # Si el archivo cambia se descarga de nuevo
+    (www / "a.xlsx").write_bytes(b"otro contenido")
+    tercero = CacheRaw(tmp_path / "cache").obtener(url)
+    assert tercero.estado == "miss" and tercero.sha256 != primero.sha256
+
+
+def _libro_policia(ruta, fila_encabezado=9, filas=None):
+    """Crear un libro con titulos, tabla y pie como los de la Policia."""
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.cell(row=2, column=1, value="POLICÍA NACIONAL - DIJIN")
+    ws.cell(row=4, column=1, value="HURTO A PERSONAS 2022")
+    encabezado = ["DEPARTAMENTO", "MUNICIPIO", "CODIGO DANE", "ARMAS MEDIOS",
+                  "FECHA HECHO", "GENERO", "*AGRUPA EDAD PERSONA", "CANTIDAD"]
+    filas = filas or [
+        ["ANTIOQUIA", "MEDELLÍN (CT)", 5001000, "ARMA BLANCA", "2022-01-03", "MASCULINO",
+         "ADULTOS", 1],
+        ["CUNDINAMARCA", "BOGOTÁ D.C. (CT)", 11001000, "SIN EMPLEO DE ARMAS", "2022-01-04",
+         "FEMENINO", "ADULTOS", 2],
+    ]
+    pie = [[None] * 8, ["TOTAL"] + [None] * 6 + [3],
+           ["FUENTE: DIJIN - POLICÍA NACIONAL"], ["ELABORADO: SI. PEREZ"]]
+    for i, fila in enumerate([encabezado] + filas + pie):
+        for j, valor in enumerate(fila):
+            ws.cell(row=fila_encabezado + 1 + i, column=1 + j, value=valor)
+    wb.save(ruta)
+    return ruta
+
+
+@pytest.mark.parametrize("fila", [6, 9, 14])
+def test_leer_con_encabezado(tmp_path, fila):
+    ruta = _libro_policia(tmp_path / "libro.xlsx", fila_encabezado=fila)
+    df, encabezado = leer_con_encabezado(ruta)
+    assert encabezado == fila
+    assert df.columns[0] == "DEPARTAMENTO"
+    assert df.iloc[0]["MUNICIPIO"] == "MEDELLÍN (CT)"
+
+
+def test_detectar_encabezado_sin_tabla():
+    import pandas as pd
+
+    preview = pd.DataFrame([["titulo", None], [None, "DEPARTAMENTO"]])
+    assert detectar_encabezado(preview) is None
+
+
+def test_leer_por_lotes(tmp_path):
+    filas = [
+        ["ANTIOQUIA", f"MUNICIPIO {i}", 5001000 + i, "ARMA BLANCA", "2022-01-03",
+         "MASCULINO", "ADULTOS", 1]
+        for i in range(25)
+    ]
+    ruta = _libro_policia(tmp_path / "libro.xlsx", fila_encabezado=9, filas=filas)
+    info = {}
+    lotes = list(leer_por_lotes(ruta, tam_lote=10, info=info))
+
+    assert [len(lote) for lote in lotes] == [10, 10, 5]
+    assert list(lotes[0].columns) == COLUMNAS_OBJETIVO
+    assert info["fila_encabezado"] == 9
+    assert info["filas_validas"] == 25
+    assert info["filas_leidas"] == 29  # incluye fila vacia, TOTAL, FUENTE y ELABORADO
+
+    df = leer_libro(ruta)
+    assert len(df) == 25
+    assert not df["DEPARTAMENTO"].str.contains("TOTAL|FUENTE|ELABORADO").any()
+
+
+def test_escribir_por_lotes_con_esquema_estable(tmp_path):
+    import datetime as dt
+
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    # El primer lote trae celdas fecha de Excel y el segundo texto
+    filas = [
+        ["ANTIOQUIA", f"MUNICIPIO {i}", 5001000 + i, "ARMA BLANCA",
+         dt.datetime(2022, 1, 3) if i < 10 else "20220104", "MASCULINO", "ADULTOS", 1]
+        for i in range(25)
+    ]
+    ruta = _libro_policia(tmp_path / "libro.xlsx", filas=filas)
+    assert motores_para(ruta)[0] == "openpyxl"   # streaming por defecto en .xlsx
+    destino = tmp_path / "libro.parquet"
+    info = {}
+
+    filas_escritas = escribir_por_lotes(
+        ruta, destino, metadatos=lambda i: {b"fila": str(i["fila_encabezado"]).encode()},
+        constantes={"FUENTE": "abigeato"}, tam_lote=10, info=info)
+
+    assert filas_escritas == 25 and pq.ParquetFile(destino).metadata.num_row_groups == 3
+    assert pq.read_schema(destino).metadata[b"fila"] == b"9"
+    df = pd.read_parquet(destino)
+    assert df["FECHA_HECHO"].tolist()[9:11] == ["2022-01-03 00:00:00", "20220104"]
+    assert df["CODIGO_DANE"].dtype == "Int64" and (df["FUENTE"] == "abigeato").all()
+    assert not destino.with_name("libro.parquet.tmp").exists()
+
+
+def test_limpiar_lote_corta_pie_desde_el_final():
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "DEPARTAMENTO": ["ANTIOQUIA", "   ", "Total Antioquia", "META", None, "TOTAL",
+                         "FUENTE: SIEDCO", "Elaborado por"],
+        "MUNICIPIO": ["MEDELLÍN", None, None, "VILLAVICENCIO", None, None, None, None],
+        "ARMAS_MEDIOS": ["ARMA BLANCA", None, None, "CONTUNDENTES", None, None, None, None],
+        "CODIGO_DANE": ["5001000", None, None, "50001000", None, None, None, None],
+    })
+    assert inicio_pie(df) == 4
+    limpio = limpiar_lote(df, ultimo=True)
+    assert list(limpio["DEPARTAMENTO"]) == ["ANTIOQUIA", "META"]
+    assert limpio["CODIGO_DANE"].tolist() == [5001000, 50001000]
+
+    # Los titulos de delito repetidos dentro de la hoja tambien son basura
+    titulo = pd.DataFrame({"DEPARTAMENTO": ["LESIONES PERSONALES 2022", "META"],
+                           "MUNICIPIO": [None, "VILLAVICENCIO"]})
+    assert list(limpiar_lote(titulo)["DEPARTAMENTO"]) == ["META"]
+
+
+@pytest.mark.parametrize("nombre, esperado", [
+    ("ARMAS/MEDIOS", "ARMAS_MEDIOS"),
+    ("Arma Medio", "ARMAS_MEDIOS"),
+    ("ARMAS Y MEDIOS", "ARMAS_MEDIOS"),
+    ("*AGRUPA EDAD PERSONA*", "AGRUPA_EDAD_PERSONA"),
+    ("AGRUPA_EDAD_PER SONA", "AGRUPA_EDAD_PERSONA"),
+    ("MUNICICPIO", "MUNICIPIO"),
+    ("DEPARTAMENTO ", "DEPARTAMENTO"),
+    ("Código DANE", "CODIGO_DANE"),
+    ("FECHA", "FECHA_HECHO"),
+    ("sexo", "GENERO"),
+    ("OBSERVACIONES", None),
+    ("DEP", "DEPARTAMENTO"),
+    ("Ciudad", "MUNICIPIO"),
+    ("MEDIO", "ARMAS_MEDIOS"),
+    ("MEDIO DE TRANSPORTE", None),
+    ("DEPENDENCIA", None),
+    ("TOTAL", None),
+    (None, None),
+])
+def test_esquema_canonico(nombre, esperado):
+    assert canonico(nombre) == esperado
+
+
+def test_esquema_resolver_memoiza_y_prioriza_exactas():
+    encabezado = ("DEPTO", "MUNICIPIO", "TOTAL", "CANTIDAD", "Unnamed: 4")
+    mapa = resolver(encabezado)
+    assert mapa == {0: "DEPARTAMENTO", 1: "MUNICIPIO", 3: "CANTIDAD"}
+    assert resolver(list(encabezado)) is mapa
+
+    import pandas as pd
+
+    df = renombrar(pd.DataFrame([["A", "B", 1, 2, None]], columns=list(encabezado)))
+    assert list(df.columns) == ["DEPARTAMENTO", "MUNICIPIO", "TOTAL", "CANTIDAD", "UNNAMED_4"]
+
+
+def test_esquema_total_no_es_cantidad():
+    import pandas as pd
+
+    # Un libro sin CANTIDAD pero con columna de totales: TOTAL no se renombra
+    encabezado = ("DEPARTAMENTO", "CIUDAD", "MEDIO", "ARMA EMPLEADA", "TOTAL")
+    assert resolver(encabezado) == {0: "DEPARTAMENTO", 1: "MUNICIPIO", 3: "ARMAS_MEDIOS"}
+    df = renombrar(pd.DataFrame([["A", "B", "C", "D", 1]], columns=list(encabezado)))
+    assert list(df.columns) == ["DEPARTAMENTO", "MUNICIPIO", "MEDIO", "ARMAS_MEDIOS", "TOTAL"]
+    assert "CANTIDAD" not in df.columns
+
+
+def test_intercambio_de_columnas_por_dominio(tmp_path):
+    import pandas as pd
+
+    filas = [
+        ["ARMA BLANCA", "MEDELLÍN (CT)", 5001000, "ANTIOQUIA", "2021-01-03", "MASCULINO",
+         "ADULTOS", 1],
+        ["CONTUNDENTES", "CALI (CT)", 76001000, "VALLE", "2021-01-04", "FEMENINO", "MENORES", 1],
+        ["SIN EMPLEO DE ARMAS", "BOGOTÁ D.C. (CT)", 11001000, "CUNDINAMARCA", "2021-02-01",
+         "NO REPORTADO", "NO REPORTADO", 2],
+    ]
+    info = {}
+    df = leer_libro(_libro_policia(tmp_path / "libro.xlsx", filas=filas), info=info)
+    assert info["intercambios"] == {"DEPARTAMENTO": "ARMAS_MEDIOS",
+                                    "ARMAS_MEDIOS": "DEPARTAMENTO"}
+    assert list(df.columns) == info["columnas"]
+    assert df["DEPARTAMENTO"].tolist() == ["ANTIOQUIA", "VALLE", "CUNDINAMARCA"]
+
+    info = {}
+    leer_libro(_libro_policia(tmp_path / "bien.xlsx"), info=info)
+    assert info["intercambios"] == {}
+    # Una columna con valores ajenos que no forma permutacion no se toca
+    raro = pd.DataFrame({"DEPARTAMENTO": ["ANTIOQUIA"], "GENERO": ["ARMA DE FUEGO"]})
+    assert detectar_intercambios(raro) == {}
+
+
+def test_normalizacion_por_valores_unicos():
+    import pandas as pd
+
+    serie = pd.Series(["Medellín (CT)", None, "medellín  (ct)", "Bogotá, D.C."] * 1000)
+    assert limpiar_municipio(serie)[:4].tolist() == ["MEDELLIN", pd.NA, "MEDELLIN", "BOGOTA, D.C."]
+    assert normalizar(serie, nulo="")[1] == ""
+
+    vistos = []
+
+    def contar(valor):
+        vistos.append(valor)
+        return valor.lower()
+
+    resultado = por_valores_unicos(serie, contar)
+    assert len(vistos) == 3 and resultado.index.equals(serie.index)
+    por_valores_unicos(serie.iloc[::-1], contar)
+    por_valores_unicos(pd.Series(["Cali", "Medellín (CT)"]), contar)
+    assert vistos[3:] == ["Cali"]
+
+    # Como normalizar_texto de los cuadernos: numeros y nulos no se tocan
+    mezcla = pd.Series(["bogotá ", 11001, None, 2.5], dtype=object)
+    celdas = normalizar_celdas(mezcla)
+    assert celdas.dtype == object and celdas[0] == "BOGOTA"
+    assert celdas[1] == 11001 and celdas[2] is None and celdas[3] == 2.5
+
+
+def test_motores_leen_lo_mismo(tmp_path):
+    import pandas as pd
+
+    from src.ingesta.benchmark_motores import main as benchmark
+
+    ruta = _libro_policia(tmp_path / "libro.xlsx", fila_encabezado=7)
+    motores = motores_para(ruta)
+    assert "openpyxl" in motores
+    leidos = {}
+    for motor in motores:
+        info = {}
+        leidos[motor] = tipar(leer_libro(ruta, info=info, motor=motor))
+        assert info["fila_encabezado"] == 7 and info["motor"] == motor
+    for df in leidos.values():
+        pd.testing.assert_frame_equal(df, leidos["openpyxl"])
+
+    assert benchmark([str(ruta), "--artifacts-dir", str(tmp_path / "artifacts")]) == 0
+    reporte = json.loads((tmp_path / "artifacts" / "benchmark_motores.json").read_text())
+    assert set(reporte["resumen"]) == set(motores)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convertir_todo_bronce(tmp_path, jobs):
+    raw = tmp_path / "raw"
+    bronze = tmp_path / "bronze"
+    recursos = [
+        Recurso("abigeato", "2019", "http://x/abigeato.xlsx", nombre="Abigeato"),
+        Recurso("secuestro", "2018_v1", "http://x/secuestro.xlsx", nombre="Secuestro"),
+        Recurso("secuestro", "2020", "http://x/no_descargado.xlsx"),
+    ]
+    for r, fila in zip(recursos[:2], (9, 11)):
+        r.destino(raw).parent.mkdir(parents=True, exist_ok=True)
+        _libro_policia(r.destino(raw), fila_encabezado=fila)
+
+    res = convertir_todo(recursos, raw_dir=raw, bronze_dir=bronze, jobs=jobs, verbose=False)
+
+    assert [r.ok for r in res] == [True, True, False]
+    assert res[1].ruta == bronze / "secuestro" / "2018_v1.parquet"
+    meta = leer_metadatos(res[1].ruta)
+    assert meta["fila_encabezado"] == 11
+    assert meta["url"] == "http://x/secuestro.xlsx"
+    assert meta["sha256"] == sha256_archivo(recursos[1].destino(raw))
+
+    # Sin cambios en el crudo no se vuelve a leer el Excel
+    filas = [r.filas for r in res[:2]]
+    res = convertir_todo(recursos[:2], raw_dir=raw, bronze_dir=bronze, jobs=jobs, verbose=False)
+    assert all(r.reutilizado and r.rss_pico_mb is None for r in res)
+    assert [r.filas for r in res] == filas == [2, 2]
+
+    df = leer_bronce(bronze)
+    assert len(df) == 4
+    assert set(df["TIPO_DELITO"]) == {"ABIGEATO", "SECUESTRO"}
+    assert df.loc[df["FUENTE"] == "secuestro", "AÑO"].eq(2018).all()
+    assert df["CODIGO_DANE"].dtype == "Int64"
+
+
+@pytest.fixture
+def espejo(tmp_path):
+    """Espejo local con un libro y un recurso Socrata grabados."""
+    grabacion = Grabacion(tmp_path / "fixtures")
+    grabacion.agregar("https://www.policia.gov.co/files/a.xlsx", b"x" * 100_000)
+    filas = [{"cod_mpio": str(i)} for i in range(25)]
+    grabacion.agregar("https://www.datos.gov.co/resource/gdxc-w37w.json",
+                      json.dumps(filas).encode(), "application/json", socrata=True)
+    return grabacion
+
+
+def test_servidor_prueba(espejo, tmp_path):
+    import requests
+
+    with ServidorPrueba(espejo) as srv:
+        url = srv.url("https://www.policia.gov.co/files/a.xlsx")
+        resp = requests.get(url)
+        assert resp.content == b"x" * 100_000
+        assert requests.get(url, headers={"If-None-Match": resp.headers["ETag"]}).status_code == 304
+        parcial = requests.get(url, headers={"Range": "bytes=99990-"})
+        assert parcial.status_code == 206 and len(parcial.content) == 10
+        parcial = requests.get(url, headers={"Range": "bytes=99990-",
+                                             "If-Range": resp.headers["ETag"]})
+        assert parcial.status_code == 206 and len(parcial.content) == 10
+        # Validador viejo en If-Range: se ignora el rango y va el archivo completo
+        completo = requests.get(url, headers={"Range": "bytes=99990-", "If-Range": '"viejo"'})
+        assert completo.status_code == 200 and len(completo.content) == 100_000
+        assert requests.get(srv.url("https://otro.org/x.xlsx")).status_code == 404
+
+        pagina = requests.get(srv.url(
+            "https://www.datos.gov.co/resource/gdxc-w37w.json?$limit=10&$offset=20")).json()
+        assert [f["cod_mpio"] for f in pagina] == ["20", "21", "22", "23", "24"]
+
+        # El catalogo reescrito descarga desde el espejo
+        catalogo = {"fuentes": {"abigeato": {"urls": {
+            "2018": "https://www.policia.gov.co/files/a.xlsx"}}}}
+        recursos = listar_recursos(reescribir_catalogo(catalogo, srv.base_url))
+        res = descargar_todo(recursos, raiz=tmp_path / "raw", verbose=False)
+        assert res[0].ok and res[0].bytes == 100_000
+
+
+def test_servidor_prueba_inyecta_errores_y_latencia(espejo):
+    import requests
+
+    with ServidorPrueba(espejo, latencia=0.05, tasa_error=0.5, semilla=1) as srv:
+        url = srv.url("https://www.policia.gov.co/files/a.xlsx")
+        inicio = time.perf_counter()
+        codigos = [requests.get(url).status_code for _ in range(20)]
+        assert time.perf_counter() - inicio >= 20 * 0.05
+    assert set(codigos) == {200, 503}
+
+    # Mismas decisiones con la misma semilla, aunque las peticiones sean concurrentes
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ServidorPrueba(espejo, tasa_error=0.5, semilla=1) as srv, \
+            ThreadPoolExecutor(8) as pool:
+        url = srv.url("https://www.policia.gov.co/files/a.xlsx")
+        list(pool.map(lambda _: requests.get(url), range(20)))
+        errores = sum(codigo == 503 for _, codigo in srv.peticiones)
+    assert errores == codigos.count(503)
+
+
+def test_transporte_reintenta_y_reanuda(espejo, tmp_path):
+    url = "https://www.policia.gov.co/files/a.xlsx"
+    with ServidorPrueba(espejo, tasa_error=0.3, tasa_corte=0.5, semilla=3) as srv, \
+            Transporte(espera_base=0.01, reintentos=20) as transporte:
+        res = CacheRaw(tmp_path / "cache").obtener(srv.url(url), transporte=transporte)
+        codigos = [codigo for _, codigo in srv.peticiones]
+
+    assert res.ruta.read_bytes() == b"x" * 100_000
+    assert 206 in codigos  # al menos una descarga cortada se reanudo con Range
+    assert not list((tmp_path / "cache" / "parciales").iterdir())
+
+
+def test_transporte_tope_por_host(espejo):
+    from concurrent.futures import ThreadPoolExecutor
+
+    url = "https://www.policia.gov.co/files/a.xlsx"
+    with ServidorPrueba(espejo, latencia=0.05) as srv, \
+            Transporte(max_por_host=1, tasa_max=100) as transporte:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda _: transporte.get(srv.url(url)), range(4)))
+        assert time.perf_counter() - inicio >= 4 * 0.05
+
+
+def test_cargar_divipola_pagina_y_memoiza(tmp_path):
+    grabacion = Grabacion(tmp_path / "fixtures")
+    filas = [
+        {"cod_dpto": f"{i // 100:02d}", "dpto": "Bogotá,  D.C." if i == 0 else "ANTIOQUIA",
+         "cod_mpio": f"{i:05d}", "nom_mpio": f" Municipio {i} ", "latitud": "6,25"}
+        for i in range(2500)
+    ]
+    url = "https://www.datos.gov.co/resource/gdxc-w37w.json"
+    grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+    ruta = tmp_path / "raw" / "divipola.parquet"
+
+    with ServidorPrueba(grabacion) as srv:
+        df = cargar_divipola(ruta, url=srv.url(url), transporte=Transporte())
+        assert len(srv.peticiones) == 3  # 1000 + 1000 + 500
+        assert cargar_divipola(ruta) is df
+
+    assert len(df) == 2500
+    assert df.loc[0, "dpto"] == "BOGOTA, D.C."
+    assert df.loc[7, "nom_mpio"] == "MUNICIPIO 7"
+    assert df["cod_mpio"].dtype == "Int64" and df.loc[2499, "cod_mpio"] == 2499
+    assert df.loc[0, "latitud"] == 6.25
+
+
+def test_socrata_resuelve_consulta_en_servidor(tmp_path):
+    import pandas as pd
+
+    url = "https://www.datos.gov.co/resource/abcd-1234.json"
+    filas = [
+        {"cod_muni": str(5001 + i % 3), "cantidad": str(1 + i % 5),
+         "fecha_hecho": f"{2018 + i % 4}-0{1 + i % 9}-01T00:00:00.000"}
+        for i in range(60)
+    ]
+    grabacion = Grabacion(tmp_path / "fixtures")
+    grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+    esperado = (
+        pd.DataFrame(filas).astype({"cantidad": float})
+        .assign(anio=lambda d: d["fecha_hecho"].str[:4])
+        .query("fecha_hecho >= '2019-01-01'")
+        .groupby(["cod_muni", "anio"], as_index=False)["cantidad"].sum()
+    )
+
+    with ServidorPrueba(grabacion) as srv:
+        consulta = ConsultaSocrata(
+            "delitos_municipio", srv.url(url),
+            select="cod_muni, date_extract_y(fecha_hecho) AS anio, sum(cantidad) AS cantidad",
+            where="fecha_hecho >= '2019-01-01'", group="cod_muni, date_extract_y(fecha_hecho)",
+            tam_pagina=4)
+        res = descargar_consulta(consulta, tmp_path / "raw", transporte=Transporte(), paralelo=3)
+        crudo = descargar_consulta(ConsultaSocrata("crudo", srv.url(url), tam_pagina=7),
+                                   tmp_path / "raw", transporte=Transporte())
+        peticiones = [p for p, _ in srv.peticiones]
+
+    assert res.ok and res.filas == len(esperado) == 9 and res.paginas == 3
+    df = pd.read_parquet(res.ruta).sort_values(["cod_muni", "anio"], ignore_index=True)
+    assert df["cantidad"].dtype == "float64"
+    pd.testing.assert_frame_equal(df, esperado)
+    assert all("%24group=" in p for p in peticiones[:res.paginas])
+    assert leer_metadatos(res.ruta)["parametros"]["$group"] == consulta.group
+
+    assert crudo.filas == 60 and crudo.paginas == 9
+    assert pd.read_parquet(crudo.ruta).to_dict("records") == filas
+
+
+def test_socrata_campos_checkbox_y_geo(tmp_path):
+    import pandas as pd
+
+    url = "https://www.datos.gov.co/resource/ijkl-9012.json"
+    filas = [
+        {"codigo_dane": "05001000", "flagrancia": i % 2 == 0,
+         "ubicacion": {"type": "Point", "coordinates": [-75.56, 6.25]}}
+        for i in range(5)
+    ]
+    grabacion = Grabacion(tmp_path / "fixtures")
+    grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+    with ServidorPrueba(grabacion) as srv:
+        res = descargar_consulta(ConsultaSocrata("geo", srv.url(url), tam_pagina=2),
+                                 tmp_path / "raw", transporte=Transporte())
+    assert res.ok and res.filas == 5
+    df = pd.read_parquet(res.ruta)
+    assert df["flagrancia"].tolist() == ["true", "false", "true", "false", "true"]
+    assert json.loads(df.loc[0, "ubicacion"]) == filas[0]["ubicacion"]
+
+    # Con X-SODA2-Types el checkbox queda booleano y el punto como texto JSON
+    esquema = esquema_respuesta({"X-SODA2-Fields": '["flagrancia", "ubicacion"]',
+                                 "X-SODA2-Types": '["checkbox", "point"]'}, [])
+    tabla = tabla_pagina(filas[:2], esquema)
+    assert tabla.column("flagrancia").to_pylist() == [True, False]
+    assert tabla.schema.field("ubicacion").type == "string"
+
+
+def test_socrata_sincroniza_solo_cambios(tmp_path):
+    import pandas as pd
+
+    url = "https://www.datos.gov.co/resource/efgh-5678.json"
+    filas = [
+        {":id": f"row-{i:04d}", ":updated_at": f"2024-01-{1 + i % 5:02d}T00:00:00.000Z",
+         "cod_muni": str(5001 + i % 4), "anio": str(2018 + i % 3), "cantidad": "1"}
+        for i in range(40)
+    ]
+    grabacion = Grabacion(tmp_path / "fixtures")
+    grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+    bronze = tmp_path / "bronze"
+
+    with ServidorPrueba(grabacion) as srv:
+        consulta = ConsultaSocrata("delitos", srv.url(url), select="cod_muni, anio, cantidad",
+                                   incremental=True, particion="anio", tam_pagina=8)
+        primera = sincronizar(consulta, bronze, transporte=Transporte())
+        assert primera.ok and primera.filas == 40 and primera.particiones == 3
+        # Los 8 :id con la marca de tiempo mas alta desempatan la siguiente corrida
+        assert leer_marca(primera.ruta) == {"updated_at": "2024-01-05T00:00:00.000Z",
+                                           "ids": [f"row-{i:04d}" for i in range(4, 40, 5)]}
+        intacta = (primera.ruta / "2019.parquet").stat().st_mtime_ns
+
+        # Dos filas cambian y llega una nueva, todas de 2018: solo se reescribe
+        # esa particion
+        filas[0].update({":updated_at": "2024-02-01T00:00:00.000Z", "cantidad": "7"})
+        filas[3].update({":updated_at": "2024-02-01T00:00:00.000Z", "cantidad": "2"})
+        filas.append({":id": "row-0040", ":updated_at": "2024-02-02T00:00:00.000Z",
+                      "cod_muni": "5001", "anio": "2018", "cantidad": "1"})
+        grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+        srv.peticiones.clear()
+        segunda = sincronizar(consulta, bronze, transporte=Transporte())
+        peticiones = [p for p, _ in srv.peticiones]
+        reescrita = (primera.ruta / "2019.parquet").stat().st_mtime_ns
+
+        # row-0001 pasa de 2019 a 2020: la version vieja sale de 2019.parquet
+        filas[1].update({":updated_at": "2024-03-01T00:00:00.000Z", "anio": "2020"})
+        grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+        tercera = sincronizar(consulta, bronze, transporte=Transporte())
+
+    assert segunda.ok
+    assert segunda.filas == 3  # las 8 filas de la marca anterior se descartan
+    assert segunda.particiones == 1
+    assert all("2024-01-05" in p for p in peticiones)
+    assert reescrita == intacta
+    assert segunda.marca == {"updated_at": "2024-02-02T00:00:00.000Z", "ids": ["row-0040"]}
+
+    assert tercera.ok and tercera.filas == 1 and tercera.particiones == 2
+    assert "row-0001" not in set(pd.read_parquet(primera.ruta / "2019.parquet")[":id"])
+    assert "row-0001" in set(pd.read_parquet(primera.ruta / "2020.parquet")[":id"])
+
+    df = pd.concat([pd.read_parquet(r) for r in sorted(primera.ruta.glob("*.parquet"))])
+    assert len(df) == 41 and df[":id"].is_unique
+    cantidades = df.set_index(":id")["cantidad"]
+    assert (cantidades["row-0000"], cantidades["row-0003"]) == ("7", "2")
+
+
+def test_socrata_sincronizacion_completa(tmp_path, monkeypatch):
+    from src.ingesta import socrata
+
+    url = "https://www.datos.gov.co/resource/ijkl-9012.json"
+    filas = [
+        {":id": f"row-{i:04d}", ":updated_at": f"2024-01-0{1 + i % 3}T00:00:00.000Z",
+         "anio": str(2018 + i % 2), "cantidad": "1"}
+        for i in range(12)
+    ]
+    grabacion = Grabacion(tmp_path / "fixtures")
+    grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+    bronze = tmp_path / "bronze"
+
+    with ServidorPrueba(grabacion) as srv:
+        consulta = ConsultaSocrata("delitos", srv.url(url), select="anio, cantidad",
+                                   incremental=True, particion="anio", tam_pagina=5)
+        primera = sincronizar(consulta, bronze, transporte=Transporte())
+        marca = leer_marca(primera.ruta)
+
+        # Si la fusion falla, las particiones y la marca previas quedan intactas
+        def falla(*args, **kwargs):
+            raise OSError("disco lleno")
+
+        monkeypatch.setattr(socrata, "fusionar", falla)
+        fallida = sincronizar(consulta, bronze, transporte=Transporte(), completa=True)
+        monkeypatch.undo()
+        assert not fallida.ok and "disco lleno" in fallida.error
+        assert sorted(r.name for r in primera.ruta.glob("*.parquet")) == \
+            ["2018.parquet", "2019.parquet"]
+        assert leer_marca(primera.ruta) == marca
+
+        # En el origen se borran todas las filas de 2019
+        filas = [f for f in filas if f["anio"] == "2018"]
+        grabacion.agregar(url, json.dumps(filas).encode(), "application/json", socrata=True)
+        completa = sincronizar(consulta, bronze, transporte=Transporte(), completa=True)
+
+    assert completa.ok and completa.filas == 6
+    assert sorted(r.name for r in completa.ruta.glob("*.parquet")) == ["2018.parquet"]
+    assert leer_marca(completa.ruta) == completa.marca
+    assert sorted(p.name for p in completa.ruta.parent.iterdir()) == ["delitos"]
+
+
+def test_socrata_particion_de_anio_numerico(tmp_path):
+    import pandas as pd
+
+    from src.ingesta.socrata import fusionar
+
+    delta = pd.DataFrame({"id": ["a", "b", "c"], "anio": [2019.0, 2020.0, None]})
+    assert fusionar(delta, tmp_path, "id", "anio", {}) == 3
+    assert sorted(r.name for r in tmp_path.glob("*.parquet")) == \
+        ["2019.parquet", "2020.parquet", "nulo.parquet"]
+
+
+def test_listar_consultas_socrata():
+    (consulta,) = listar_consultas(nombres=["municipios_por_departamento"])
+    assert consulta.parametros() == {
+        "$select": "cod_dpto, dpto, count(*) AS municipios",
+        "$group": "cod_dpto, dpto",
+        "$order": "cod_dpto, dpto",
+    }
+
+
+def test_consolidar_variantes(tmp_path):
+    raw, bronze = tmp_path / "raw", tmp_path / "bronze"
+    fila = ["ANTIOQUIA", "MEDELLÍN", 5001000, "ARMA BLANCA", "2018-01-03", "MASCULINO",
+            "ADULTOS", 1]
+    otra = ["CALDAS", "MANIZALES", 17001000, "CONTUNDENTES", "2018-02-03", "FEMENINO", "ADULTOS", 1]
+    nueva = ["META", "VILLAVICENCIO", 50001000, "ARMA DE FUEGO", "2018-03-03", "FEMENINO",
+             "MENORES", 1]
+    contenidos = {
+        "2018_v1": [fila, fila, otra],
+        # v2 repite con otro formato de texto, agrega una fila identica y una nueva
+        "2018_v2": [[c.lower() if isinstance(c, str) else c for c in fila], fila, fila, nueva],
+    }
+    recursos = [Recurso("secuestro", clave, f"http://x/{clave}.xlsx") for clave in contenidos]
+    for r in recursos:
+        r.destino(raw).parent.mkdir(parents=True, exist_ok=True)
+        _libro_policia(r.destino(raw), filas=contenidos[r.clave])
+    convertir_todo(recursos, raw_dir=raw, bronze_dir=bronze, jobs=1, verbose=False)
+
+    reportes = consolidar_variantes(bronze, verbose=False)
+
+    assert reportes["secuestro/2018"] == [
+        {"variante": "2018_v1", "filas": 3, "nuevas": 3, "solapadas": 0},
+        {"variante": "2018_v2", "filas": 4, "nuevas": 2, "solapadas": 2},
+    ]
+    df = leer_bronce(bronze)
+    assert len(df) == 5  # 3 veces fila (max de 2 y 3), otra y nueva
+    assert leer_metadatos(bronze / "secuestro" / "2018.parquet")["solapamiento"] == \
+        reportes["secuestro/2018"]
+
+    # Una variante regenerada con otra version del bronce invalida la union
+    import pyarrow.parquet as pq
+
+    v1 = bronze / "secuestro" / "2018_v1.parquet"
+    tabla = pq.read_table(v1)
+    metadatos = {**leer_metadatos(v1), "version": -1}
+    pq.write_table(tabla.replace_schema_metadata({
+        **tabla.schema.metadata, b"seguridad_convivencia": json.dumps(metadatos).encode()}), v1)
+    consolidar_variantes(bronze, verbose=False)
+    unida = leer_metadatos(bronze / "secuestro" / "2018.parquet")
+    assert unida["variantes"][0]["version"] == -1
+
+
+def test_consolidar_variantes_con_esquemas_distintos(tmp_path):
+    """Una variante con celdas de fecha y otra con texto dd/mm/yyyy."""
+    import pandas as pd
+
+    bronze = tmp_path / "bronze"
+    v1 = pd.DataFrame({
+        "MUNICIPIO": ["MEDELLIN", "CALI"],
+        "FECHA_HECHO": pd.to_datetime(["2022-01-03", "2022-01-04"]),
+        "CANTIDAD": [1, 2],
+    })
+    v2 = pd.DataFrame({
+        "MUNICIPIO": ["CALI", "PASTO"],
+        "FECHA_HECHO": ["04/01/2022", "05/01/2022"],
+        "CANTIDAD": [2, 3],
+        "BARRIO": ["CENTRO", "NORTE"],
+    })
+    for clave, df in (("2018_v1", v1), ("2018_v2", v2)):
+        escribir_parquet(df, bronze / "abigeato" / f"{clave}.parquet",
+                         {"fuente": "abigeato", "clave": clave, "sha256": clave, "version": 1})
+
+    reportes = consolidar_variantes(bronze, verbose=False)
+    assert [r["nuevas"] for r in reportes["abigeato/2018"]] == [2, 1]
+
+    unida = pd.read_parquet(bronze / "abigeato" / "2018.parquet")
+    assert list(unida.columns) == ["MUNICIPIO", "FECHA_HECHO", "CANTIDAD", "BARRIO"]
+    assert unida["FECHA_HECHO"].tolist() == [
+        "2022-01-03 00:00:00", "2022-01-04 00:00:00", "05/01/2022"]
+    assert unida["BARRIO"].tolist() == [None, None, "NORTE"]
+
+
+def test_cargar_poblacion_y_buscar(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    import io
+
+    import numpy as np
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "PobMunicipalxÁreaSexoEdad"
+    ws.cell(row=2, column=1, value="Proyecciones de poblacion municipal")
+    ws.append([])
+    ws.append(["DP", "DPNOM", "DPMP", "MPIO", "AÑO", "ÁREA GEOGRÁFICA", "Hombres_0", "Total"])
+    for dpmp, nombre in [(5001, "Medellín"), (11001, "Bogotá, D.C.")]:
+        for anio in (2022, 2023):
+            for area, total in [("Cabecera Municipal", 100), ("Total", dpmp + anio)]:
+                ws.append([dpmp // 1000, "Antioquia", dpmp, nombre, anio, area, 1, total])
+    contenido = io.BytesIO()
+    wb.save(contenido)
+
+    grabacion = Grabacion(tmp_path / "fixtures")
+    url = "https://www.dane.gov.co/files/poblacion.xlsx"
+    grabacion.agregar(url, contenido.getvalue())
+    ruta = tmp_path / "poblacion.parquet"
+    with ServidorPrueba(grabacion) as srv:
+        df = cargar_poblacion(ruta, url=srv.url(url), hoja=ws.title,
+                              cache=CacheRaw(tmp_path / "cache"))
+
+    assert len(df) == 4
+    assert df.loc[0, "MPNOM"] == "MEDELLIN"
+    assert list(df.columns) == ["DP", "DPNOM", "DPMP", "MPNOM", "AÑO", "TOTAL"]
+    valores = buscar_poblacion([5001000, 11001, 5001, None, 99999], [2023, 2022, 2030, 2022, 2022],
+                               ruta=ruta)
+    np.testing.assert_array_equal(valores, [5001 + 2023, 11001 + 2022, np.nan, np.nan, np.nan])
+
+
+def test_main_ingesta_escribe_metricas(tmp_path, capsys):
+    import yaml
+
+    grabacion = Grabacion(tmp_path / "fixtures")
+    url = "https://www.policia.gov.co/files/abigeato_2019.xlsx"
+    grabacion.agregar(url, _libro_policia(tmp_path / "libro.xlsx").read_bytes())
+    catalogo = tmp_path / "catalogo.yaml"
+    catalogo.write_text(yaml.safe_dump({"fuentes": {"abigeato": {"urls": {"2019": url}}}}))
+    artifacts = tmp_path / "artifacts"
+
+    with ServidorPrueba(grabacion) as srv:
+        codigo = main_ingesta(["--catalogo", str(catalogo), "--raw-dir", str(tmp_path / "raw"),
+                               "--bronze-dir", str(tmp_path / "bronze"), "--jobs", "1",
+                               "--artifacts-dir", str(artifacts), "--espejo", srv.base_url])
+
+    assert codigo == 0
+    metricas = json.loads((artifacts / "metricas_ingesta.json").read_text())
+    (registro,) = metricas["recursos"]
+    assert registro["cache"] == "miss" and registro["bytes"] > 0
+    assert registro["fila_encabezado"] == 9
+    assert (registro["filas_entrada"], registro["filas_salida"]) == (6, 2)
+    assert registro["rss_pico_mb"] > 0
+    assert len((artifacts / "metricas_historial.jsonl").read_text().splitlines()) == 1
+    assert "abigeato 2019" in capsys.readouterr().out
+
+
+def test_plan_sondea_y_ordena_de_mayor_a_menor(tmp_path):
+    grabacion = Grabacion(tmp_path / "fixtures")
+    tamanos = {"abigeato": 10_000, "hurto_personas": 300_000, "secuestro": 50_000}
+    recursos = []
+    for fuente, tamano in tamanos.items():
+        url = f"https://www.policia.gov.co/files/{fuente}_2019.xlsx"
+        grabacion.agregar(url, b"x" * tamano)
+        recursos.append(Recurso(fuente, "2019", url))
+    recursos.append(Recurso("extorsion", "2019", "https://www.policia.gov.co/files/no_existe.xlsx"))
+
+    with ServidorPrueba(grabacion) as srv:
+        recursos = [Recurso(r.fuente, r.clave, srv.url(r.url)) for r in recursos]
+        sondeos = sondear_todo(recursos, Transporte())
+        metodos = {p.split("/")[-1]: c for p, c in srv.peticiones}
+
+    assert [s.bytes for s in sondeos] == [10_000, 300_000, 50_000, None]
+    assert sondeos[-1].muerto and metodos["no_existe.xlsx"] == 404
+    assert [r.fuente for r in ordenar(recursos, sondeos)] == [
+        "hurto_personas", "secuestro", "abigeato"]
+    assert makespan([5, 4, 3, 3, 3], 2) == [10, 8]
+    plan = resumen_plan(sondeos, workers=2)
+    assert "3 archivos" in plan and "1 enlaces muertos" in plan and "💀 extorsion" in plan
+
+
+def test_manifiesto_evita_releer_crudos(tmp_path, monkeypatch):
+    import src.ingesta.manifiesto as modulo
+
+    raw = tmp_path / "raw"
+    recurso = Recurso("abigeato", "2019", "http://x/abigeato.xlsx")
+    recurso.destino(raw).parent.mkdir(parents=True)
+    ruta = _libro_policia(recurso.destino(raw))
+    manifiesto = Manifiesto(raw)
+    manifiesto.registrar(ruta, url=recurso.url, fuente="abigeato", clave="2019")
+    manifiesto.guardar()
+    res = convertir_todo([recurso], raw_dir=raw, bronze_dir=tmp_path / "bronze", jobs=1,
+                         verbose=False)
+
+    lecturas = []
+    original = modulo.sha256_archivo
+    monkeypatch.setattr(modulo, "sha256_archivo", lambda r: lecturas.append(r) or original(r))
+
+    manifiesto = Manifiesto(raw)
+    assert manifiesto.sha256(ruta) == sha256_archivo(ruta) and lecturas == []
+    assert desactualizados([res[0].ruta], manifiesto) == []
+
+    # Mismo contenido con otro mtime: un hash completo y la entrada queda al dia
+    os.utime(ruta, ns=(0, 10**9))
+    manifiesto.sha256(ruta)
+    manifiesto.sha256(ruta)
+    assert len(lecturas) == 1
+
+    # Contenido distinto: el bronce queda desactualizado
+    ruta.write_bytes(ruta.read_bytes() + b"\0")
+    assert desactualizados([res[0].ruta], manifiesto) == [res[0].ruta]
+    assert len(lecturas) == 1  # detectado por el hash rapido, sin leer el archivo completo
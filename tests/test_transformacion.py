@@ -0,0 +1,207 @@
+"""Tests para el modulo de transformacion."""
+
+import datetime as dt
+import json
+
+import pandas as pd
+
+from src.ingesta.bronce import convertir_todo, escribir_parquet
+from src.ingesta.catalogo import Recurso
+from src.ingesta.divipola import normalizar_divipola
+from src.transformacion.correcciones import (
+    CORRECCIONES_PATH,
+    aplicar_correcciones,
+    cargar_reglas,
+    corregir_departamento,
+)
+from src.transformacion.difuso import BuscadorDifuso, levenshtein
+from src.transformacion.fechas import parsear_fechas
+from src.transformacion.main import main
+from src.transformacion.nomenclator import ALIAS_PATH, Nomenclator, cargar_alias
+from tests.test_ingesta import _libro_policia
+
+
+def test_main_lee_bronce(tmp_path):
+    raw = tmp_path / "raw"
+    recurso = Recurso("abigeato", "2019", "http://x/abigeato.xlsx", nombre="Abigeato")
+    recurso.destino(raw).parent.mkdir(parents=True)
+    _libro_policia(recurso.destino(raw))
+    convertir_todo([recurso], raw_dir=raw, bronze_dir=tmp_path / "bronze", jobs=1, verbose=False)
+
+    main(["--bronze-dir", str(tmp_path / "bronze"), "--processed-dir", str(tmp_path / "proc"),
+          "--artifacts-dir", str(tmp_path / "artifacts")])
+
+    df = pd.read_parquet(tmp_path / "proc" / "delitos.parquet")
+    assert len(df) == 2
+    assert pd.api.types.is_datetime64_any_dtype(df["FECHA_HECHO"])
+    assert df["MUNICIPIO"].tolist() == ["MEDELLIN", "BOGOTA D.C."]
+
+    metricas = json.loads((tmp_path / "artifacts" / "metricas_transformacion.json").read_text())
+    assert metricas["recursos"] == [
+        {"fuente": "abigeato", "clave": "2019", "filas_entrada": 2, "filas_salida": 2,
+         "lectura_s": metricas["recursos"][0]["lectura_s"],
+         "fechas_no_parseables": 0, "fechas_formatos": {"iso": 2}},
+    ]
+
+
+def test_parsear_fechas_mezcla_de_representaciones():
+    serie = pd.Series([20220103, "20220104", "2022-01-05 00:00:00", "2022/1/6", "07/01/2022",
+                       44569, dt.datetime(2022, 1, 9), "Jan 10 2022", "SIN DATO", None],
+                      dtype=object)
+    reporte = {}
+    fechas = parsear_fechas(serie, reporte=reporte)
+
+    esperadas = pd.to_datetime([f"2022-01-{d:02d}" for d in range(3, 11)])
+    assert fechas[:8].tolist() == esperadas.tolist()
+    assert fechas[8:].isna().all()
+    assert reporte == {"yyyymmdd": 2, "iso": 2, "dd/mm/yyyy": 1, "serial_excel": 1,
+                       "fecha": 1, "otro": 2, "nulos": 1, "no_parseables": 1}
+
+
+def test_parsear_fechas_descarta_seriales_fuera_de_rango():
+    serie = pd.Series([3, 1500, 44569, 90000])
+    reporte = {}
+    fechas = parsear_fechas(serie, reporte=reporte)
+
+    assert fechas.isna().tolist() == [True, True, False, True]
+    assert reporte["serial_excel"] == 1 and reporte["no_parseables"] == 3
+
+
+def test_main_reporta_fechas_no_parseables_por_archivo(tmp_path, capsys):
+    raw = tmp_path / "raw"
+    recurso = Recurso("abigeato", "2020", "http://x/abigeato.xlsx", nombre="Abigeato")
+    recurso.destino(raw).parent.mkdir(parents=True)
+    filas = [["ANTIOQUIA", "MEDELLÍN", 5001000, "ARMA BLANCA", "SIN DATO", "MASCULINO",
+              "ADULTOS", 1]]
+    _libro_policia(recurso.destino(raw), filas=filas)
+    convertir_todo([recurso], raw_dir=raw, bronze_dir=tmp_path / "bronze", jobs=1, verbose=False)
+
+    main(["--bronze-dir", str(tmp_path / "bronze"), "--processed-dir", str(tmp_path / "proc"),
+          "--artifacts-dir", str(tmp_path / "artifacts")])
+
+    metricas = json.loads((tmp_path / "artifacts" / "metricas_transformacion.json").read_text())
+    assert metricas["recursos"][0]["fechas_no_parseables"] == 1
+    assert "abigeato/2020: 1 FECHA_HECHO sin interpretar" in capsys.readouterr().out
+
+
+def _divipola():
+    return normalizar_divipola([
+        {"cod_dpto": "05", "dpto": "ANTIOQUIA", "cod_mpio": "05001", "nom_mpio": "MEDELLÍN"},
+        {"cod_dpto": "05", "dpto": "ANTIOQUIA", "cod_mpio": "05664",
+         "nom_mpio": "SAN PEDRO DE LOS MILAGROS"},
+        {"cod_dpto": "11", "dpto": "BOGOTÁ, D.C.", "cod_mpio": "11001",
+         "nom_mpio": "BOGOTÁ, D.C."},
+        {"cod_dpto": "13", "dpto": "BOLÍVAR", "cod_mpio": "13001",
+         "nom_mpio": "CARTAGENA DE INDIAS"},
+        {"cod_dpto": "70", "dpto": "SUCRE", "cod_mpio": "70713", "nom_mpio": "SAN PEDRO"},
+        {"cod_dpto": "76", "dpto": "VALLE DEL CAUCA", "cod_mpio": "76147", "nom_mpio": "CARTAGO"},
+        {"cod_dpto": "76", "dpto": "VALLE DEL CAUCA", "cod_mpio": "76001",
+         "nom_mpio": "SANTIAGO DE CALI"},
+    ])
+
+
+def test_nomenclator_exacto_alias_y_difuso():
+    nomenclator = Nomenclator(_divipola(), cargar_alias(ALIAS_PATH))
+    df = pd.DataFrame({
+        "DEPARTAMENTO": ["ANTIOQUIA", "CUNDINAMARCA", "BOLIVAR", "ANTIOQUIA", "SUCRE",
+                         "BOLIVAR", "VALLE", "ANTIOQUIA", "ANTIOQUIA", None],
+        "MUNICIPIO": ["MEDELLIN", "BOGOTA D.C.", "CARTAGENA", "SAN PEDRO", "SAN PEDRO",
+                      "CARTAGO", "CALI", "MEDELIN", "MEDELLIN", "ATLANTIDA"],
+    })
+
+    codigos = nomenclator.resolver(df)
+
+    assert codigos.tolist()[:9] == [5001, 11001, 13001, 5664, 70713, 76147, 76001, 5001, 5001]
+    assert codigos.isna().tolist()[-1]
+    assert nomenclator.resolver_par("CUNDINAMARCA", "BOGOTA D.C.") == (11001, "nombre_unico")
+    assert nomenclator.resolver_par("ANTIOQUIA", "MEDELIN") == (5001, "difuso")
+    # 9 pares distintos: la fila repetida de Medellin no se vuelve a resolver
+    assert nomenclator.conteo() == {"exacto": 2, "alias": 3, "nombre_unico": 2, "difuso": 1,
+                                    "sin_resolver": 1}
+    assert nomenclator.sin_resolver().to_dict("records") == [
+        {"DEPARTAMENTO": "", "MUNICIPIO": "ATLANTIDA"}]
+
+    unida = nomenclator.unir(df)
+    assert len(unida) == len(df)
+    assert unida.loc[1, "dpto"] == "BOGOTA, D.C." and unida.loc[0, "cod_dpto"] == 5
+
+
+def test_main_resuelve_codigos_dane(tmp_path):
+    raw = tmp_path / "raw"
+    recurso = Recurso("abigeato", "2019", "http://x/abigeato.xlsx", nombre="Abigeato")
+    recurso.destino(raw).parent.mkdir(parents=True)
+    filas = [
+        ["ANTIOQUIA", "MEDELLÍN (CT)", 5001000, "ARMA BLANCA", "2022-01-03", "MASCULINO",
+         "ADULTOS", 1],
+        ["CUNDINAMARCA", "BOGOTÁ D.C. (CT)", 11001000, "SIN EMPLEO DE ARMAS", "2022-01-04",
+         "FEMENINO", "ADULTOS", 2],
+        # Departamento equivocado: CARTAGO solo existe en VALLE DEL CAUCA
+        ["CALDAS", "CARTAGO", 76147000, "ARMA BLANCA", "2022-01-05", "FEMENINO", "ADULTOS", 1],
+    ]
+    _libro_policia(recurso.destino(raw), filas=filas)
+    convertir_todo([recurso], raw_dir=raw, bronze_dir=tmp_path / "bronze", jobs=1, verbose=False)
+    escribir_parquet(_divipola(), tmp_path / "divipola.parquet", {"filas": 7})
+
+    main(["--bronze-dir", str(tmp_path / "bronze"), "--processed-dir", str(tmp_path / "proc"),
+          "--artifacts-dir", str(tmp_path / "artifacts"),
+          "--divipola", str(tmp_path / "divipola.parquet"),
+          "--cache-difuso", str(tmp_path / "difuso.json")])
+
+    df = pd.read_parquet(tmp_path / "proc" / "delitos.parquet")
+    assert df["COD_MPIO"].tolist() == [5001, 11001, 76147]
+    assert df["nom_mpio"].tolist() == ["MEDELLIN", "BOGOTA, D.C.", "CARTAGO"]
+    assert df["DEPARTAMENTO"].tolist()[2] == "VALLE DEL CAUCA"
+    metricas = json.loads((tmp_path / "artifacts" / "metricas_transformacion.json").read_text())
+    assert metricas["recursos"][0]["filas_sin_codigo"] == 0
+    assert {"departamentos", "nomenclator"} <= set(metricas["pasos"])
+
+
+def test_buscador_difuso_por_bloque_con_cache(tmp_path):
+    bloques = {"ANTIOQUIA": ["MEDELLIN", "BELLO", "SAN PEDRO DE LOS MILAGROS"],
+               "SUCRE": ["SAN PEDRO", "SINCELEJO"],
+               "": ["MEDELLIN", "BELLO", "SINCELEJO"]}
+    cache = tmp_path / "difuso.json"
+    buscador = BuscadorDifuso(bloques, cache=cache)
+
+    assert levenshtein("MEDELIN", "MEDELLIN") == 1
+    assert buscador.preseleccion("SAN PEDRO", "SUCRE")[0] == "SAN PEDRO"
+    assert buscador.buscar("MEDELIN", "ANTIOQUIA") == "MEDELLIN"
+    assert buscador.buscar("SINCELEJO", "ANTIOQUIA") is None   # solo dentro del bloque
+    assert buscador.buscar("SINSELEJO", "DESCONOCIDO") == "SINCELEJO"
+    buscador.guardar()
+
+    otro = BuscadorDifuso(bloques, cache=cache)
+    assert otro.resultados == buscador.resultados and len(otro.resultados) == 3
+    assert otro.buscar("MEDELIN", "ANTIOQUIA") == "MEDELLIN" and otro.nuevos == 0
+    # Otro corte u otros bloques invalidan la cache
+    assert BuscadorDifuso(bloques, corte=0.9, cache=cache).resultados == {}
+
+
+def test_correcciones_por_tabla_de_reglas(tmp_path):
+    reglas = cargar_reglas(CORRECCIONES_PATH)
+    reglas[2021, "NARINO", "CUASPUD"] = ("NARINO", "CUASPUD 2021")   # la del anio gana
+    df = pd.DataFrame({
+        "AÑO": [2021, 2021, 2020, 2019, 2021, 2021],
+        "DEPARTAMENTO": ["BOLIVAR", "NARINO", "NARINO", "CHOCO", "ANTIOQUIA", None],
+        "MUNICIPIO": ["CARTAGO", "CUASPUD", "CUASPUD", "TOGUI", "MEDELLIN", "BELLO"],
+    })
+    info = {}
+    corregido = aplicar_correcciones(df, reglas, info=info)
+
+    assert corregido["DEPARTAMENTO"].tolist()[:5] == [
+        "VALLE DEL CAUCA", "NARINO", "NARINO", "BOYACA", "ANTIOQUIA"]
+    assert corregido["MUNICIPIO"].tolist()[:3] == ["CARTAGO", "CUASPUD 2021", "CUASPUD CARLOSAMA"]
+    assert pd.isna(corregido.loc[5, "DEPARTAMENTO"])
+    assert info == {"filas_corregidas": 4, "pares_corregidos": 4}
+    assert df.loc[0, "DEPARTAMENTO"] == "BOLIVAR"   # no modifica la entrada
+
+    divipola = pd.concat([_divipola(), pd.DataFrame({"dpto": ["VALLE DEL CAUCA"],
+                                                     "nom_mpio": ["SAN PEDRO"]})])
+    info = {}
+    departamentos = corregir_departamento(
+        pd.DataFrame({"DEPARTAMENTO": ["X", "CORDOBA", None, "VALLE DEL CAUCA"],
+                      "MUNICIPIO": ["CARTAGO", "SAN PEDRO", None, "CARTAGO"]}), divipola,
+        info=info)
+    # SAN PEDRO existe en dos departamentos: no se toca
+    assert departamentos.tolist()[:2] == ["VALLE DEL CAUCA", "CORDOBA"]
+    assert info == {"filas_departamento": 1}